@@ -0,0 +1,28 @@
+"""Rebuild the sales rollups from the existing orders and payments: ``python backfill_rollups.py``."""
+
+import asyncio
+
+from core import setup_logging
+from db import init_engine, init_db, close_engine, background_session
+from services import AnalyticsService
+
+async def main() -> None:
+    
+    setup_logging()
+    
+    init_engine()
+    
+    # Crea las tablas de rollup si aun no existen
+    await init_db()
+    
+    try:
+        
+        async with background_session() as db_session:
+            await AnalyticsService.rebuild(db_session)
+            await db_session.commit()
+    
+    finally:
+        await close_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Benchmark the inventory deduction of 1, 50 and 500-line orders: ``python bench_inventory.py``.
+
+Each deduction runs in a transaction that is rolled back, so the same orders are measured every round.
+Run it against a scratch database: the products and orders it creates are kept.
+"""
+
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlmodel import insert
+from sqlalchemy import event
+
+from core import setup_logging
+from db import init_engine, init_db, close_engine, background_session
+from models import Product, Client, Employee, Order, OrderProduct, OrderStatus
+from services import OrderService
+
+SIZES = (1, 50, 500)
+ROUNDS = 20
+
+async def setup() -> dict[int, int]:
+    """One product per line of the largest order and one completed order per size, by number of lines."""
+
+    tag = uuid.uuid4().hex[:8]
+
+    async with background_session() as db_session:
+
+        client = Client(email=f"bench-{tag}@example.com", first_name="Bench", last_name="Mark")
+        employee = Employee(email=f"bench-{tag}@example.com", password="x", first_name="Bench")
+
+        db_session.add_all([client, employee])
+        await db_session.flush()
+
+        response = await db_session.exec(insert(Product).values([
+            {"name": f"bench-{tag}-{i}", "price": 1, "cost": 1, "stock": 1_000_000, "minimum_stock": 0}
+            for i in range(max(SIZES))
+        ]).returning(Product.id))
+        product_ids = list(response.scalars().all())
+
+        orders = {}
+
+        for size in SIZES:
+
+            response = await db_session.exec(insert(Order).values(client_id=client.id, employee_id=employee.id,
+                                                                  status=OrderStatus.COMPLETED, total_price=size)
+                                             .returning(Order.id))
+            orders[size] = response.scalar_one()
+
+            await db_session.exec(insert(OrderProduct).values([
+                {"order_id": orders[size], "product_id": product_id, "quantity": 1}
+                for product_id in product_ids[:size]
+            ]))
+
+        await db_session.commit()
+
+        return orders
+
+async def measure(order_id: int) -> tuple[float, int]:
+    """Seconds and statements of one deduction of `order_id`."""
+
+    statements = 0
+
+    def count(*args) -> None:
+        nonlocal statements
+        statements += 1
+
+    async with background_session() as db_session:
+
+        # La conexion se abre antes de medir, asi el tiempo no incluye el checkout del pool
+        connection = await db_session.connection()
+        event.listen(connection.sync_connection, "before_cursor_execute", count)
+
+        try:
+            started = time.perf_counter()
+            await OrderService.update_inventory(db_session, order_id)
+            await db_session.flush()
+            elapsed = time.perf_counter() - started
+
+        finally:
+            event.remove(connection.sync_connection, "before_cursor_execute", count)
+            await db_session.rollback()
+
+    return elapsed, statements
+
+async def main() -> None:
+
+    setup_logging()
+
+    init_engine()
+
+    await init_db()
+
+    try:
+
+        orders = await setup()
+
+        print(f"{'lines':>6} {'median ms':>10} {'p95 ms':>8} {'us/line':>8} {'statements':>11}")
+
+        for size, order_id in orders.items():
+
+            # La primera vuelta calienta cache de planes y conexiones
+            await measure(order_id)
+
+            results = [await measure(order_id) for _ in range(ROUNDS)]
+            timings = sorted(elapsed * 1000 for elapsed, _ in results)
+            median = statistics.median(timings)
+
+            print(f"{size:>6} {median:>10.2f} {timings[int(0.95 * (ROUNDS - 1))]:>8.2f} "
+                  f"{median * 1000 / size:>8.1f} {results[0][1]:>11}")
+
+    finally:
+        await close_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""End-to-end check of the product search routes through the app: ``python check_product_search.py``.
+
+Runs the app's lifespan and sends the requests as ASGI calls, so routing, dependencies and pagination
+are exercised as in production. Run it against a scratch database: the products it creates are kept.
+"""
+
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from main import app
+
+@asynccontextmanager
+async def running() -> AsyncIterator[None]:
+    """Run the app's lifespan: startup on enter, shutdown on exit."""
+
+    messages = asyncio.Queue()
+    started = asyncio.Event()
+
+    async def send(message: dict) -> None:
+        if message["type"].endswith(".failed"):
+            raise RuntimeError(message.get("message"))
+
+        if message["type"] == "lifespan.startup.complete":
+            started.set()
+
+    # La app queda dentro del lifespan hasta recibir el shutdown
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, messages.get, send))
+
+    await messages.put({"type": "lifespan.startup"})
+    await asyncio.wait([task, asyncio.create_task(started.wait())], return_when=asyncio.FIRST_COMPLETED)
+
+    if task.done():
+        task.result()
+
+    try:
+        yield
+
+    finally:
+        await messages.put({"type": "lifespan.shutdown"})
+        await task
+
+async def call(method: str, path: str, body: Optional[Any] = None) -> tuple[int, Any]:
+    """Status code and decoded JSON body of one request."""
+
+    path, _, query = path.partition("?")
+    data = json.dumps(body).encode() if body is not None else b""
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+             "client": ("127.0.0.1", 0), "server": ("localhost", 80)}
+
+    sent = False
+    response = {"status": None, "body": b""}
+
+    async def receive() -> dict:
+        nonlocal sent
+
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": data, "more_body": False}
+
+        await asyncio.Event().wait()
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    # Como el servidor: una excepcion que escapa de la app es un 500
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        return 500, repr(e)
+
+    return response["status"], json.loads(response["body"] or b"null")
+
+async def main() -> None:
+
+    async with running():
+
+        tag = uuid.uuid4().hex[:8]
+
+        # Un producto por estado de stock: disponible, bajo y uno que se agota por el libro de movimientos
+        for name, stock, minimum_stock in (("available", 50, 5), ("low", 3, 5), ("out", 2, 1)):
+            status, product = await call("POST", "/product/", {"name": f"check-{tag}-{name}", "price": 10, "cost": 5,
+                                                               "stock": stock, "minimum_stock": minimum_stock})
+            assert status == 200, (status, product)
+
+            if name == "out":
+                out_id = product["id"]
+                status, _ = await call("PATCH", f"/product/stock/{out_id}/-2/false")
+                assert status == 200, status
+
+        filters = {"name": f"check-{tag}"}
+
+        status, result = await call("POST", "/product/search/faceted?page=1&size=2", filters)
+        assert status == 200, (status, result)
+        assert result["page"]["total"] == 3 and len(result["page"]["items"]) == 2, result["page"]
+
+        stock = {facet["value"]: facet["count"] for facet in result["facets"]["stock"]}
+        assert stock == {"out": 1, "low": 1, "available": 1}, stock
+
+        status, result = await call("POST", "/product/search/faceted", {**filters, "stock_states": ["out"]})
+        assert status == 200, (status, result)
+        assert [item["name"] for item in result["page"]["items"]] == [f"check-{tag}-out"], result["page"]
+
+        # Hasta el proximo snapshot Product.stock sigue en 2: lo leido tiene que salir del libro
+        assert result["page"]["items"][0]["stock"] == 0, result["page"]
+
+        status, product = await call("GET", f"/product/{out_id}")
+        assert status == 200 and product["stock"] == 0, (status, product)
+
+        status, result = await call("POST", "/product/search?page=1&size=10", filters)
+        assert status == 200 and result["total"] == 3, (status, result)
+
+        print("OK: product search and faceted search answer with pages and ledger-based stock and facets")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,10 +2,12 @@ from core.settings import SETTINGS
 from core.storage import get_e2_client
 from core.rate_limit import LIMITER
 from core.logging import setup_logging, log_operation
+from core.cache import CATALOG_CACHE, CatalogCache
 
 __all__ = [
     "SETTINGS",
     'LIMITER',
     "get_e2_client",
-    "setup_logging", 'log_operation'
+    "setup_logging", 'log_operation',
+    "CATALOG_CACHE", "CatalogCache"
 ]
\ No newline at end of file
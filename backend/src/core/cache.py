@@ -0,0 +1,244 @@
+import json
+from collections import OrderedDict, deque
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Iterable, NamedTuple, Optional
+
+import logfire
+from sqlmodel import SQLModel, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.settings import SETTINGS
+
+class CacheEntry(NamedTuple):
+    model: type[SQLModel]
+    data: dict
+    version: Optional[datetime]
+    expires_at: float
+
+class CatalogCache:
+    """Bounded LRU with TTL of catalog rows (products, categories) keyed by kind and id,
+    plus the map of scannable codes (barcodes and SKUs) to product ids."""
+
+    PRODUCT = "product"
+    CATEGORY = "category"
+
+    CHANNEL = "catalog_cache"
+
+    # pg_notify acepta hasta 8000 bytes; con mas ids se invalida el tipo entero
+    MAX_NOTIFY_IDS = 500
+
+    # Invalidaciones de productos recordadas para filtrar cargas de codigos que empezaron antes
+    MAX_CODE_EVICTIONS = 1024
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: OrderedDict[tuple[str, int], CacheEntry] = OrderedDict()
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+        # Sin TTL: un codigo solo cambia de producto con una escritura, y esa invalida el producto
+        self._codes: dict[str, int] = {}
+        self._product_codes: dict[int, set[str]] = {}
+
+        # (generacion, ids) de cada invalidacion de productos; ids None invalida todos
+        self._code_evictions: deque[tuple[int, Optional[list[int]]]] = deque(maxlen=self.MAX_CODE_EVICTIONS)
+        self._code_evictions_floor = 0
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; read it before querying and hand it to `put`."""
+        return self._generation
+
+    def get(self, kind: str, _id: int) -> Optional[SQLModel]:
+        """A fresh copy of the cached row, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((kind, _id))
+
+            if entry is None or entry.expires_at < monotonic():
+                if entry is not None:
+                    del self._entries[(kind, _id)]
+
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end((kind, _id))
+            self._stats["hits"] += 1
+
+        # Cada peticion recibe su propia instancia, nadie modifica la cacheada
+        return entry.model.model_validate(entry.data)
+
+    def version(self, kind: str, _id: int) -> Optional[datetime]:
+        """updated_at of the cached row without copying it, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((kind, _id))
+
+            if entry is None or entry.expires_at < monotonic():
+                return None
+
+            return entry.version
+
+    def put(self, kind: str, _id: int, row: SQLModel, generation: int) -> None:
+        """Cache `row` unless something was invalidated since `generation` or a newer version is cached."""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+
+        version = getattr(row, "updated_at", None)
+        entry = CacheEntry(type(row), row.model_dump(), version, monotonic() + self.ttl)
+
+        with self._lock:
+            # Una lectura que empezo antes de una escritura no puede dejar el valor viejo
+            if generation != self._generation:
+                return
+
+            current = self._entries.get((kind, _id))
+
+            if current is not None and version is not None and current.version is not None and current.version > version:
+                return
+
+            self._entries[(kind, _id)] = entry
+            self._entries.move_to_end((kind, _id))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def product_id(self, code: str) -> Optional[int]:
+        """Product a scanned code belongs to, or None when the code is not mapped."""
+        with self._lock:
+            return self._codes.get(code)
+
+    def put_codes(self, codes: Iterable[tuple[str, int]], generation: int) -> bool:
+        """Map codes to products, skipping the products invalidated since `generation`.
+
+        Returns False when nothing could be stored because every product may have changed since."""
+        with self._lock:
+            stale = self._evicted_since(generation)
+
+            if stale is None:
+                return False
+
+            for code, product_id in codes:
+                # Lo leido antes de invalidar el producto puede ser viejo; el resto sigue valiendo
+                if product_id in stale:
+                    continue
+
+                self._codes[code] = product_id
+                self._product_codes.setdefault(product_id, set()).add(code)
+
+            return True
+
+    def _evicted_since(self, generation: int) -> Optional[set[int]]:
+        """Products invalidated after `generation`, or None after a full invalidation or one already forgotten."""
+        if generation < self._code_evictions_floor:
+            return None
+
+        stale: set[int] = set()
+
+        for evicted_at, ids in reversed(self._code_evictions):
+            if evicted_at <= generation:
+                break
+
+            if ids is None:
+                return None
+
+            stale.update(ids)
+
+        return stale
+
+    def _log_code_eviction(self, ids: Optional[list[int]]) -> None:
+        if len(self._code_evictions) == self._code_evictions.maxlen:
+            self._code_evictions_floor = self._code_evictions[0][0]
+
+        self._code_evictions.append((self._generation, ids))
+
+    def _evict_codes(self, ids: Optional[Iterable[int]]) -> None:
+        if ids is None:
+            self._codes.clear()
+            self._product_codes.clear()
+            return
+
+        for _id in ids:
+            for code in self._product_codes.pop(_id, ()):
+                # El codigo pudo pasar a otro producto que ya lo volvio a cargar
+                if self._codes.get(code) == _id:
+                    del self._codes[code]
+
+    def evict(self, kind: str, ids: Optional[Iterable[int]] = None) -> None:
+        """Drop the given ids of `kind`, or every row of `kind` when `ids` is None."""
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+            if kind == self.PRODUCT:
+                ids = None if ids is None else list(ids)
+                self._evict_codes(ids)
+                self._log_code_eviction(ids)
+
+            if ids is None:
+                for key in [key for key in self._entries if key[0] == kind]:
+                    del self._entries[key]
+                return
+
+            for _id in ids:
+                self._entries.pop((kind, _id), None)
+
+    def clear(self) -> None:
+        """Drop everything, e.g. after missing notifications."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._evict_codes(None)
+            self._log_code_eviction(None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+
+            return {**self._stats,
+                    "hit_ratio": self._stats["hits"] / lookups if lookups else None,
+                    "size": len(self._entries),
+                    "codes": len(self._codes),
+                    "max_entries": self.max_entries}
+
+    async def invalidate(self, db_session: AsyncSession, kind: str, ids: Optional[Iterable[int]] = None) -> None:
+        """Evict rows when the session's transaction commits, here and in every other worker."""
+
+        ids = None if ids is None else sorted(set(ids))
+
+        if ids is not None and len(ids) > self.MAX_NOTIFY_IDS:
+            ids = None
+
+        pending = db_session.sync_session.info.setdefault("catalog_invalidations", [])
+        pending.append((kind, ids))
+
+        # El NOTIFY sale con el commit y se descarta con el rollback, igual que la escritura
+        if db_session.get_bind().dialect.name == "postgresql":
+            await db_session.exec(select(func.pg_notify(self.CHANNEL, json.dumps({"kind": kind, "ids": ids}))))
+
+    def on_notify(self, payload: str) -> None:
+        """Apply an invalidation published by another worker."""
+        try:
+            message = json.loads(payload)
+            self.evict(message["kind"], message["ids"])
+
+        except Exception:
+            logfire.exception("Invalid catalog cache notification")
+            self.clear()
+
+CATALOG_CACHE = CatalogCache(SETTINGS.catalog_cache_size, SETTINGS.catalog_cache_ttl)
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session: Session) -> None:
+    for kind, ids in session.info.pop("catalog_invalidations", []):
+        CATALOG_CACHE.evict(kind, ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session) -> None:
+    session.info.pop("catalog_invalidations", None)
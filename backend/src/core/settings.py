@@ -19,7 +19,57 @@ class Settings(BaseSettings):
 
     # Database
     db_url: str = Field(..., alias="database_url")
-    
+    db_pool_size: int = Field(10, alias="db_pool_size")
+    db_max_overflow: int = Field(20, alias="db_max_overflow")
+    db_pool_timeout: float = Field(30.0, alias="db_pool_timeout")
+    db_pool_recycle: int = Field(1800, alias="db_pool_recycle")  # segundos, -1 lo desactiva
+    db_pool_pre_ping: bool = Field(True, alias="db_pool_pre_ping")
+    db_pool_warmup: int = Field(0, alias="db_pool_warmup")  # conexiones abiertas al arrancar
+    db_read_url: Optional[str] = Field(None, alias="database_read_url")  # replica de lectura, opcional
+    db_read_your_writes_seconds: float = Field(5.0, alias="db_read_your_writes_seconds")
+    stock_snapshot_interval: float = Field(60.0, alias="stock_snapshot_interval")  # segundos, 0 lo desactiva
+
+    # Idempotency
+    idempotency_ttl: float = Field(86400.0, alias="idempotency_ttl")  # segundos que se guarda cada respuesta
+    idempotency_cache_size: int = Field(1024, alias="idempotency_cache_size")  # respuestas en memoria por worker
+    idempotency_purge_interval: float = Field(3600.0, alias="idempotency_purge_interval")  # segundos, 0 lo desactiva
+
+    # Outbox
+    outbox_poll_interval: float = Field(1.0, alias="outbox_poll_interval")  # segundos, 0 desactiva el worker en proceso
+    outbox_batch_size: int = Field(100, alias="outbox_batch_size")
+    outbox_max_attempts: int = Field(8, alias="outbox_max_attempts")
+    outbox_backoff_base: float = Field(2.0, alias="outbox_backoff_base")  # segundos, se duplica en cada intento
+    outbox_backoff_max: float = Field(600.0, alias="outbox_backoff_max")
+    outbox_invoice_email: bool = Field(False, alias="outbox_invoice_email")  # enviar la factura al completar una orden
+
+    # Catalog cache
+    catalog_cache_size: int = Field(5000, alias="catalog_cache_size")  # filas por worker, 0 lo desactiva
+    catalog_cache_ttl: float = Field(60.0, alias="catalog_cache_ttl")  # segundos, cota si se pierde un NOTIFY
+
+    # Exports
+    export_batch_size: int = Field(1000, alias="export_batch_size")  # filas por lectura del cursor en los /search en streaming
+
+    # Catalog sync
+    catalog_sync_grace: float = Field(30.0, alias="catalog_sync_grace")  # segundos que se repiten en cada delta por transacciones aun abiertas
+    catalog_tombstone_ttl: float = Field(30.0, alias="catalog_tombstone_ttl")  # dias; un terminal mas atrasado descarga el snapshot
+    catalog_tombstone_purge_interval: float = Field(3600.0, alias="catalog_tombstone_purge_interval")  # segundos, 0 lo desactiva
+
+    # Product images
+    image_workers: int = Field(2, alias="image_workers")  # procesos que generan las variantes
+    image_variant_widths: list[int] = Field([256, 1024], alias="image_variant_widths")  # anchos en px: miniatura y mediana
+    image_variant_quality: int = Field(80, alias="image_variant_quality")
+    image_max_bytes: int = Field(10 * 1024 * 1024, alias="image_max_bytes")  # tamaño maximo de la original: 10 MiB
+    image_sweep_interval: float = Field(3600.0, alias="image_sweep_interval")  # segundos entre barridos de imagenes sin uso, 0 lo desactiva
+    image_sweep_batch_size: int = Field(500, alias="image_sweep_batch_size")
+
+    # Product import
+    product_import_chunk_size: int = Field(5000, alias="product_import_chunk_size")  # filas validadas y copiadas por tanda
+    product_import_max_errors: int = Field(1000, alias="product_import_max_errors")  # filas con error listadas en la respuesta
+
+    # Product search
+    product_price_buckets: list[float] = Field([10, 50, 100, 500], alias="product_price_buckets")  # limites de los rangos de precio
+    product_expiring_days: int = Field(30, alias="product_expiring_days")  # dias antes del vencimiento en que un producto esta por vencer
+
     #Storage
     storage_endpoint_url: str = Field(..., alias="storage_endpoint_url")
     storage_access_key: SecretStr = Field(..., alias="storage_access_key")
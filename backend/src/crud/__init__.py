@@ -1,3 +1,4 @@
+from crud.base import BaseCrud
 from crud.user import UserCrud
 from crud.product import ProductCrud
 from crud.service import ServiceCrud
@@ -5,6 +6,7 @@ from crud.order import OrderCrud
 from crud.others import PaymentCrud
 
 __all__ = [
+    "BaseCrud",
     "UserCrud",
     "ProductCrud",
     "ServiceCrud",
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import SQLModel, insert, update
+from sqlalchemy.sql.elements import ColumnElement
+
+from core import log_operation
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+class BaseCrud:
+    """Single-statement writes with ``INSERT/UPDATE ... RETURNING``."""
+
+    EXCLUDED_FIELDS_FOR_UPDATE = {"id"}
+
+    @staticmethod
+    def _column_values(model: type[SQLModel], data: dict[str, Any], excluded: set[str] = frozenset()) -> dict[str, Any]:
+        """Keep only the keys that are real columns of `model`."""
+        columns = model.__table__.columns.keys()
+        return {key: value for key, value in data.items() if key in columns and key not in excluded}
+
+    @staticmethod
+    @log_operation(True)
+    async def insert_returning(db_session: AsyncSession, model: type[ModelT], data: dict[str, Any]) -> ModelT:
+        """Insert a row and return it as an ORM instance, in one round trip."""
+
+        # Instanciar el modelo aplica los default_factory (created_at, updated_at, ...)
+        instance = model(**data)
+        values = {column: getattr(instance, column) for column in model.__table__.columns.keys()}
+
+        if values.get("id") is None:
+            values.pop("id", None)
+
+        response = await db_session.exec(insert(model).values(**values).returning(model))
+
+        return response.scalars().one()
+
+    @staticmethod
+    @log_operation(True)
+    async def update_returning(db_session: AsyncSession,
+                               model: type[ModelT],
+                               criteria: list[ColumnElement[bool]],
+                               data: dict[str, Any],
+                               excluded: set[str] = frozenset({"id"}),
+                               not_found: str = "Not found") -> ModelT:
+        """Update the row matching `criteria` and return it; 404 when no row was affected."""
+
+        values = BaseCrud._column_values(model, data, excluded)
+
+        if "updated_at" in model.__table__.columns and "updated_at" not in values:
+            values["updated_at"] = datetime.now()
+
+        if not values:
+            raise HTTPException(detail="No fields to update", status_code=400)
+
+        response = await db_session.exec(update(model).where(*criteria).values(**values).returning(model))
+        row = response.scalars().first()
+
+        if row is None:
+            raise HTTPException(detail=not_found, status_code=404)
+
+        return row
@@ -1,15 +1,17 @@
+from collections import Counter
+from typing import Optional
+
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select, delete
+from sqlmodel import select, insert, update, delete
 
-from models import Order, OrderService, OrderProduct, OrderStatus
-from utils import OrderUtils, UserUtils
-from dtos import OrderCreate, OrderUpdate
+from models import Order, OrderService, OrderProduct, OrderStatus, Product, Service, LoadProfile
+from utils import OrderUtils, UserUtils, ExistsUtils
+from dtos import OrderCreate, OrderUpdate, OrderCheckout, OrderDetail, OrderDetailLine
 from core import log_operation
+from crud.base import BaseCrud
 
-class OrderCrud:
-    
-    EXCLUDED_FIELDS_FOR_UPDATE = {"id"}
+class OrderCrud(BaseCrud):
     
     @staticmethod
     @log_operation(True)
@@ -24,32 +26,114 @@ class OrderCrud:
         
         try:
             
-            new_order = Order(**order.model_dump(exclude_unset=True))
-            db_session.add(new_order)
-             
-            await db_session.commit()
-            await db_session.refresh(new_order)
+            new_order = await OrderCrud.insert_returning(db_session, Order, order.model_dump(exclude_unset=True))
 
-            if order.status is OrderStatus.COMPLETED:
+            # Crear la orden ya cerrada equivale a su transicion desde pendiente
+            if new_order.status in (OrderStatus.COMPLETED, OrderStatus.CANCELLED):
                 
                 from services import OrderService
                 
-                await OrderService.update_inventory(db_session, 0 if new_order.id is None else new_order.id)
+                await OrderService.on_transition(db_session, new_order, OrderStatus.PENDING)
+             
+            await db_session.commit()
 
             return new_order
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Order creation failed", status_code=500) from e
+
+    @staticmethod
+    @log_operation(True)
+    async def create_checkout(db_session: AsyncSession, checkout: OrderCheckout) -> Order:
+        """Create an order with all its lines, its total and optionally its completion in one transaction."""
+        
+        if checkout.status not in (OrderStatus.PENDING, OrderStatus.COMPLETED):
+            raise HTTPException(detail="Checkout status must be Pendiente or Completada", status_code=400)
+        
+        if not checkout.products and not checkout.services:
+            raise HTTPException(detail="Checkout requires at least one product or service", status_code=400)
+        
+        # Las lineas repetidas se agrupan, (order_id, product_id) es la clave primaria
+        products = Counter()
+        for line in checkout.products:
+            products[line.product_id] += line.quantity
+        
+        services = Counter()
+        for line in checkout.services:
+            services[line.service_id] += line.quantity
+        
+        if not await UserUtils.exist_client(db_session, checkout.client_id):
+            raise HTTPException(detail="Client not found", status_code=404)
+        
+        if not await UserUtils.exist_employee(db_session, checkout.employee_id):
+            raise HTTPException(detail="Employee not found", status_code=404)
+        
+        # Una sola consulta por tabla para validar todos los ids
+        missing_products = await ExistsUtils.missing(db_session, Product.id, products)
+        if missing_products:
+            raise HTTPException(detail=f"Products not found: {sorted(missing_products)}", status_code=404)
+        
+        missing_services = await ExistsUtils.missing(db_session, Service.id, services)
+        if missing_services:
+            raise HTTPException(detail=f"Services not found: {sorted(missing_services)}", status_code=404)
+        
+        try:
+            
+            new_order = await OrderCrud.insert_returning(db_session, Order, {"client_id": checkout.client_id,
+                                                                             "employee_id": checkout.employee_id,
+                                                                             "status": checkout.status,
+                                                                             "total_price": None})
+            
+            if products:
+                await db_session.exec(insert(OrderProduct).values([
+                    {"order_id": new_order.id, "product_id": product_id, "quantity": quantity}
+                    for product_id, quantity in products.items()
+                ]))
+            
+            if services:
+                await db_session.exec(insert(OrderService).values([
+                    {"order_id": new_order.id, "service_id": service_id, "quantity": quantity}
+                    for service_id, quantity in services.items()
+                ]))
+            
+            from services import OrderService as OrderServiceService
+            
+            new_order = await OrderCrud.update_returning(db_session, Order,
+                                                         [Order.id == new_order.id],
+                                                         {"total_price": OrderServiceService.total_price(new_order.id)},
+                                                         not_found="Order not found")
+            
+            if new_order.status == OrderStatus.COMPLETED:
+                await OrderServiceService.on_transition(db_session, new_order, OrderStatus.PENDING)
+            
+            elif checkout.reserve_stock:
+                await OrderServiceService.reserve_stock(db_session, new_order.id)
+            
+            await db_session.commit()
+            
+            return new_order
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Order checkout failed", status_code=500) from e
     
     @staticmethod
     @log_operation(True)
-    async def read_order(db_session: AsyncSession, order_id: int) -> Order:
+    async def read_order(db_session: AsyncSession, order_id: int, profile: tuple = LoadProfile.NONE) -> Order:
         """Retrieve an order by ID."""
         
         try:
 
-            response = await db_session.exec(select(Order).where(Order.id == order_id))
+            response = await db_session.exec(select(Order).options(*profile).where(Order.id == order_id))
             order = response.first()
 
             if order is None:
@@ -60,6 +144,66 @@ class OrderCrud:
         except Exception as e:
             raise HTTPException(detail="Failed to retrieve order", status_code=500) from e
     
+    @staticmethod
+    @log_operation(True)
+    async def read_order_details(db_session: AsyncSession, order_ids: list[int]) -> list[OrderDetail]:
+        """Retrieve orders with their lines and party names in one query, in the order of `order_ids`."""
+        
+        order_ids = list(dict.fromkeys(order_ids))
+        
+        if not order_ids:
+            return []
+        
+        from services import OrderService as OrderServiceService
+        
+        try:
+            
+            response = await db_session.exec(OrderServiceService.search_order_details(order_ids))
+            rows = response.all()
+        
+        except Exception as e:
+            raise HTTPException(detail="Failed to retrieve order details", status_code=500) from e
+        
+        full_name = lambda first, last: " ".join(part for part in (first, last) if part)
+        details: dict[int, OrderDetail] = {}
+        
+        for row in rows:
+            
+            detail = details.get(row.id)
+            
+            if detail is None:
+                detail = details[row.id] = OrderDetail(id=row.id,
+                                                       status=row.status,
+                                                       total_price=row.total_price,
+                                                       created_at=row.created_at,
+                                                       updated_at=row.updated_at,
+                                                       client_id=row.client_id,
+                                                       client_name=full_name(row.client_first_name, row.client_last_name),
+                                                       employee_id=row.employee_id,
+                                                       employee_name=full_name(row.employee_first_name, row.employee_last_name))
+            
+            if row.kind is not None:
+                detail.lines.append(OrderDetailLine(kind=row.kind,
+                                                    item_id=row.item_id,
+                                                    name=row.name,
+                                                    unit_price=row.unit_price,
+                                                    quantity=row.quantity,
+                                                    subtotal=row.unit_price * row.quantity))
+        
+        return [details[order_id] for order_id in order_ids if order_id in details]
+
+    @staticmethod
+    @log_operation(True)
+    async def read_order_detail(db_session: AsyncSession, order_id: int) -> OrderDetail:
+        """Retrieve an order with its lines and party names."""
+        
+        details = await OrderCrud.read_order_details(db_session, [order_id])
+        
+        if not details:
+            raise HTTPException(detail="Order not found", status_code=404)
+        
+        return details[0]
+
     @staticmethod
     @log_operation(True)
     async def read_order_status(db_session: AsyncSession, order_id: int) -> OrderStatus:
@@ -83,34 +227,32 @@ class OrderCrud:
     async def update_order(db_session: AsyncSession, fields: OrderUpdate) -> Order:
         """Update an existing order."""
 
-        if not await OrderUtils.exist_order(db_session, fields.id):
-            raise HTTPException(detail="Order not found", status_code=404)
-
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == fields.id))
-            order = response.one()
+            from services import OrderService as OrderServiceService
 
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                    
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE:
-                    continue
-                    
-                setattr(order, key, value)
+            data = fields.model_dump(exclude_unset=True)
+            status = data.pop("status", None)
 
-            db_session.add(order)
-            await db_session.commit()
-            
-            await db_session.refresh(order)
-            
-            if order.status is OrderStatus.COMPLETED:
+            # El estado solo cambia por la maquina de estados, el resto de campos va aparte
+            if status is not None:
+                order = await OrderServiceService.transition(db_session, fields.id, status)
 
-                from services import OrderService
+            if status is None or set(data) - OrderCrud.EXCLUDED_FIELDS_FOR_UPDATE:
+                order = await OrderCrud.update_returning(db_session, Order,
+                                                         [Order.id == fields.id],
+                                                         data,
+                                                         OrderCrud.EXCLUDED_FIELDS_FOR_UPDATE,
+                                                         "Order not found")
 
-                await OrderService.update_inventory(db_session, 0 if order.id is None else order.id)
+            await db_session.commit()
 
             return order
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to update order", status_code=500) from e
@@ -120,49 +262,101 @@ class OrderCrud:
     async def update_order_status(db_session: AsyncSession, order_id: int, status: OrderStatus) -> Order:
         """Update the status of an order."""
 
-        if not await OrderUtils.exist_order(db_session, order_id):
-            raise HTTPException(detail="Order not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_id))
-            order = response.one()
-            
-            order.status = status
+            from services import OrderService as OrderServiceService
 
-            db_session.add(order)
+            order = await OrderServiceService.transition(db_session, order_id, status)
             
             await db_session.commit()
-            await db_session.refresh(order)
-
-            if status is OrderStatus.COMPLETED:
-
-                from services import OrderService
-
-                await OrderService.update_inventory(db_session, 0 if order.id is None else order.id)
 
             return order
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to update order status", status_code=500) from e
     
     @staticmethod
     @log_operation(True)
-    async def delete_order(db_session: AsyncSession, order_id: int) -> None:
-        """Delete an order by ID."""
+    async def reserve_order_stock(db_session: AsyncSession, order_id: int) -> dict[int, int]:
+        """Reserve stock for the product lines of a pending order."""
+        
+        from services import OrderService
+        
+        try:
+            
+            reserved = await OrderService.reserve_stock(db_session, order_id)
+            await db_session.commit()
+            
+            return reserved
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to reserve order stock", status_code=500) from e
+
+    @staticmethod
+    @log_operation(True)
+    async def release_order_stock(db_session: AsyncSession, order_id: int) -> dict[int, int]:
+        """Release the stock reserved by an order."""
         
-        # Check if the order exists before attempting to delete
         if not await OrderUtils.exist_order(db_session, order_id):
             raise HTTPException(detail="Order not found", status_code=404)
         
-        # Ensure the order is not completed before deleting
-        if await OrderCrud.read_order_status(db_session, order_id) is OrderStatus.COMPLETED:
+        from services import OrderService
+        
+        try:
+            
+            released = await OrderService.release_stock(db_session, [order_id])
+            await db_session.commit()
+            
+            return released
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to release order stock", status_code=500) from e
+
+    @staticmethod
+    @log_operation(True)
+    async def recompute_totals(db_session: AsyncSession, order_ids: Optional[list[int]] = None, include_closed: bool = False) -> list[int]:
+        """Repair order totals from their lines, returning the ids that were corrected."""
+        
+        from services import OrderService as OrderServiceService
+        
+        try:
+            
+            repaired = await OrderServiceService.recompute_totals(db_session, order_ids, include_closed)
+            await db_session.commit()
+            
+            return repaired
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to recompute order totals", status_code=500) from e
+
+    @staticmethod
+    @log_operation(True)
+    async def delete_order(db_session: AsyncSession, order_id: int) -> None:
+        """Delete an order by ID."""
+        
+        # Ensure the order is not closed before deleting, the row stays locked until commit
+        if await OrderUtils.lock_order_status(db_session, order_id) in (OrderStatus.COMPLETED, OrderStatus.REFUNDED):
             raise HTTPException(detail="Cannot delete a completed order", status_code=400)
         
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_id))
+            from services import OrderService
+            
+            await OrderService.release_stock(db_session, [order_id])
+            
+            response = await db_session.exec(select(Order).options(*LoadProfile.ORDER_LINES).where(Order.id == order_id))
             
             await db_session.delete(response.one())
             await db_session.commit()
@@ -178,12 +372,9 @@ class OrderCrud:
     async def create_order_service(db_session: AsyncSession, order_service: OrderService) -> OrderService:
         """Add a service to an order."""
 
-        # Ensure the order_id exists before adding the service
-        if not await OrderUtils.exist_order(db_session, order_service.order_id):
-            raise HTTPException(detail="Order not found", status_code=404)
-
-        if await OrderCrud.read_order_status(db_session, order_service.order_id) is OrderStatus.COMPLETED:
-            raise HTTPException(detail="Cannot add service to a completed order", status_code=400)
+        # Only pending orders accept lines, the row stays locked until commit
+        if await OrderUtils.lock_order_status(db_session, order_service.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Cannot add service to an order that is not pending", status_code=400)
 
         # Import ServiceCrud directly from its file path
         from utils import ServiceUtils
@@ -194,12 +385,16 @@ class OrderCrud:
         
         try:
                 
-            db_session.add(order_service)
+            new_order_service = await OrderCrud.insert_returning(db_session, OrderService, order_service.model_dump())
+            
+            from services import OrderService as OrderServiceService
+            
+            await OrderServiceService.add_to_total(db_session, order_service.order_id,
+                                                   OrderServiceService.service_amount(order_service.service_id, order_service.quantity))
             
             await db_session.commit()
-            await db_session.refresh(order_service)
             
-            return order_service
+            return new_order_service
         
         except Exception as e:
             await db_session.rollback()
@@ -210,26 +405,39 @@ class OrderCrud:
     async def update_order_serivce(db_session: AsyncSession, order_service: OrderService) -> OrderService:
         """Update order service"""
         
-        # Check if the order service exists before attempting to update
-        if not await OrderUtils.exist_order_service(db_session, order_service):
-            raise HTTPException(detail="Order service not found", status_code=404)
+        if await OrderUtils.lock_order_status(db_session, order_service.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Order service in an order that is not pending", status_code=400)
         
-        if await OrderUtils.order_service_in_order_completed(db_session, order_service):
-            raise HTTPException(detail="Order service in order completed", status_code=404)
+        from services import OrderService as OrderServiceService
 
         try:
             
-            response = await db_session.exec(select(OrderService).where(OrderService.order_id == order_service.order_id).where(OrderService.service_id == order_service.service_id))
-            _order_service = response.one()
+            # La fila queda bloqueada hasta el commit: la diferencia de cantidad es exacta
+            response = await db_session.exec(select(OrderService.quantity)
+                                             .where(OrderService.order_id == order_service.order_id)
+                                             .where(OrderService.service_id == order_service.service_id)
+                                             .with_for_update())
+            quantity = response.first()
             
-            _order_service.quantity = order_service.quantity
-
-            db_session.add(_order_service)
+            if quantity is None:
+                raise HTTPException(detail="Order service not found", status_code=404)
+            
+            _order_service = await OrderCrud.update_returning(db_session, OrderService,
+                                                              [OrderService.order_id == order_service.order_id,
+                                                               OrderService.service_id == order_service.service_id],
+                                                              {"quantity": order_service.quantity},
+                                                              not_found="Order service not found")
+            
+            await OrderServiceService.add_to_total(db_session, order_service.order_id,
+                                                   OrderServiceService.service_amount(order_service.service_id, order_service.quantity - quantity))
             
             await db_session.commit()
-            await db_session.refresh(order_service)
 
-            return order_service
+            return _order_service
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
         
         except Exception as e:
             await db_session.rollback()
@@ -247,6 +455,15 @@ class OrderCrud:
             raise HTTPException(detail="Service not found", status_code=404)
 
         try:
+            
+            # Las ordenes pendientes pierden el importe de esas lineas, una por orden por la clave primaria
+            await db_session.exec(update(Order)
+                                  .where(Order.id == OrderService.order_id,
+                                         OrderService.service_id == service_id,
+                                         Service.id == service_id,
+                                         Order.status == OrderStatus.PENDING)
+                                  .values(total_price=Order.total_price - OrderService.quantity * Service.price)
+                                  .execution_options(synchronize_session=False))
 
             await db_session.exec(delete(OrderService).where(OrderService.service_id == service_id))
                 
@@ -260,25 +477,33 @@ class OrderCrud:
     async def delete_order_service(db_session: AsyncSession, order_service: OrderService) -> bool:
         """Delete order services"""
         
-        from utils import OrderUtils
-        
-        if not await OrderUtils.exist_order(db_session, order_service.order_id):
-            raise HTTPException(detail="Order not found", status_code=404)
-        
-        # Check if the order service exists before attempting to delete
-        if not await OrderUtils.exist_order_service(db_session, order_service):
-            raise HTTPException(detail="Order service not found", status_code=404)
-
-        if await OrderUtils.order_service_in_order_completed(db_session, order_service):
-            raise HTTPException(detail="Order service in order completed", status_code=404)
+        if await OrderUtils.lock_order_status(db_session, order_service.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Order service in an order that is not pending", status_code=400)
 
+        from services import OrderService as OrderServiceService
+        
         try:
             
-            await db_session.delete(response.one())
+            response = await db_session.exec(delete(OrderService)
+                                             .where(OrderService.order_id == order_service.order_id)
+                                             .where(OrderService.service_id == order_service.service_id)
+                                             .returning(OrderService.quantity))
+            quantity = response.scalars().first()
+            
+            if quantity is None:
+                raise HTTPException(detail="Order service not found", status_code=404)
+            
+            await OrderServiceService.add_to_total(db_session, order_service.order_id,
+                                                   OrderServiceService.service_amount(order_service.service_id, -quantity))
+            
             await db_session.commit()
             
             return True
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to delete order service", status_code=500) from e
@@ -288,12 +513,9 @@ class OrderCrud:
     async def create_order_product(db_session: AsyncSession, order_product: OrderProduct) -> OrderProduct:
         """Add a product to an order."""
 
-        # Ensure the order_id exists before adding the product
-        if not await OrderUtils.exist_order(db_session, order_product.order_id):
-            raise HTTPException(detail="Order not found", status_code=404)
-
-        if await OrderCrud.read_order_status(db_session, order_product.order_id) is OrderStatus.COMPLETED:
-            raise HTTPException(detail="Cannot add product to a completed order", status_code=400)
+        # Only pending orders accept lines, the row stays locked until commit
+        if await OrderUtils.lock_order_status(db_session, order_product.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Cannot add product to an order that is not pending", status_code=400)
 
         # Import ProductUtils directly from its file path
         from utils import ProductUtils
@@ -302,24 +524,20 @@ class OrderCrud:
         if not await ProductUtils.exist_product(db_session, order_product.product_id):
             raise HTTPException(detail="Product not found", status_code=404)
         
-        from models import Product
+        from services import OrderService as OrderServiceService
         
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_product.order_id))
-            order = response.one()
-                
-            response = await db_session.exec(select(Product.price).where(Product.id == order_product.product_id))
-            price_product = response.one()
-
-            order.total_price = (order_product.quantity * price_product) + order.total_price
+            # El precio unitario solo lo fija la orden al completarse
+            new_order_product = await OrderCrud.insert_returning(db_session, OrderProduct, order_product.model_dump(exclude={"unit_price"}))
+            
+            # El precio se lee dentro del mismo UPDATE, sin traer la orden ni el producto
+            await OrderServiceService.add_to_total(db_session, order_product.order_id,
+                                                   OrderServiceService.product_amount(order_product.product_id, order_product.quantity))
 
-            db_session.add(order)
-            db_session.add(order_product)
             await db_session.commit()
             
-            await db_session.refresh(order_product)
-            return order_product
+            return new_order_product
         
         except Exception as e:
             await db_session.rollback()
@@ -330,26 +548,39 @@ class OrderCrud:
     async def update_order_product(db_session: AsyncSession, order_product: OrderProduct) -> OrderProduct:
         """Update order product"""
         
-        # Check if the order product exists before attempting to update
-        if not await OrderUtils.exist_order_product(db_session, order_product):
-            raise HTTPException(detail="Order product not found", status_code=404)
+        if await OrderUtils.lock_order_status(db_session, order_product.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Order product in an order that is not pending", status_code=400)
         
-        if await OrderUtils.order_product_in_order_completed(db_session, order_product):
-            raise HTTPException(detail="Order product in order completed", status_code=404)
+        from services import OrderService as OrderServiceService
 
         try:
             
-            response = await db_session.exec(select(OrderProduct).where(OrderProduct.order_id == order_product.order_id).where(OrderProduct.product_id == order_product.product_id))
-            _order_product = response.one()
+            # La fila queda bloqueada hasta el commit: la diferencia de cantidad es exacta
+            response = await db_session.exec(select(OrderProduct.quantity)
+                                             .where(OrderProduct.order_id == order_product.order_id)
+                                             .where(OrderProduct.product_id == order_product.product_id)
+                                             .with_for_update())
+            quantity = response.first()
             
-            _order_product.quantity = order_product.quantity
-
-            db_session.add(_order_product)
+            if quantity is None:
+                raise HTTPException(detail="Order product not found", status_code=404)
+            
+            _order_product = await OrderCrud.update_returning(db_session, OrderProduct,
+                                                              [OrderProduct.order_id == order_product.order_id,
+                                                               OrderProduct.product_id == order_product.product_id],
+                                                              {"quantity": order_product.quantity},
+                                                              not_found="Order product not found")
+            
+            await OrderServiceService.add_to_total(db_session, order_product.order_id,
+                                                   OrderServiceService.product_amount(order_product.product_id, order_product.quantity - quantity))
             
             await db_session.commit()
-            await db_session.refresh(order_product)
 
-            return order_product
+            return _order_product
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
         
         except Exception as e:
             await db_session.rollback()
@@ -367,6 +598,15 @@ class OrderCrud:
             raise HTTPException(detail="Product not found", status_code=404)
 
         try:
+            
+            # Las ordenes pendientes pierden el importe de esas lineas, una por orden por la clave primaria
+            await db_session.exec(update(Order)
+                                  .where(Order.id == OrderProduct.order_id,
+                                         OrderProduct.product_id == product_id,
+                                         Product.id == product_id,
+                                         Order.status == OrderStatus.PENDING)
+                                  .values(total_price=Order.total_price - OrderProduct.quantity * Product.price)
+                                  .execution_options(synchronize_session=False))
 
             await db_session.exec(delete(OrderProduct).where(OrderProduct.product_id == product_id))
                 
@@ -380,20 +620,33 @@ class OrderCrud:
     async def delete_order_product(db_session: AsyncSession, order_product: OrderProduct) -> bool:
         """Delete an order product"""
         
-        # Check if the order product exists before attempting to delete
-        if not await OrderUtils.exist_order_product(db_session, order_product):
-            raise HTTPException(detail="Order product not found", status_code=404)
-
-        if await OrderUtils.order_product_in_order_completed(db_session, order_product):
-            raise HTTPException(detail="Order product in order completed", status_code=404)
+        if await OrderUtils.lock_order_status(db_session, order_product.order_id) != OrderStatus.PENDING:
+            raise HTTPException(detail="Order product in an order that is not pending", status_code=400)
 
+        from services import OrderService as OrderServiceService
+        
         try:
             
-            await db_session.delete(order_product)
+            response = await db_session.exec(delete(OrderProduct)
+                                             .where(OrderProduct.order_id == order_product.order_id)
+                                             .where(OrderProduct.product_id == order_product.product_id)
+                                             .returning(OrderProduct.quantity))
+            quantity = response.scalars().first()
+            
+            if quantity is None:
+                raise HTTPException(detail="Order product not found", status_code=404)
+            
+            await OrderServiceService.add_to_total(db_session, order_product.order_id,
+                                                   OrderServiceService.product_amount(order_product.product_id, -quantity))
+            
             await db_session.commit()
             
             return True
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to delete order product", status_code=500) from e
\ No newline at end of file
@@ -2,14 +2,13 @@ from fastapi import HTTPException
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import Payment
+from models import Payment, PaymentStatus, LoadProfile
 from utils import PaymentUtils
 from dtos import PaymentCreate, PaymentUpdate
 from core import log_operation
+from crud.base import BaseCrud
 
-class PaymentCrud:
-    
-    EXCLUDED_FIELDS_FOR_UPDATE = {"id"}
+class PaymentCrud(BaseCrud):
     
     @staticmethod
     @log_operation(True)
@@ -19,11 +18,15 @@ class PaymentCrud:
         try:
             
             # Create the payment
-            new_payment = Payment(**payment.model_dump(exclude_unset=True))
-            db_session.add(new_payment)
+            new_payment = await PaymentCrud.insert_returning(db_session, Payment, payment.model_dump(exclude_unset=True))
+            
+            if new_payment.status == PaymentStatus.COMPLETED:
+                
+                from services import AnalyticsService
+                
+                await AnalyticsService.record_payment(db_session, new_payment.created_at, new_payment.method, new_payment.amount)
             
             await db_session.commit()
-            await db_session.refresh(new_payment)
             
             return new_payment
         
@@ -33,11 +36,11 @@ class PaymentCrud:
     
     @staticmethod
     @log_operation(True)
-    async def read_payment(db_session: AsyncSession, payment_id: int) -> Payment:
+    async def read_payment(db_session: AsyncSession, payment_id: int, profile: tuple = LoadProfile.NONE) -> Payment:
         """Retrieve a payment by ID."""
         try:
 
-            response = await db_session.exec(select(Payment).where(Payment.id == payment_id))
+            response = await db_session.exec(select(Payment).options(*profile).where(Payment.id == payment_id))
             payment = response.first()
 
             if payment is None:
@@ -53,28 +56,35 @@ class PaymentCrud:
     async def update_payment(db_session: AsyncSession, fields: PaymentUpdate) -> Payment:
         """Update an existing payment."""
 
-        # check if payment exists
-        if not await PaymentUtils.exist_payment(db_session, fields.id):
-            raise HTTPException(detail="Payment not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Payment).where(Payment.id == fields.id))
-            payment = response.one()
+            from services import AnalyticsService
+            
+            # Valores previos, bloqueados hasta el commit, para sacar el pago del rollup
+            response = await db_session.exec(select(Payment.status, Payment.created_at, Payment.method, Payment.amount)
+                                             .where(Payment.id == fields.id)
+                                             .with_for_update())
+            previous = response.first()
             
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                    
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE:
-                    continue
-                    
-                setattr(payment, key, value)
+            payment = await PaymentCrud.update_returning(db_session, Payment,
+                                                         [Payment.id == fields.id],
+                                                         fields.model_dump(exclude_unset=True),
+                                                         PaymentCrud.EXCLUDED_FIELDS_FOR_UPDATE,
+                                                         "Payment not found")
+            
+            if previous.status == PaymentStatus.COMPLETED:
+                await AnalyticsService.record_payment(db_session, previous.created_at, previous.method, previous.amount, sign=-1)
+            
+            if payment.status == PaymentStatus.COMPLETED:
+                await AnalyticsService.record_payment(db_session, payment.created_at, payment.method, payment.amount)
 
-            db_session.add(payment)
             await db_session.commit()
-            
-            await db_session.refresh(payment)
             return payment
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to update payment", status_code=500) from e
@@ -90,8 +100,15 @@ class PaymentCrud:
         try:
             
             response = await db_session.exec(select(Payment).where(Payment.id == payment_id))
+            payment = response.one()
+            
+            if payment.status == PaymentStatus.COMPLETED:
+                
+                from services import AnalyticsService
+                
+                await AnalyticsService.record_payment(db_session, payment.created_at, payment.method, payment.amount, sign=-1)
 
-            await db_session.delete(response.one())
+            await db_session.delete(payment)
             await db_session.commit()
             
             return True
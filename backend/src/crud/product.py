@@ -1,50 +1,138 @@
 from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, delete
+from sqlalchemy.exc import IntegrityError
 from botocore.client import BaseClient
 
-from models import Product, ProductCategory, Category
-from utils import ProductUtils
-from dtos import ProductCreate, ProductUpdate, CategoryCreate, CategoryUpdate
-from core import log_operation
+from models import Product, ProductCategory, ProductBarcode, Category, MovementKind, StockMovement, StockSnapshot, LoadProfile
+from utils import ProductUtils, ExistsUtils
+from db import insert_on_conflict, background_session, is_primary
+from dtos import (
+    ProductCreate, ProductUpdate, CategoryCreate, CategoryUpdate, CategoryMembershipResult,
+    ProductImportError, ProductImportResult
+)
+from core import SETTINGS, CATALOG_CACHE, CatalogCache, log_operation
+from crud.base import BaseCrud
 
-class ProductCrud:
-    
-    EXCLUDED_FIELDS_FOR_UPDATE = {"id"}
+class ProductCrud(BaseCrud):
 
     @staticmethod
     @log_operation(True)
     async def create_product(db_session: AsyncSession, product: ProductCreate) -> Product:
         """Create a new product."""
+        
+        if product.sku is not None and await ProductUtils.sku_in_use(db_session, product.sku):
+            raise HTTPException(detail="SKU already in use", status_code=409)
                     
         try:
             
-            new_product = Product(**product.model_dump(exclude_unset=True))
-            db_session.add(new_product)
+            new_product = await ProductCrud.insert_returning(db_session, Product, product.model_dump(exclude_unset=True))
 
             await db_session.commit()
-            await db_session.refresh(new_product)
             
             return new_product
         
         except Exception as e:
             await db_session.rollback()
-            raise HTTPException(status_code=500, detail="Service creation failed") from e
+            raise HTTPException(status_code=500, detail="Product creation failed") from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def import_products(db_session: AsyncSession, file: UploadFile) -> ProductImportResult:
+        """Create or update products from a CSV or XLSX file; invalid rows are reported and skipped."""
+        
+        from services import ProductImportService
+        
+        rows, failed = 0, 0
+        errors: list[ProductImportError] = []
+        
+        try:
+            
+            await ProductImportService.create_staging(db_session)
+            
+            # Lectura y validacion en un hilo, una tanda a la vez: la memoria no crece con el archivo
+            chunks = ProductImportService.read_chunks(file, SETTINGS.product_import_chunk_size)
+            
+            while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+                
+                rows += chunk.rows
+                failed += len(chunk.errors)
+                errors.extend(chunk.errors[:SETTINGS.product_import_max_errors - len(errors)])
+                
+                await ProductImportService.stage(db_session, chunk.records)
+            
+            duplicated, inserted, updated, ambiguous = await ProductImportService.merge(db_session)
+            
+            # Un nombre repetido en el catalogo no dice que producto actualizar: la fila necesita su sku
+            failed += len(ambiguous)
+            errors.extend(ProductImportError(row=row, errors=["name: matches several products, add the sku to choose one"])
+                          for row in ambiguous[:SETTINGS.product_import_max_errors - len(errors)])
+            
+            if updated:
+                await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, updated)
+            
+            await db_session.commit()
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
+        # El indice unico de sku rechaza el archivo entero, nada queda a medias
+        except IntegrityError as e:
+            await db_session.rollback()
+            raise HTTPException(detail="The file assigns a SKU already used by another product", status_code=409) from e
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Product import failed", status_code=500) from e
+        
+        return ProductImportResult(rows=rows,
+                                   inserted=len(inserted),
+                                   updated=len(updated),
+                                   duplicated=duplicated,
+                                   failed=failed,
+                                   errors=errors,
+                                   errors_truncated=failed > len(errors))
     
     @staticmethod
     @log_operation(True)
-    async def read_product(db_session: AsyncSession, product_id: int) -> Product:
-        """Retrieve a product by ID."""
+    async def read_product(db_session: AsyncSession, product_id: int, profile: tuple = LoadProfile.NONE) -> Product:
+        """Retrieve a product by ID, with the current stock from the ledger."""
+        
+        from services import ProductService
+        
+        # Solo la fila sola se cachea, las relaciones se cargan siempre de la base
+        if not profile:
+            
+            product = CATALOG_CACHE.get(CatalogCache.PRODUCT, product_id)
+            
+            # Las ventas no invalidan la cache: el stock se lee del libro en cada lectura
+            if product is not None:
+                return await ProductService.with_current_stock(db_session, product)
+            
+            # La replica puede no tener aun la escritura que invalido la entrada: lo que se cachea sale del primario
+            if not is_primary(db_session):
+                async with background_session() as primary_session:
+                    return await ProductCrud.read_product(primary_session, product_id)
+        
+        generation = CATALOG_CACHE.generation
         
         try:
             
-            response = await db_session.exec(select(Product).where(Product.id == product_id))
+            response = await db_session.exec(select(Product).options(*profile).where(Product.id == product_id))
             product = response.first()
             
             if product is None:
                 raise HTTPException(detail="Product not found", status_code=404)
             
-            return product
+            if not profile:
+                CATALOG_CACHE.put(CatalogCache.PRODUCT, product_id, product, generation)
+            
+            return await ProductService.with_current_stock(db_session, product)
+        
+        except HTTPException:
+            raise
         
         except Exception as e:
             raise HTTPException(detail="Product search failed", status_code=500) from e
@@ -54,27 +142,29 @@ class ProductCrud:
     async def update_product(db_session: AsyncSession, fields: ProductUpdate) -> Product:
         """Update an existing product."""
         
-        # Check if the product exists before attempting to update
-        if not await ProductUtils.exist_product(db_session, fields.id):
-            raise HTTPException(detail="Product not found", status_code=404)
+        from services import ProductService
+        
+        if fields.sku is not None and await ProductUtils.sku_in_use(db_session, fields.sku, fields.id):
+            raise HTTPException(detail="SKU already in use", status_code=409)
         
         try:
             
-            response = await db_session.exec(select(Product).where(Product.id == fields.id))
-            product = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                    
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE:
-                    continue
-                    
-                setattr(product, key, value)
+            product = await ProductCrud.update_returning(db_session, Product,
+                                                         [Product.id == fields.id],
+                                                         fields.model_dump(exclude_unset=True),
+                                                         ProductCrud.EXCLUDED_FIELDS_FOR_UPDATE,
+                                                         "Product not found")
 
-            db_session.add(product)
+            product = await ProductService.with_current_stock(db_session, product)
+
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [product.id])
+            
             await db_session.commit()
-                
-            await db_session.refresh(product)
             return product
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
             
         except Exception as e:
             await db_session.rollback()
@@ -84,30 +174,46 @@ class ProductCrud:
     @log_operation(True)
     async def update_stock(db_session: AsyncSession, product_id: int, new_stock: int, replace: bool = True) -> Product:
         """Update the stock of a product by ID."""
-
-        # Check if the product exists before attempting to update stock
+        
         if not await ProductUtils.exist_product(db_session, product_id):
             raise HTTPException(detail="Product not found", status_code=404)
+        
+        from services import InventoryService
+
         try:
             
-            response = await db_session.exec(select(Product).where(Product.id == product_id))
-            product = response.one()
-
             if replace:
-                product.stock = new_stock
+                # Un conteo fisico se registra como ajuste por la diferencia. La fila queda bloqueada hasta
+                # el commit: dos conteos simultaneos al mismo valor no anotan dos veces la diferencia
+                await db_session.exec(select(Product.id).where(Product.id == product_id).with_for_update())
+                
+                current = await InventoryService.current_stock(db_session, [product_id])
+                quantity, kind = new_stock - current[product_id], MovementKind.ADJUSTMENT
             else:
-                product.stock += new_stock
-
-            if product.stock < 0:
-                product.stock = 0
-
-            db_session.add(product)
+                quantity, kind = new_stock, MovementKind.RESTOCK if new_stock > 0 else MovementKind.ADJUSTMENT
+            
+            # Solo se anexa al libro de movimientos, la fila del producto no se bloquea
+            if quantity:
+                await InventoryService.record(db_session, product_id, quantity, kind)
+            
+            current = InventoryService.current_stock_query([product_id]).subquery()
+            response = await db_session.exec(select(Product, current.c.stock).join(current, current.c.product_id == Product.id))
+            product, stock = response.one()
+            
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [product_id])
             
             await db_session.commit()
-            await db_session.refresh(product)
+            
+            # Product.stock solo se materializa en cada snapshot, se responde con el valor actual
+            db_session.expunge(product)
+            product.stock = stock
             
             return product
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Stock update failed", status_code=500) from e
@@ -117,30 +223,40 @@ class ProductCrud:
     async def update_image(db_session: AsyncSession, storage_client: BaseClient, product_id: int, image: UploadFile) -> Product:
         """Update the image of a product by ID."""
 
+        from services import ProductService
+
+        # La fila queda bloqueada hasta el commit: dos cambios de imagen no sueltan dos veces la misma referencia
+        response = await db_session.exec(select(Product.image_key).where(Product.id == product_id).with_for_update())
+        old_image_key = response.first()
+
         # Check if the product exists before attempting to update the image
-        if not await ProductUtils.exist_product(db_session, product_id):
+        if old_image_key is None and not await ProductUtils.exist_product(db_session, product_id):
             raise HTTPException(detail="Product not found", status_code=404)
         
         try:
-            
-            response = await db_session.exec(select(Product).where(Product.id == product_id))
-            product = response.one()
 
-            old_image_key = product.image_key 
+            image_key = await ProductUtils.upload_image(db_session, storage_client, image)
+
+            # Con la misma imagen la referencia nueva compensa la que se suelta
+            if old_image_key is not None:
+                await ProductUtils.release_image(db_session, old_image_key)
 
-            image_key = await ProductUtils.upload_image(storage_client, image)
+            product = await ProductCrud.update_returning(db_session, Product,
+                                                         [Product.id == product_id],
+                                                         {"image_key": image_key},
+                                                         not_found="Product not found")
 
-            product.image_key = image_key
+            product = await ProductService.with_current_stock(db_session, product)
 
-            db_session.add(product)
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [product_id])
 
             await db_session.commit()
-            await db_session.refresh(product)
-            
-            if not old_image_key is None:
-                await ProductUtils.delete_image(storage_client, old_image_key)
             
             return product
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
     
         except Exception as e:
             await db_session.rollback()
@@ -148,8 +264,10 @@ class ProductCrud:
     
     @staticmethod
     @log_operation(True)
-    async def delete_product(db_session: AsyncSession, storage_client: BaseClient, product_id: int) -> bool:
+    async def delete_product(db_session: AsyncSession, product_id: int) -> bool:
         """Delete a product by ID."""
+        
+        from services import CatalogService
 
         # Check if the product exists before attempting to delete
         if not await ProductUtils.exist_product(db_session, product_id):
@@ -161,21 +279,27 @@ class ProductCrud:
         if await OrderUtils.exist_product_in_orders(db_session, product_id):
             raise HTTPException(detail="Cannot delete product associated with orders", status_code=400)
         
+        # Los consumos de servicios vendidos tambien son historia de ordenes
+        if await ProductUtils.exist_order_movements(db_session, product_id):
+            raise HTTPException(detail="Cannot delete product with stock movements from orders", status_code=400)
+        
         try:
 
-            image_key = None
-
-            response = await db_session.exec(select(Product).where(Product.id == product_id))
+            response = await db_session.exec(select(Product).where(Product.id == product_id).with_for_update())
             product = response.one()
 
+            # El objeto lo borra el barrido de imagenes si ningun otro producto lo usa
             if not product.image_key is None:
-                image_key = product.image_key
-
-            await db_session.delete(response.one())
+                await ProductUtils.release_image(db_session, product.image_key)
+
+            # Sin ordenes, el libro del producto son solo reposiciones y ajustes: se van con el
+            await db_session.exec(delete(StockMovement).where(StockMovement.product_id == product_id))
+            await db_session.exec(delete(StockSnapshot).where(StockSnapshot.product_id == product_id))
+            await db_session.exec(delete(ProductBarcode).where(ProductBarcode.product_id == product_id))
+            await db_session.delete(product)
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [product_id])
+            await CatalogService.record_deletions(db_session, CatalogCache.PRODUCT, [product_id])
             await db_session.commit()
-            
-            if not image_key is None:
-                await ProductUtils.delete_image(storage_client, image_key)
 
             return True
         
@@ -188,6 +312,8 @@ class ProductCrud:
     async def create_product_category(db_session: AsyncSession, product_category: ProductCategory) -> ProductCategory:
         """Create a new product category."""
         
+        from services import CatalogService
+        
         if not await ProductUtils.exist_product(db_session, product_category.product_id):
             raise HTTPException(detail="Product not found", status_code=404)
         
@@ -196,12 +322,13 @@ class ProductCrud:
 
         try:
 
-            db_session.add(product_category)
+            new_product_category = await ProductCrud.insert_returning(db_session, ProductCategory, product_category.model_dump())
+            
+            await CatalogService.touch_products(db_session, [new_product_category.product_id])
             
             await db_session.commit()
-            await db_session.refresh(product_category)
             
-            return product_category
+            return new_product_category
         
         except Exception as e:
             await db_session.rollback()
@@ -211,6 +338,8 @@ class ProductCrud:
     @log_operation(True)
     async def delete_product_category(db_session: AsyncSession, product_category: ProductCategory) -> bool:
         """Delete a product category by ID."""
+        
+        from services import CatalogService
 
         # Check if the category exists before attempting to delete
         if not await ProductUtils.exist_product_category(db_session, product_category):
@@ -221,6 +350,7 @@ class ProductCrud:
             response = await db_session.exec(select(ProductCategory).where(ProductCategory.product_id == product_category.product_id, ProductCategory.category_id == product_category.category_id))
 
             await db_session.delete(response.one())
+            await CatalogService.touch_products(db_session, [product_category.product_id])
             await db_session.commit()
             
             return True
@@ -229,6 +359,174 @@ class ProductCrud:
             await db_session.rollback()
             raise HTTPException(detail="Product category deletion failed", status_code=500) from e
 
+    @staticmethod
+    @log_operation(True)
+    async def scan_product(db_session: AsyncSession, code: str) -> Product:
+        """Retrieve the product of a scanned barcode or SKU."""
+        
+        from services import ProductService
+        
+        try:
+            
+            product_id = await ProductService.lookup_code(db_session, code)
+        
+        except Exception as e:
+            raise HTTPException(detail="Product scan failed", status_code=500) from e
+        
+        if product_id is None:
+            raise HTTPException(detail="No product has this code", status_code=404)
+        
+        return await ProductCrud.read_product(db_session, product_id)
+    
+    @staticmethod
+    @log_operation(True)
+    async def read_barcodes(db_session: AsyncSession, product_id: int) -> list[ProductBarcode]:
+        """Retrieve the barcodes of a product."""
+        
+        if not await ProductUtils.exist_product(db_session, product_id):
+            raise HTTPException(detail="Product not found", status_code=404)
+        
+        try:
+            
+            response = await db_session.exec(select(ProductBarcode).where(ProductBarcode.product_id == product_id).order_by(ProductBarcode.code))
+            
+            return list(response.all())
+        
+        except Exception as e:
+            raise HTTPException(detail="Barcode search failed", status_code=500) from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def create_barcode(db_session: AsyncSession, barcode: ProductBarcode) -> ProductBarcode:
+        """Add a barcode to a product."""
+        
+        if not await ProductUtils.exist_product(db_session, barcode.product_id):
+            raise HTTPException(detail="Product not found", status_code=404)
+        
+        if await ExistsUtils.exists(db_session, ProductBarcode, code=barcode.code):
+            raise HTTPException(detail="Barcode already in use", status_code=409)
+        
+        try:
+            
+            new_barcode = await ProductCrud.insert_returning(db_session, ProductBarcode, barcode.model_dump())
+            
+            # El codigo de barras gana sobre un SKU igual: el producto de ese SKU tambien suelta el codigo
+            response = await db_session.exec(select(Product.id).where(Product.sku == new_barcode.code))
+            
+            # Los demas workers sueltan los codigos de los productos y los recargan de la base
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [new_barcode.product_id, *response.all()])
+            
+            await db_session.commit()
+            
+            return new_barcode
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Barcode creation failed", status_code=500) from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def delete_barcode(db_session: AsyncSession, code: str) -> bool:
+        """Remove a barcode from its product."""
+        
+        response = await db_session.exec(select(ProductBarcode).where(ProductBarcode.code == code))
+        barcode = response.first()
+        
+        if barcode is None:
+            raise HTTPException(detail="Barcode not found", status_code=404)
+        
+        try:
+            
+            await db_session.delete(barcode)
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [barcode.product_id])
+            await db_session.commit()
+            
+            return True
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Barcode deletion failed", status_code=500) from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def assign_products_to_category(db_session: AsyncSession, category_id: int, product_ids: list[int]) -> list[CategoryMembershipResult]:
+        """Assign many products to a category with one insert; pairs already present are left as they are."""
+        
+        from services import CatalogService
+        
+        if not await ProductUtils.exist_category(db_session, category_id):
+            raise HTTPException(detail="Category not found", status_code=404)
+        
+        product_ids = list(dict.fromkeys(product_ids))
+        found = await ExistsUtils.existing(db_session, Product.id, product_ids)
+        
+        try:
+            
+            inserted = set()
+            
+            if found:
+                
+                stmt = (insert_on_conflict(db_session, ProductCategory)
+                        .values([{"product_id": product_id, "category_id": category_id} for product_id in found])
+                        .on_conflict_do_nothing(index_elements=["product_id", "category_id"])
+                        .returning(ProductCategory.product_id))
+                
+                response = await db_session.exec(stmt)
+                inserted = set(response.scalars().all())
+            
+            await CatalogService.touch_products(db_session, inserted)
+            
+            await db_session.commit()
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to assign products to category", status_code=500) from e
+        
+        return [CategoryMembershipResult(product_id=product_id,
+                                         status="product_not_found" if product_id not in found
+                                         else "assigned" if product_id in inserted
+                                         else "already_assigned")
+                for product_id in product_ids]
+    
+    @staticmethod
+    @log_operation(True)
+    async def unassign_products_from_category(db_session: AsyncSession, category_id: int, product_ids: list[int]) -> list[CategoryMembershipResult]:
+        """Remove many products from a category with one delete."""
+        
+        from services import CatalogService
+        
+        if not await ProductUtils.exist_category(db_session, category_id):
+            raise HTTPException(detail="Category not found", status_code=404)
+        
+        product_ids = list(dict.fromkeys(product_ids))
+        found = await ExistsUtils.existing(db_session, Product.id, product_ids)
+        
+        try:
+            
+            removed = set()
+            
+            if found:
+                
+                response = await db_session.exec(delete(ProductCategory)
+                                                 .where(ProductCategory.category_id == category_id,
+                                                        ProductCategory.product_id.in_(found))
+                                                 .returning(ProductCategory.product_id))
+                removed = set(response.scalars().all())
+            
+            await CatalogService.touch_products(db_session, removed)
+            
+            await db_session.commit()
+        
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to remove products from category", status_code=500) from e
+        
+        return [CategoryMembershipResult(product_id=product_id,
+                                         status="product_not_found" if product_id not in found
+                                         else "unassigned" if product_id in removed
+                                         else "not_assigned")
+                for product_id in product_ids]
+
     @staticmethod
     @log_operation(True)
     async def create_category(db_session: AsyncSession, category: CategoryCreate) -> Category:
@@ -236,11 +534,9 @@ class ProductCrud:
         
         try:
             
-            new_category = Category(**category.model_dump(exclude_unset=True))
-            db_session.add(new_category)
+            new_category = await ProductCrud.insert_returning(db_session, Category, category.model_dump(exclude_unset=True))
             
             await db_session.commit()
-            await db_session.refresh(new_category)
             
             return new_category
         
@@ -250,19 +546,39 @@ class ProductCrud:
     
     @staticmethod
     @log_operation(True)
-    async def read_category(db_session: AsyncSession, category_id: int) -> Category:
+    async def read_category(db_session: AsyncSession, category_id: int, profile: tuple = LoadProfile.NONE) -> Category:
         """Retrieve a product category by ID."""
         
+        if not profile:
+            
+            category = CATALOG_CACHE.get(CatalogCache.CATEGORY, category_id)
+            
+            if category is not None:
+                return category
+            
+            # La replica puede no tener aun la escritura que invalido la entrada: lo que se cachea sale del primario
+            if not is_primary(db_session):
+                async with background_session() as primary_session:
+                    return await ProductCrud.read_category(primary_session, category_id)
+        
+        generation = CATALOG_CACHE.generation
+        
         try:
             
-            response = await db_session.exec(select(Category).where(Category.id == category_id))
+            response = await db_session.exec(select(Category).options(*profile).where(Category.id == category_id))
             category = response.first()
 
             if category is None:
                 raise HTTPException(detail="Category not found", status_code=404)
 
+            if not profile:
+                CATALOG_CACHE.put(CatalogCache.CATEGORY, category_id, category, generation)
+
             return category
         
+        except HTTPException:
+            raise
+        
         except Exception as e:
             raise HTTPException(detail="Failed to retrieve category", status_code=500) from e
     
@@ -271,28 +587,23 @@ class ProductCrud:
     async def update_category(db_session: AsyncSession, fields: CategoryUpdate) -> Category:
         """Update an existing product category."""
         
-        # Check if the category exists before attempting to update
-        if not await ProductUtils.exist_category(db_session, fields.id):
-            raise HTTPException(detail="Category not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Category).where(Category.id ==fields.id))
-            category = response.one()
-
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                    
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE:
-                    continue
+            category = await ProductCrud.update_returning(db_session, Category,
+                                                          [Category.id == fields.id],
+                                                          fields.model_dump(exclude_unset=True),
+                                                          ProductCrud.EXCLUDED_FIELDS_FOR_UPDATE,
+                                                          "Category not found")
 
-                setattr(category, key, value)
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.CATEGORY, [category.id])
 
-            db_session.add(category)
             await db_session.commit()
-                
-            await db_session.refresh(category)
             return category
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Failed to update category", status_code=500) from e
@@ -301,6 +612,8 @@ class ProductCrud:
     @log_operation(True)
     async def delete_category(db_session: AsyncSession, category_id: int) -> bool:
         """Delete a product category by ID."""
+        
+        from services import CatalogService
 
         # Check if the category exists before attempting to delete
         if not await ProductUtils.exist_category(db_session, category_id):
@@ -308,9 +621,14 @@ class ProductCrud:
         
         try:
             
+            # Los productos de la categoria cambian su lista de categorias para los terminales
+            await CatalogService.touch_products(db_session, select(ProductCategory.product_id).where(ProductCategory.category_id == category_id))
+            
             response = await db_session.exec(select(Category).where(Category.id == category_id))
             
             await db_session.delete(response.one())
+            await CATALOG_CACHE.invalidate(db_session, CatalogCache.CATEGORY, [category_id])
+            await CatalogService.record_deletions(db_session, CatalogCache.CATEGORY, [category_id])
             await db_session.commit()
             
             return True
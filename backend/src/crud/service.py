@@ -2,14 +2,13 @@ from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
-from models import Service,  ServiceInput
+from models import Service,  ServiceInput, LoadProfile
 from utils import ServiceUtils
 from dtos import ServiceCreate, ServiceUpdate
 from core import log_operation
+from crud.base import BaseCrud
 
-class ServiceCrud:
-    
-    EXCLUDED_FIELDS_FOR_UPDATE = {"id"}
+class ServiceCrud(BaseCrud):
 
     @staticmethod
     @log_operation(True)
@@ -18,11 +17,9 @@ class ServiceCrud:
         
         try:
             
-            new_service = Service(**service.model_dump(exclude_unset=True))
-            db_session.add(new_service)
+            new_service = await ServiceCrud.insert_returning(db_session, Service, service.model_dump(exclude_unset=True))
             
-            await db_session.commit()    
-            await db_session.refresh(new_service)
+            await db_session.commit()
             
             return new_service
         
@@ -32,12 +29,12 @@ class ServiceCrud:
         
     @staticmethod
     @log_operation(True)
-    async def read_service(db_session: AsyncSession, service_id: int) -> Service:
+    async def read_service(db_session: AsyncSession, service_id: int, profile: tuple = LoadProfile.NONE) -> Service:
         """Retrieve a service by ID."""
         
         try:
             
-            result = await db_session.exec(select(Service).where(Service.id == service_id))
+            result = await db_session.exec(select(Service).options(*profile).where(Service.id == service_id))
             service = result.first()
 
             if service is None:
@@ -45,6 +42,9 @@ class ServiceCrud:
 
             return service
 
+        except HTTPException:
+            raise
+
         except Exception as e:
             raise HTTPException(detail="Service search failed", status_code=500) from e
         
@@ -56,29 +56,22 @@ class ServiceCrud:
         if fields.id is None:
             raise HTTPException(detail="Service ID is required", status_code=400)
         
-        # check if service exists
-        if not await ServiceUtils.exist_service(db_session, fields.id):
-            raise HTTPException(detail="Service not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Service).where(Service.id == fields.id))
-            service = response.one()
-
-            # update service
-            for key, value in fields.model_dump(exclude_unset=True).items():
+            # update service, 404 si no afecta ninguna fila
+            service = await ServiceCrud.update_returning(db_session, Service,
+                                                         [Service.id == fields.id],
+                                                         fields.model_dump(exclude_unset=True),
+                                                         ServiceCrud.EXCLUDED_FIELDS_FOR_UPDATE,
+                                                         "Service not found")
 
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE:
-                    continue
-
-                setattr(service, key, value)
-
-            db_session.add(service)
-            await db_session.commit()    
-                
-            await db_session.refresh(service)
+            await db_session.commit()
             return service
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+        
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Service update failed", status_code=500) from e
@@ -134,11 +127,9 @@ class ServiceCrud:
         try:
             
             # create service input
-            new_service_input = ServiceInput(**service_input.model_dump(exclude_unset=True))
-            db_session.add(new_service_input)
+            new_service_input = await ServiceCrud.insert_returning(db_session, ServiceInput, service_input.model_dump(exclude_unset=True))
             
-            await db_session.commit()    
-            await db_session.refresh(new_service_input)
+            await db_session.commit()
             
             return new_service_input
         
@@ -2,12 +2,13 @@ from fastapi import HTTPException
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import Client, Employee
+from models import Client, Employee, LoadProfile
 from utils import UserUtils
 from dtos import ClientCreate, ClientUpdate, EmployeeCreate, EmployeeUpdate
 from core import log_operation
+from crud.base import BaseCrud
 
-class UserCrud:
+class UserCrud(BaseCrud):
     """CRUD operations for users"""
     
     EXCLUDED_FIELDS_FOR_UPDATE_USER = {"id", "documentid"}
@@ -19,11 +20,9 @@ class UserCrud:
         
         try:
             
-            new_employee = Employee(**employee.model_dump(exclude_unset=True))
-            db_session.add(new_employee)
+            new_employee = await UserCrud.insert_returning(db_session, Employee, employee.model_dump(exclude_unset=True))
 
             await db_session.commit()
-            await db_session.refresh(new_employee)
             
             return new_employee
         
@@ -33,12 +32,12 @@ class UserCrud:
 
     @staticmethod
     @log_operation(True)
-    async def read_employee(db_session: AsyncSession, employee_id: int) -> Employee:
+    async def read_employee(db_session: AsyncSession, employee_id: int, profile: tuple = LoadProfile.NONE) -> Employee:
         """Retrieve an employee by ID."""
         
         try:
 
-            response = await db_session.exec(select(Employee).where(Employee.id == employee_id))
+            response = await db_session.exec(select(Employee).options(*profile).where(Employee.id == employee_id))
             employee = response.first()
             
             if employee is None:
@@ -51,12 +50,12 @@ class UserCrud:
 
     @staticmethod
     @log_operation(True)
-    async def read_employee_by_email(db_session: AsyncSession, email: str) -> Employee:
+    async def read_employee_by_email(db_session: AsyncSession, email: str, profile: tuple = LoadProfile.NONE) -> Employee:
         """Retrieve an employee by email."""
         
         try:
         
-            response = await db_session.exec(select(Employee).where(Employee.email == email))
+            response = await db_session.exec(select(Employee).options(*profile).where(Employee.email == email))
             employee = response.first()
             
             if employee is None:
@@ -69,12 +68,12 @@ class UserCrud:
     
     @staticmethod
     @log_operation(True)
-    async def read_employee_by_documentid(db_session: AsyncSession, document_id: int) -> Employee:
+    async def read_employee_by_documentid(db_session: AsyncSession, document_id: int, profile: tuple = LoadProfile.NONE) -> Employee:
         """Retrieve an employee by document ID."""
         
         try:
 
-            response = await db_session.exec(select(Employee).where(Employee.documentid == document_id))
+            response = await db_session.exec(select(Employee).options(*profile).where(Employee.documentid == document_id))
             employee = response.first()
         
             if employee is None:
@@ -93,26 +92,20 @@ class UserCrud:
         if fields.id is None:
             raise HTTPException(detail="Employee ID is required", status_code=400)
         
-        if not await UserUtils.exist_employee(db_session, fields.id):
-            raise HTTPException(detail="Employee not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.id == fields.id))
-            employee = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                
-                    if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                        continue
-                
-                    setattr(employee, key, value)
+            employee = await UserCrud.update_returning(db_session, Employee,
+                                                       [Employee.id == fields.id],
+                                                       fields.model_dump(exclude_unset=True),
+                                                       UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER,
+                                                       "Employee not found")
 
-            db_session.add(employee)
             await db_session.commit()
-            
-            await db_session.refresh(employee)
             return employee
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
 
         except Exception as e:
             await db_session.rollback()
@@ -126,29 +119,21 @@ class UserCrud:
         if fields.email is None:
             raise HTTPException(detail="Employee email is required", status_code=400)
 
-        if not await UserUtils.exist_employee_by_email(db_session, fields.email):
-            raise HTTPException(detail="Employee not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.email == fields.email))
-            employee = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
-                
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                    continue
-                if key == "email":
-                    continue
+            employee = await UserCrud.update_returning(db_session, Employee,
+                                                       [Employee.email == fields.email],
+                                                       fields.model_dump(exclude_unset=True),
+                                                       UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER | {"email"},
+                                                       "Employee not found")
 
-                setattr(employee, key, value)
-            
-            db_session.add(employee)
             await db_session.commit()
-
-            await db_session.refresh(employee)
             return employee
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Employee update failed", status_code=500) from e
@@ -162,26 +147,20 @@ class UserCrud:
         if fields.documentid is None:
             raise HTTPException(detail="Employee document ID is required", status_code=400)
 
-        if not await UserUtils.exist_employee_by_documentid(db_session, fields.documentid):
-            raise HTTPException(detail="Employee not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.documentid == fields.documentid))
-            employee = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
+            employee = await UserCrud.update_returning(db_session, Employee,
+                                                       [Employee.documentid == fields.documentid],
+                                                       fields.model_dump(exclude_unset=True),
+                                                       UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER,
+                                                       "Employee not found")
 
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                    continue
-                    
-                setattr(employee, key, value)
-
-            db_session.add(employee)
             await db_session.commit()
-                
-            await db_session.refresh(employee)
             return employee
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
 
         except Exception as e:
             await db_session.rollback()
@@ -279,11 +258,9 @@ class UserCrud:
         
         try:
                 
-            client = Client(**client_.model_dump(exclude_unset=True))
-            db_session.add(client)
+            client = await UserCrud.insert_returning(db_session, Client, client_.model_dump(exclude_unset=True))
             
             await db_session.commit()
-            await db_session.refresh(client)
             
             return client
         
@@ -293,12 +270,12 @@ class UserCrud:
     
     @staticmethod
     @log_operation(True)
-    async def read_client(db_session: AsyncSession, client_id: int) -> Client:
+    async def read_client(db_session: AsyncSession, client_id: int, profile: tuple = LoadProfile.NONE) -> Client:
         """Retrieve a client by ID."""
         
         try:
 
-            response = await db_session.exec(select(Client).where(Client.id == client_id))
+            response = await db_session.exec(select(Client).options(*profile).where(Client.id == client_id))
             client = response.first()
 
             if client is None:
@@ -306,17 +283,20 @@ class UserCrud:
 
             return client
 
+        except HTTPException:
+            raise
+
         except Exception as e:
             raise HTTPException(detail="Client retrieval failed", status_code=500) from e
     
     @staticmethod
     @log_operation(True)
-    async def read_client_by_email(db_session: AsyncSession, email: str) -> Client:
+    async def read_client_by_email(db_session: AsyncSession, email: str, profile: tuple = LoadProfile.NONE) -> Client:
         """Retrieve a client by email."""
         
         try:
 
-            response = await db_session.exec(select(Client).where(Client.email == email))
+            response = await db_session.exec(select(Client).options(*profile).where(Client.email == email))
             client = response.first()
 
             if client is None:
@@ -329,11 +309,11 @@ class UserCrud:
     
     @staticmethod
     @log_operation(True)
-    async def read_client_by_documentid(db_session: AsyncSession, document_id: int) -> Client:   
+    async def read_client_by_documentid(db_session: AsyncSession, document_id: int, profile: tuple = LoadProfile.NONE) -> Client:   
         """Retrieve a client by document ID."""
         try:
 
-            response = await db_session.exec(select(Client).where(Client.documentid == document_id))
+            response = await db_session.exec(select(Client).options(*profile).where(Client.documentid == document_id))
             client = response.first()
 
             if client is None:
@@ -352,26 +332,20 @@ class UserCrud:
         if fields.id is None:
             raise HTTPException(detail="Client ID is required", status_code=400)
 
-        if not await UserUtils.exist_client(db_session, fields.id):
-            raise HTTPException(detail="Client not found", status_code=404)
-
         try:
             
-            response = await db_session.exec(select(Client).where(Client.id == fields.id))
-            client = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
-
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                    continue
-                
-                setattr(client, key, value)    
+            client = await UserCrud.update_returning(db_session, Client,
+                                                     [Client.id == fields.id],
+                                                     fields.model_dump(exclude_unset=True),
+                                                     UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER,
+                                                     "Client not found")
 
-            db_session.add(client)
             await db_session.commit()
-            
-            await db_session.refresh(client)
             return client
+        
+        except HTTPException:
+            await db_session.rollback()
+            raise
 
         except Exception as e:
             await db_session.rollback()
@@ -385,27 +359,21 @@ class UserCrud:
         if fields.email is None:
             raise HTTPException(detail="Client email is required", status_code=400)
 
-        if not await UserUtils.exist_client_by_email(db_session, fields.email):
-            raise HTTPException(detail="Client not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Client).where(Client.email == fields.email))
-            client = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
+            client = await UserCrud.update_returning(db_session, Client,
+                                                     [Client.email == fields.email],
+                                                     fields.model_dump(exclude_unset=True),
+                                                     UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER | {"email"},
+                                                     "Client not found")
 
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                    continue
-                
-                setattr(client, key, value)
-            
-            db_session.add(client)
             await db_session.commit()
-
-            await db_session.refresh(client)
             return client
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Client update failed", status_code=500) from e
@@ -418,27 +386,21 @@ class UserCrud:
         if fields.documentid is None:
             raise HTTPException(detail="Client document ID is required", status_code=400)
 
-        if not await UserUtils.exist_client_by_documentid(db_session, fields.documentid):
-            raise HTTPException(detail="Client not found", status_code=404)
-        
         try:
             
-            response = await db_session.exec(select(Client).where(Client.documentid == fields.documentid))
-            client = response.one()
-            
-            for key, value in fields.model_dump(exclude_unset=True).items():
-
-                if key in cls.EXCLUDED_FIELDS_FOR_UPDATE_USER:
-                    continue
-                    
-                setattr(client, key, value)
+            client = await UserCrud.update_returning(db_session, Client,
+                                                     [Client.documentid == fields.documentid],
+                                                     fields.model_dump(exclude_unset=True),
+                                                     UserCrud.EXCLUDED_FIELDS_FOR_UPDATE_USER,
+                                                     "Client not found")
 
-            db_session.add(client)
             await db_session.commit()
-                
-            await db_session.refresh(client)
             return client
         
+        except HTTPException:
+            await db_session.rollback()
+            raise
+
         except Exception as e:
             await db_session.rollback()
             raise HTTPException(detail="Client update failed", status_code=500) from e
@@ -454,7 +416,7 @@ class UserCrud:
         
         try:
             
-            response = await db_session.exec(select(Client).where(Client.id == client_id))
+            response = await db_session.exec(select(Client).options(*LoadProfile.CLIENT_DELETE).where(Client.id == client_id))
             
             await db_session.delete(response.one())
             await db_session.commit()
@@ -476,7 +438,7 @@ class UserCrud:
 
         try:
             
-            response = await db_session.exec(select(Client).where(Client.email == email))
+            response = await db_session.exec(select(Client).options(*LoadProfile.CLIENT_DELETE).where(Client.email == email))
             
             await db_session.delete(response.one())
             await db_session.commit()
@@ -498,7 +460,7 @@ class UserCrud:
         
         try:
             
-            response = await db_session.exec(select(Client).where(Client.documentid == document_id))
+            response = await db_session.exec(select(Client).options(*LoadProfile.CLIENT_DELETE).where(Client.documentid == document_id))
 
             await db_session.delete(response.one())
             await db_session.commit()
@@ -1,5 +1,11 @@
-from db.main import get_session, init_db, init_engine, close_engine
+from db.main import (
+    get_session, get_read_session, background_session,
+    init_db, init_engine, close_engine, warmup_pool, get_pool_stats, listen, is_primary
+)
+from db.dialect import insert_on_conflict
+from db.routing import READ_YOUR_WRITES
 
 __all__ = [
-    "get_session", "init_engine", "init_db", "close_engine"
+    "get_session", "get_read_session", "background_session", "init_engine", "init_db", "close_engine",
+    "warmup_pool", "get_pool_stats", "insert_on_conflict", "listen", "is_primary", "READ_YOUR_WRITES"
 ]
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
+
+def insert_on_conflict(db_session: AsyncSession, model: type[SQLModel]):
+    """INSERT that supports ``on_conflict_do_nothing/do_update`` on the dialect the session is bound to."""
+
+    # Postgres en produccion, sqlite solo para desarrollo local
+    if db_session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+
+    return postgresql.insert(model)
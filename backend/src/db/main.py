@@ -1,18 +1,43 @@
-from typing import AsyncGenerator
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Callable, Optional
+
+import logfire
+from fastapi import Request
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 
 from core import SETTINGS
+from db.pool import InstrumentedQueuePool, PoolStats
+from db.routing import READ_YOUR_WRITES
 
 ENGINE: AsyncEngine | None = None
+READ_ENGINE: AsyncEngine | None = None
 AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+AsyncReadSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+POOL_STATS = PoolStats()
+READ_POOL_STATS = PoolStats()
+
+def _create_engine(url: str, stats: PoolStats) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool.with_stats(stats),
+        pool_size=SETTINGS.db_pool_size,
+        max_overflow=SETTINGS.db_max_overflow,
+        pool_timeout=SETTINGS.db_pool_timeout,
+        pool_recycle=SETTINGS.db_pool_recycle,
+        pool_pre_ping=SETTINGS.db_pool_pre_ping,
+    )
 
 def init_engine():
-    """Inicializa el engine"""
-    global ENGINE, AsyncSessionLocal
+    """Inicializa el engine principal y, si esta configurada, la replica de lectura"""
+    global ENGINE, READ_ENGINE, AsyncSessionLocal, AsyncReadSessionLocal
 
-    ENGINE = create_async_engine(SETTINGS.db_url)
+    ENGINE = _create_engine(SETTINGS.db_url, POOL_STATS)
 
     AsyncSessionLocal = async_sessionmaker(
         bind=ENGINE,
@@ -20,6 +45,15 @@ def init_engine():
         expire_on_commit=False
     )
 
+    # Sin replica las lecturas usan el mismo engine
+    READ_ENGINE = _create_engine(SETTINGS.db_read_url, READ_POOL_STATS) if SETTINGS.db_read_url else ENGINE
+
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=READ_ENGINE,
+        class_=AsyncSession,
+        expire_on_commit=False
+    ) if READ_ENGINE is not ENGINE else AsyncSessionLocal
+
 async def init_db() -> None:
     """Inicializa el esquema (solo para dev / tests)."""
     assert ENGINE is not None
@@ -27,13 +61,134 @@ async def init_db() -> None:
     async with ENGINE.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 
+async def warmup_pool(connections: int | None = None) -> None:
+    """Abre `connections` conexiones en paralelo para que el primer pico no pague el connect."""
+    assert ENGINE is not None
+
+    # Las conexiones de overflow se descartan al devolverse, solo tiene sentido calentar pool_size
+    connections = min(SETTINGS.db_pool_warmup if connections is None else connections, SETTINGS.db_pool_size)
+
+    if connections <= 0:
+        return
+
+    async def _open(engine: AsyncEngine, release: asyncio.Event):
+        async with engine.connect():
+            await release.wait()
+
+    engines = [ENGINE] if READ_ENGINE is ENGINE else [ENGINE, READ_ENGINE]
+
+    # Se mantienen todas abiertas a la vez; si no, el pool reutilizaria la misma conexion
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_open(engine, release)) for engine in engines for _ in range(connections)]
+
+    while (any(engine.pool.checkedout() < connections for engine in engines)
+           and not any(task.done() for task in tasks)):
+        await asyncio.sleep(0.01)
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+def get_pool_stats() -> dict:
+    """Estadisticas del pool: ocupacion actual e histograma de espera en checkout."""
+    stats = {"primary": POOL_STATS.snapshot(ENGINE.pool if ENGINE is not None else None)}
+
+    if READ_ENGINE is not None and READ_ENGINE is not ENGINE:
+        stats["replica"] = READ_POOL_STATS.snapshot(READ_ENGINE.pool)
+
+    return stats
+
+async def listen(channel: str, callback: Callable[[str], None], on_connect: Optional[Callable[[], None]] = None) -> None:
+    """Escucha los NOTIFY de `channel` hasta ser cancelada, reconectando si se cae la conexion. Solo Postgres."""
+    assert ENGINE is not None
+
+    if ENGINE.dialect.name != "postgresql":
+        return
+
+    def _notify(connection, pid, channel, payload):
+        callback(payload)
+
+    while True:
+
+        try:
+
+            async with ENGINE.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+
+                lost = asyncio.Event()
+                driver.add_termination_listener(lambda connection: lost.set())
+                await driver.add_listener(channel, _notify)
+
+                # Lo que se notifico mientras no se escuchaba se perdio
+                if on_connect is not None:
+                    on_connect()
+
+                try:
+                    await lost.wait()
+                finally:
+                    await driver.remove_listener(channel, _notify)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            logfire.exception("LISTEN connection lost")
+
+        await asyncio.sleep(5)
+
 async def close_engine() -> None:
     """Cierre limpio del pool."""
+    if READ_ENGINE is not None and READ_ENGINE is not ENGINE:
+        await READ_ENGINE.dispose()
+
     if ENGINE is not None:
         await ENGINE.dispose()
-        
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    session.info["pending_writes"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["pending_writes"] = True
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session: Session) -> None:
+    # Tras escribir, la respuesta lleva el token read-your-writes (ver ReadYourWritesMiddleware)
+    state = session.info.get("request_state")
+
+    if session.info.pop("pending_writes", False) and state is not None:
+        state.wrote = True
+
+@event.listens_for(Session, "after_rollback")
+def _discard_writes(session: Session) -> None:
+    session.info.pop("pending_writes", None)
+
+def is_primary(db_session: AsyncSession) -> bool:
+    """Whether the session reads from the primary; without a replica every session does."""
+    return db_session.bind is ENGINE
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    assert AsyncSessionLocal is not None
+
+    async with AsyncSessionLocal(info={"request_state": request.state}) as session:
+        yield session
+
+@asynccontextmanager
+async def background_session() -> AsyncGenerator[AsyncSession, None]:
+    """Sesion para tareas en segundo plano, fuera de una request."""
     assert AsyncSessionLocal is not None
 
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Sesion para rutas de solo lectura: va a la replica salvo que el cliente haya escrito hace poco."""
+    assert AsyncSessionLocal is not None and AsyncReadSessionLocal is not None
+
+    pinned = READ_YOUR_WRITES.is_pinned(READ_YOUR_WRITES.request_token(request))
+    factory = AsyncSessionLocal if pinned else AsyncReadSessionLocal
+
+    async with factory(info={"request_state": request.state}) as session:
+        yield session
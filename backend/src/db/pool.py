@@ -0,0 +1,80 @@
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+class PoolStats:
+    """Checkout wait-time histogram and counters for the connection pool."""
+
+    # Limites superiores (ms) de cada bucket; el ultimo bucket es +inf
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset every counter."""
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def record_wait(self, wait_ms: float) -> None:
+        """Register how long a checkout waited for a connection."""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.histogram[bisect_left(self.BUCKETS_MS, wait_ms)] += 1
+
+    def record_timeout(self) -> None:
+        """Register a checkout that gave up after pool_timeout."""
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool: Pool | None = None) -> dict:
+        """Current counters, plus the live pool occupancy when a pool is given."""
+        with self._lock:
+            labels = [f"le_{b}ms" for b in self.BUCKETS_MS] + ["gt_%dms" % self.BUCKETS_MS[-1]]
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": self.wait_total_ms / self.checkouts if self.checkouts else 0.0,
+                "wait_max_ms": self.wait_max_ms,
+                "wait_histogram": dict(zip(labels, self.histogram)),
+            }
+
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            })
+
+        return data
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times in ``stats``."""
+
+    stats: PoolStats = PoolStats()
+
+    @classmethod
+    def with_stats(cls, stats: PoolStats) -> type["InstrumentedQueuePool"]:
+        """Subclass reporting to its own `stats`, one per engine."""
+        return type(cls.__name__, (cls,), {"stats": stats})
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            self.stats.record_wait((perf_counter() - start) * 1000)
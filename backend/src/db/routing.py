@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+from time import time
+
+from fastapi import Request
+
+from core import SETTINGS
+
+class ReadYourWrites:
+    """Signed token the client carries after a write so its reads stay on the primary, in whichever worker serves them."""
+
+    COOKIE = "read_your_writes"
+    HEADER = "x-read-your-writes"
+
+    def __init__(self, window_seconds: float, secret: bytes):
+        self.window_seconds = window_seconds
+        self._secret = secret
+
+    def _sign(self, expires_at: str) -> str:
+        return hmac.new(self._secret, expires_at.encode(), hashlib.sha256).hexdigest()
+
+    def token(self) -> str | None:
+        """Token that pins its bearer to the primary for the next `window_seconds`."""
+        if self.window_seconds <= 0:
+            return None
+
+        # Hora de reloj y no monotonic: el token lo valida cualquier worker o maquina
+        expires_at = f"{time() + self.window_seconds:.3f}"
+
+        return f"{expires_at}.{self._sign(expires_at)}"
+
+    def is_pinned(self, token: str | None) -> bool:
+        """Whether `token` is genuine and has not expired yet."""
+        if not token:
+            return False
+
+        expires_at, _, signature = token.rpartition(".")
+
+        if not hmac.compare_digest(signature, self._sign(expires_at)):
+            return False
+
+        try:
+            return float(expires_at) >= time()
+        except ValueError:
+            return False
+
+    def request_token(self, request: Request) -> str | None:
+        """Token sent by the client, in the header for API clients or in the cookie for browsers."""
+        return request.headers.get(self.HEADER) or request.cookies.get(self.COOKIE)
+
+READ_YOUR_WRITES = ReadYourWrites(SETTINGS.db_read_your_writes_seconds, SETTINGS.jwt_secret.get_secret_value().encode())
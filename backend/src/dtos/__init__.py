@@ -3,18 +3,29 @@ from .employee import EmployeeCreate, EmployeeRead, EmployeeUpdate, EmployeeFilt
 from .payment import PaymentCreate, PaymentRead, PaymentUpdate, PaymentFilter
 from .product import (
     ProductCreate, ProductRead, ProductUpdate, ProductFilter,
-    CategoryCreate, CategoryRead, CategoryUpdate, CategoryFilter
+    CategoryCreate, CategoryRead, CategoryUpdate, CategoryFilter, CategoryMembership, CategoryMembershipResult,
+    ProductImportError, ProductImportResult,
+    CategoryMatch, StockState, ExpiryState, FacetCount, ProductFacets, ProductSearchResult
 )
 from .service import ServiceCreate, ServiceRead, ServiceUpdate, ServiceFilter, ServiceInputFilter
-from .order import OrderCreate, OrderRead, OrderUpdate, OrderFilter, OrderServiceFilter, OrderProductFilter
+from .order import (
+    OrderCreate, OrderRead, OrderUpdate, OrderFilter, OrderServiceFilter, OrderProductFilter,
+    OrderCheckout, OrderCheckoutProduct, OrderCheckoutService, OrderDetail, OrderDetailLine
+)
+from .analytics import DailyRevenueRead, EmployeeSalesRead, ProductSalesRead
+from .catalog import CatalogProduct, CatalogCategory, CatalogSnapshot, CatalogChanges
 
 
 __all__ = [
     'ClientCreate', 'ClientRead', 'ClientUpdate', 'ClientFilter',
     'EmployeeCreate', 'EmployeeRead', 'EmployeeUpdate', 'EmployeeFilter',
     'PaymentCreate', 'PaymentRead', 'PaymentUpdate', 'PaymentFilter',
-    'CategoryCreate', 'CategoryRead', 'CategoryUpdate', 'CategoryFilter',
-    'ProductCreate', 'ProductRead', 'ProductUpdate', 'ProductFilter',
+    'CategoryCreate', 'CategoryRead', 'CategoryUpdate', 'CategoryFilter', 'CategoryMembership', 'CategoryMembershipResult',
+    'ProductCreate', 'ProductRead', 'ProductUpdate', 'ProductFilter', 'ProductImportError', 'ProductImportResult',
+    'CategoryMatch', 'StockState', 'ExpiryState', 'FacetCount', 'ProductFacets', 'ProductSearchResult',
     'ServiceCreate', 'ServiceRead', 'ServiceUpdate', 'ServiceFilter', 'ServiceInputFilter',
-    'OrderCreate', 'OrderRead', 'OrderUpdate', 'OrderFilter', 'OrderServiceFilter', 'OrderProductFilter'
+    'OrderCreate', 'OrderRead', 'OrderUpdate', 'OrderFilter', 'OrderServiceFilter', 'OrderProductFilter',
+    'OrderCheckout', 'OrderCheckoutProduct', 'OrderCheckoutService', 'OrderDetail', 'OrderDetailLine',
+    'DailyRevenueRead', 'EmployeeSalesRead', 'ProductSalesRead',
+    'CatalogProduct', 'CatalogCategory', 'CatalogSnapshot', 'CatalogChanges'
 ]
\ No newline at end of file
@@ -0,0 +1,34 @@
+from datetime import date
+
+from pydantic import Field, ConfigDict
+
+from dtos.abs import BaseRead
+
+class DailyRevenueRead(BaseRead):
+    
+    day: date = Field(..., description="Day the orders were placed")
+    completed: int = Field(..., description="Orders completed, including the ones refunded later")
+    cancelled: int = Field(..., description="Orders cancelled")
+    refunded: int = Field(..., description="Orders refunded")
+    revenue: float = Field(..., description="Total of the completed orders that were not refunded")
+    
+    model_config: ConfigDict = ConfigDict(from_attributes=True)
+
+class EmployeeSalesRead(BaseRead):
+    
+    employee_id: int = Field(..., description="Employee assigned to the orders")
+    completed: int = Field(..., description="Orders completed, including the ones refunded later")
+    cancelled: int = Field(..., description="Orders cancelled")
+    refunded: int = Field(..., description="Orders refunded")
+    revenue: float = Field(..., description="Total of the completed orders that were not refunded")
+    
+    model_config: ConfigDict = ConfigDict(from_attributes=True)
+
+class ProductSalesRead(BaseRead):
+    
+    product_id: int = Field(..., description="Product sold")
+    name: str = Field(..., description="Product's name")
+    quantity: int = Field(..., description="Units sold")
+    revenue: float = Field(..., description="Units sold times the product price")
+    
+    model_config: ConfigDict = ConfigDict(from_attributes=True)
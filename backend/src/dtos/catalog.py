@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from pydantic import Field, ConfigDict
+
+from dtos.abs import BaseRead
+from dtos.product import ProductRead, CategoryRead
+
+class CatalogProduct(ProductRead):
+    """
+    Product as stored by a terminal: current stock from the ledger and its categories.
+    """
+    category_ids: list[int] = Field(default_factory=list, description="Categories of the product")
+    updated_at: datetime = Field(..., description="Last change of the product row or its categories")
+
+    model_config: ConfigDict = ConfigDict(from_attributes=True)
+
+class CatalogCategory(CategoryRead):
+    """
+    Category as stored by a terminal.
+    """
+    updated_at: datetime = Field(..., description="Last change of the category")
+
+    model_config: ConfigDict = ConfigDict(from_attributes=True)
+
+class CatalogSnapshot(BaseRead):
+    """
+    Full catalog. Pass `watermark` as `since` to the changes endpoint for the next sync.
+    """
+    watermark: datetime = Field(..., description="Changes after this instant are not guaranteed to be included")
+    products: list[CatalogProduct] = Field(default_factory=list)
+    categories: list[CatalogCategory] = Field(default_factory=list)
+
+class CatalogChanges(CatalogSnapshot):
+    """
+    Catalog rows changed or deleted after `since`; rows near the watermark can repeat between syncs.
+    """
+    deleted_products: list[int] = Field(default_factory=list, description="Products deleted since the last sync")
+    deleted_categories: list[int] = Field(default_factory=list, description="Categories deleted since the last sync")
@@ -66,6 +66,79 @@ class OrderRead(BaseRead):
                                               }
                                           })
 
+class OrderCheckoutProduct(BaseCreate):
+    
+    product_id: int = Field(..., description="Product sold in the order", gt = 0)
+    quantity: int = Field(..., description="Quantity of the product", gt = 0)
+
+class OrderCheckoutService(BaseCreate):
+    
+    service_id: int = Field(..., description="Service sold in the order", gt = 0)
+    quantity: int = Field(..., description="Quantity of the service", gt = 0)
+
+class OrderCheckout(BaseCreate):
+    
+    client_id: int = Field(..., description="User who placed the order", gt = 0)
+    employee_id: int = Field(..., description="Employee assigned to the order", gt = 0)
+    status: OrderStatus = Field(default=OrderStatus.PENDING, description="Status of the order after checkout")
+    products: list[OrderCheckoutProduct] = Field(default_factory=list, description="Product lines of the order")
+    services: list[OrderCheckoutService] = Field(default_factory=list, description="Service lines of the order")
+    reserve_stock: bool = Field(False, description="Reserve stock for the product lines when the order stays pending")
+    
+    model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
+                                          use_enum_values=True,
+                                          json_schema_extra={
+                                              "example": {
+                                                  "client_id": 1,
+                                                  "employee_id": 1,
+                                                  "status": "Completada",
+                                                  "products": [{"product_id": 1, "quantity": 2}],
+                                                  "services": [{"service_id": 1, "quantity": 1}]
+                                              }
+                                          })
+
+class OrderDetailLine(BaseRead):
+    
+    kind: str = Field(..., description="Line type: product or service")
+    item_id: int = Field(..., description="Product or service sold in the line")
+    name: str = Field(..., description="Name of the product or service")
+    unit_price: float = Field(..., description="Price of the product when the order was completed, its current price while pending; current price of a service")
+    quantity: int = Field(..., description="Quantity sold")
+    subtotal: float = Field(..., description="Unit price times quantity")
+
+class OrderDetail(BaseRead):
+    
+    id: int = Field(..., description="Order's unique identifier")
+    status: OrderStatus = Field(..., description="Current status of the order")
+    total_price: Optional[float] = Field(None, description="Total price of the order")
+    created_at: datetime = Field(..., description="Timestamp when the order was created")
+    updated_at: datetime = Field(..., description="Timestamp when the order was last updated")
+    client_id: int = Field(..., description="User who placed the order")
+    client_name: str = Field("", description="Client's full name")
+    employee_id: int = Field(..., description="Employee assigned to the order")
+    employee_name: str = Field("", description="Employee's full name")
+    lines: list[OrderDetailLine] = Field(default_factory=list, description="Product and service lines of the order")
+    
+    model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
+                                          use_enum_values=True,
+                                          json_schema_extra={
+                                              "example": {
+                                                  "id": 1,
+                                                  "status": "Pendiente",
+                                                  "total_price": 7.0,
+                                                  "created_at": "2023-01-01T00:00:00Z",
+                                                  "updated_at": "2023-01-01T00:00:00Z",
+                                                  "client_id": 1,
+                                                  "client_name": "Ana Perez",
+                                                  "employee_id": 1,
+                                                  "employee_name": "Luis Gomez",
+                                                  "lines": [
+                                                      {"kind": "product", "item_id": 1, "name": "Shampoo", "unit_price": 2.5, "quantity": 2, "subtotal": 5.0},
+                                                      {"kind": "service", "item_id": 1, "name": "Corte", "unit_price": 2.0, "quantity": 1, "subtotal": 2.0}
+                                                  ]
+                                              }
+                                          })
+
 class OrderServiceFilter(BaseFilter):
     
     order_id: Optional[int] = Field(None, ge = 0)
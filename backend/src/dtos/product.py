@@ -1,15 +1,22 @@
 from typing import Optional
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from enum import Enum
 
+from sqlalchemy import case, func, literal
 from sqlalchemy.sql.expression import Select
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import select
 from pydantic import Field, ConfigDict
+from fastapi_pagination import Page
 
 from dtos.abs import BaseCreate, BaseRead, BaseUpdate, BaseFilter
-from models import Product, Category
+from models import Product, Category, ProductCategory
+from core import SETTINGS
 
 class ProductCreate(BaseCreate):
     
     name: str = Field(..., description="Product's name")
+    sku: Optional[str] = Field(None, max_length=64, description="Stock keeping unit, unique per product")
     short_description: Optional[str] = Field(None, description="Short description of the product")
     price: float = Field(..., description="Product's price", gt = 0)
     cost: float = Field(..., description="Product's cost", gt = 0)
@@ -21,6 +28,7 @@ class ProductCreate(BaseCreate):
                                           json_schema_extra={
                                               "example": {
                                                   "name": "Ejemplo de producto de papelería",
+                                                  "sku": "PAP-0001",
                                                   "short_description": "Este es un producto de papelería de ejemplo.",
                                                   "price": 9.99,
                                                   "stock": 50,
@@ -40,10 +48,12 @@ class ProductRead(BaseRead):
     """
     id: int = Field(..., description="Product's unique identifier")
     name: str = Field(..., description="Product's name")
+    sku: Optional[str] = Field(None, description="Stock keeping unit, unique per product")
     short_description: Optional[str] = Field(None, description="Short description of the product")
     price: float = Field(..., description="Product's price")
     cost: float = Field(..., description="Product's cost")
-    stock: int = Field(..., description="Available stock of the product")
+    stock: int = Field(..., description="Current stock of the product, from its last snapshot plus later movements")
+    reserved_stock: int = Field(0, description="Stock held by pending orders, included in stock")
     minimum_stock: int = Field(..., description="Minimum stock level of the product")
     image_key: Optional[str] = Field(None, description="URL of the product image")
     expiration_date: Optional[date] = Field(None, description="Expiration date of the consumable product")
@@ -53,6 +63,7 @@ class ProductRead(BaseRead):
                                               "example": {
                                                   "id": 1,
                                                   "name": "Ejemplo de producto de papelería",
+                                                  "sku": "PAP-0001",
                                                   "short_description": "Este es un producto de papelería de ejemplo.",
                                                   "price": 9.99,
                                                   "stock": 50,
@@ -72,6 +83,7 @@ class ProductUpdate(BaseUpdate):
     """
     id: int = Field(..., description="Product's unique identifier")
     name: Optional[str] = Field(None, description="Product's name")
+    sku: Optional[str] = Field(None, max_length=64, description="Stock keeping unit, unique per product")
     short_description: Optional[str] = Field(None, description="Short description of the product")
     price: Optional[float] = Field(None, description="Product's price", gt = 0)
     cost: Optional[float] = Field(None, description="Product's cost", gt = 0)
@@ -84,6 +96,7 @@ class ProductUpdate(BaseUpdate):
                                               "example": {
                                                   "id": 1,
                                                   "name": "Ejemplo de producto de papelería",
+                                                  "sku": "PAP-0001",
                                                   "short_description": "Este es un producto de papelería de ejemplo.",
                                                   "price": 9.99,
                                                   "cost": 5.99,
@@ -97,9 +110,37 @@ class ProductUpdate(BaseUpdate):
                                               date: lambda v: v.isoformat()
                                           })
 
+class CategoryMatch(str, Enum):
+    """
+    How a product must match the categories of a search.
+    """
+    ANY = "any"
+    ALL = "all"
+
+class StockState(str, Enum):
+    """
+    Stock facet of a product.
+    """
+    OUT = "out"
+    LOW = "low"
+    AVAILABLE = "available"
+
+class ExpiryState(str, Enum):
+    """
+    Expiration facet of a product.
+    """
+    EXPIRED = "expired"
+    EXPIRING = "expiring"
+    VALID = "valid"
+    NONE = "none"
+
 class ProductFilter(BaseFilter):
     
     name: Optional[str] = Field(None, description="Product's name")
+    category_ids: Optional[list[int]] = Field(None, description="Categories of the product")
+    category_match: CategoryMatch = Field(CategoryMatch.ANY, description="Whether the product needs any or all of category_ids")
+    stock_states: Optional[list[StockState]] = Field(None, description="Stock states to include")
+    expiry_states: Optional[list[ExpiryState]] = Field(None, description="Expiration states to include")
     max_price: Optional[float] = Field(None, description="Max product's price", gt = 0)
     min_price: Optional[float] = Field(None, description="Min product's price", gt = 0)
     max_cost: Optional[float] = Field(None, description="Max product's cost", gt = 0)
@@ -109,7 +150,14 @@ class ProductFilter(BaseFilter):
     max_expiration_date: Optional[date] = Field(None, description="Max expiration date of the consumable product")
     min_expiration_date: Optional[date] = Field(None, description="Min expiration date of the consumable product")
     
-    def apply(self, query: Select) -> Select:
+    def uses_stock(self) -> bool:
+        """Whether the filters read the stock, so the query needs the ledger joined."""
+        return bool(self.max_stock or self.min_stock or self.stock_states)
+    
+    # Sin el libro unido se filtra por la copia del ultimo snapshot en Product.stock
+    def apply(self, query: Select,
+              stock: ColumnElement[int] = Product.stock,
+              available: ColumnElement[int] = Product.stock - Product.reserved_stock) -> Select:
         
         if self.name:
             query = query.where(Product.name.ilike(f"%{self.name}%"))
@@ -127,10 +175,10 @@ class ProductFilter(BaseFilter):
             query = query.where(Product.cost >= self.min_cost)
         
         if self.max_stock:
-            query = query.where(Product.stock <= self.max_stock)
+            query = query.where(stock <= self.max_stock)
         
         if self.min_stock:
-            query = query.where(Product.stock >= self.min_stock)
+            query = query.where(stock >= self.min_stock)
         
         if self.max_expiration_date:        
             query = query.where(Product.expiration_date <= self.max_expiration_date)
@@ -138,8 +186,59 @@ class ProductFilter(BaseFilter):
         if self.min_expiration_date:
             query = query.where(Product.expiration_date >= self.min_expiration_date)
         
+        if self.category_ids:
+            members = select(ProductCategory.product_id).where(ProductCategory.category_id.in_(self.category_ids))
+
+            # Con "all" el producto debe estar en todas las categorias pedidas
+            if self.category_match == CategoryMatch.ALL:
+                members = (members.group_by(ProductCategory.product_id)
+                           .having(func.count(ProductCategory.category_id.distinct()) == len(set(self.category_ids))))
+
+            query = query.where(Product.id.in_(members))
+        
+        if self.stock_states:
+            query = query.where(ProductFilter.stock_state(available).in_(self.stock_states))
+        
+        if self.expiry_states:
+            query = query.where(ProductFilter.expiry_state().in_(self.expiry_states))
+        
         return query     
     
+    @staticmethod
+    def price_buckets() -> list[str]:
+        """Labels of the price facet, from the bounds in product_price_buckets."""
+
+        bounds = [0, *sorted(SETTINGS.product_price_buckets)]
+
+        return [f"{low:g}-{high:g}" for low, high in zip(bounds, bounds[1:])] + [f"{bounds[-1]:g}+"]
+    
+    @staticmethod
+    def price_bucket() -> ColumnElement[str]:
+        """Price facet label of each product, one of price_buckets."""
+
+        bounds = sorted(SETTINGS.product_price_buckets)
+        labels = ProductFilter.price_buckets()
+
+        return case(*[(Product.price < bound, literal(label)) for bound, label in zip(bounds, labels)], else_=literal(labels[-1]))
+    
+    @staticmethod
+    def stock_state(available: ColumnElement[int] = Product.stock - Product.reserved_stock) -> ColumnElement[str]:
+        """Stock facet state of each product, from the `available` units against its minimum stock."""
+        return case((available <= 0, literal(StockState.OUT.value)),
+                    (available <= Product.minimum_stock, literal(StockState.LOW.value)),
+                    else_=literal(StockState.AVAILABLE.value))
+    
+    @staticmethod
+    def expiry_state() -> ColumnElement[str]:
+        """Expiry facet state of each product, from its expiration date against today."""
+
+        today = date.today()
+
+        return case((Product.expiration_date.is_(None), literal(ExpiryState.NONE.value)),
+                    (Product.expiration_date < today, literal(ExpiryState.EXPIRED.value)),
+                    (Product.expiration_date <= today + timedelta(days=SETTINGS.product_expiring_days), literal(ExpiryState.EXPIRING.value)),
+                    else_=literal(ExpiryState.VALID.value))
+    
 class CategoryCreate(BaseCreate):
     """
     Category model for the API request.
@@ -202,4 +301,67 @@ class CategoryFilter(BaseFilter):
         if self.name:
             query = query.where(Category.name.ilike(f"%{self.name}%"))
         
-        return query
\ No newline at end of file
+        return query
+    
+
+class CategoryMembership(BaseCreate):
+    """
+    Products to assign to or remove from a category in one request.
+    """
+    product_ids: list[int] = Field(..., description="Products to assign or remove", min_length=1, max_length=5000)
+
+    model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
+                                          use_enum_values=True,
+                                          json_schema_extra={
+                                              "example": {
+                                                  "product_ids": [1, 2, 3]
+                                              }
+                                          })
+
+class CategoryMembershipResult(BaseRead):
+    """
+    Outcome of one product in a bulk assign or unassign.
+    """
+    product_id: int = Field(..., description="Product of the request")
+    status: str = Field(..., description="assigned, already_assigned, unassigned, not_assigned or product_not_found")
+
+class ProductImportError(BaseRead):
+    """
+    A row of an import file that failed validation.
+    """
+    row: int = Field(..., description="Line of the row in the file, the header is line 1")
+    errors: list[str] = Field(..., description="Validation messages of the row")
+
+class ProductImportResult(BaseRead):
+    """
+    Outcome of a bulk product import.
+    """
+    rows: int = Field(..., description="Data rows read from the file")
+    inserted: int = Field(..., description="New products created")
+    updated: int = Field(..., description="Existing products updated, matched by sku or, for rows without one, by name")
+    duplicated: int = Field(..., description="Rows skipped because a later row matches the same product, sku or name")
+    failed: int = Field(..., description="Rows rejected by validation or matching several products by name")
+    errors: list[ProductImportError] = Field(default_factory=list, description="Rejected rows, capped")
+    errors_truncated: bool = Field(False, description="Whether more rows failed than are listed")
+
+class FacetCount(BaseRead):
+    """
+    Products of a search that fall in one facet value.
+    """
+    value: str = Field(..., description="Facet value")
+    count: int = Field(..., description="Matching products with that value")
+
+class ProductFacets(BaseRead):
+    """
+    Facet counts over every product matching a search, not only the page.
+    """
+    price: list[FacetCount] = Field(..., description="Products per price bucket, filter them with min_price and max_price")
+    stock: list[FacetCount] = Field(..., description="Products per stock state")
+    expiry: list[FacetCount] = Field(..., description="Products per expiration state")
+
+class ProductSearchResult(BaseRead):
+    """
+    A page of a product search with the facet counts of the whole result.
+    """
+    page: Page[ProductRead] = Field(..., description="Requested page of products")
+    facets: ProductFacets = Field(..., description="Facet counts of the search")
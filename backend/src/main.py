@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -10,13 +11,15 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.extension import _rate_limit_exceeded_handler
 import logfire
 
-from core import SETTINGS, LIMITER, setup_logging
+from core import SETTINGS, LIMITER, CATALOG_CACHE, setup_logging
 from routes import (
     UserRouter, AuthRouter, OrderRouter,
     ProductRouter, ServiceRouter, OthersRouter,
-    InvoiceRouter, FileRouter)
-from db import init_db, init_engine, close_engine
-from middlewares import LoggingContextMiddleware
+    InvoiceRouter, FileRouter, MetricsRouter, AnalyticsRouter, CatalogRouter)
+from db import init_db, init_engine, close_engine, warmup_pool, listen
+from services import InventoryService, IdempotencyService, OutboxService, CatalogService, ProductService
+from middlewares import LoggingContextMiddleware, ReadYourWritesMiddleware
+from utils import ImageUtils, ProductUtils
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -30,8 +33,41 @@ async def lifespan(app: FastAPI):
     
     await init_db()
     
+    await warmup_pool()
+    
+    tasks = []
+    
+    if SETTINGS.stock_snapshot_interval > 0:
+        tasks.append(asyncio.create_task(InventoryService.snapshot_loop(SETTINGS.stock_snapshot_interval)))
+    
+    if SETTINGS.idempotency_purge_interval > 0:
+        tasks.append(asyncio.create_task(IdempotencyService.purge_loop(SETTINGS.idempotency_purge_interval)))
+    
+    if SETTINGS.catalog_tombstone_purge_interval > 0:
+        tasks.append(asyncio.create_task(CatalogService.purge_loop(SETTINGS.catalog_tombstone_purge_interval)))
+    
+    if SETTINGS.image_sweep_interval > 0:
+        tasks.append(asyncio.create_task(ProductUtils.sweep_loop(SETTINGS.image_sweep_interval)))
+    
+    # Los escaneos anteriores a la carga del mapa de codigos van a la base
+    tasks.append(asyncio.create_task(ProductService.preload_codes()))
+    
+    # Invalidaciones de cache publicadas por los otros workers
+    tasks.append(asyncio.create_task(listen(CATALOG_CACHE.CHANNEL, CATALOG_CACHE.on_notify, CATALOG_CACHE.clear)))
+    
+    # Con outbox_poll_interval = 0 el outbox lo drena outbox_worker.py en otro proceso
+    if SETTINGS.outbox_poll_interval > 0:
+        tasks.append(asyncio.create_task(OutboxService.worker_loop(SETTINGS.outbox_poll_interval)))
+    
     yield
     
+    for task in tasks:
+        task.cancel()
+    
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    ImageUtils.shutdown()
+    
     await close_engine()
 
 app = FastAPI(lifespan=lifespan)
@@ -53,6 +89,9 @@ app.add_middleware(
     LoggingContextMiddleware
 )
 
+# Read-your-writes: token para leer del primario tras escribir
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Ratelimiter
 app.state.limiter = LIMITER
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -67,6 +106,9 @@ app.include_router(ServiceRouter)
 app.include_router(OthersRouter)
 app.include_router(InvoiceRouter)
 app.include_router(FileRouter)
+app.include_router(MetricsRouter)
+app.include_router(AnalyticsRouter)
+app.include_router(CatalogRouter)
 
 @app.get("/")
 async def root():
@@ -1,5 +1,7 @@
 from .logging import LoggingContextMiddleware
+from .read_your_writes import ReadYourWritesMiddleware
 
 __all__ = [
-    'LoggingContextMiddleware'
+    'LoggingContextMiddleware',
+    'ReadYourWritesMiddleware'
 ]
\ No newline at end of file
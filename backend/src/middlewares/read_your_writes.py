@@ -0,0 +1,26 @@
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from db import READ_YOUR_WRITES
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    
+    async def dispatch(self, request: Request, call_next):
+        
+        response = await call_next(request)
+        
+        # La sesion marca la request al confirmar una escritura; el token viaja con el cliente
+        # y cualquier worker lo valida, asi sus lecturas siguientes van al primario
+        if getattr(request.state, "wrote", False):
+            
+            token = READ_YOUR_WRITES.token()
+            
+            if token is not None:
+                response.headers[READ_YOUR_WRITES.HEADER] = token
+                response.set_cookie(READ_YOUR_WRITES.COOKIE, token,
+                                    max_age=int(READ_YOUR_WRITES.window_seconds) + 1,
+                                    httponly=True,
+                                    samesite="lax")
+        
+        return response
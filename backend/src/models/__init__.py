@@ -1,20 +1,32 @@
 from .client import Client
 from .payment import Payment, PaymentMethod, PaymentStatus
 from .employee import Employee, EmployeeRole
-from .product import Product, ProductCategory, Category 
+from .product import Product, ProductCategory, ProductBarcode, Category, ImageBlob
 from .service import Service, ServiceInput
-from .order import Order, OrderProduct, OrderService, OrderStatus
+from .order import Order, OrderProduct, OrderService, OrderStatus, StockReservation
 from .others import Email, File, Invoice, InvoiceItem, InvoiceRequest
+from .inventory import MovementKind, StockMovement, StockSnapshot
+from .idempotency import IdempotencyRecord
+from .analytics import DailyProductSales, DailyEmployeeSales, DailyPaymentMethod
+from .outbox import OutboxEvent, OutboxKind, OutboxStatus
+from .catalog import CatalogTombstone, CatalogVersion
+from .profiles import LoadProfile
 
 
 __all__ = [
     'Client',
     'Employee', 'EmployeeRole',
-    "Product", "ProductCategory", "Category",
+    "Product", "ProductCategory", "ProductBarcode", "Category", "ImageBlob",
     "Service", "ServiceInput",
-    "Order", "OrderProduct", "OrderService", "OrderStatus",
+    "Order", "OrderProduct", "OrderService", "OrderStatus", "StockReservation",
     "Payment", "PaymentMethod", "PaymentStatus",
     "Email",
     "File",
     "Invoice", "InvoiceItem", "InvoiceRequest",
+    "MovementKind", "StockMovement", "StockSnapshot",
+    "IdempotencyRecord",
+    "DailyProductSales", "DailyEmployeeSales", "DailyPaymentMethod",
+    "OutboxEvent", "OutboxKind", "OutboxStatus",
+    "CatalogTombstone", "CatalogVersion",
+    "LoadProfile",
 ]
\ No newline at end of file
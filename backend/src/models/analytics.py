@@ -0,0 +1,34 @@
+from datetime import date
+
+from sqlmodel import SQLModel, Field
+
+from models.payment import PaymentMethod
+
+class DailyProductSales(SQLModel, table=True):
+    """
+    Units and revenue of a product per day, over completed orders.
+    """
+    day: date = Field(primary_key=True, description="Day the order was placed")
+    product_id: int = Field(foreign_key="product.id", primary_key=True, index=True)
+    quantity: int = Field(0, description="Units sold")
+    revenue: float = Field(0.0, description="Units sold times the product price")
+
+class DailyEmployeeSales(SQLModel, table=True):
+    """
+    Orders and revenue of an employee per day.
+    """
+    day: date = Field(primary_key=True, description="Day the order was placed")
+    employee_id: int = Field(foreign_key="employee.id", primary_key=True, index=True)
+    completed: int = Field(0, description="Orders completed, including the ones refunded later")
+    cancelled: int = Field(0, description="Orders cancelled")
+    refunded: int = Field(0, description="Orders refunded")
+    revenue: float = Field(0.0, description="Total of the completed orders that were not refunded")
+
+class DailyPaymentMethod(SQLModel, table=True):
+    """
+    Completed payments per day and method.
+    """
+    day: date = Field(primary_key=True, description="Day the payment was registered")
+    method: PaymentMethod = Field(primary_key=True)
+    payments: int = Field(0, description="Number of completed payments")
+    amount: float = Field(0.0, description="Sum of the completed payments")
@@ -0,0 +1,20 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+class CatalogTombstone(SQLModel, table=True):
+    """
+    Deleted catalog row, kept so terminals syncing deltas can drop it.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(..., max_length=32, description="Kind of the deleted row: product or category")
+    entity_id: int = Field(..., description="ID the deleted row had")
+    deleted_at: datetime = Field(default_factory=datetime.now, index=True)
+
+class CatalogVersion(SQLModel, table=True):
+    """
+    Slot of the catalog version counter; the catalog version is the sum of every slot.
+    """
+    slot: int = Field(..., primary_key=True)
+    version: int = Field(0, description="Catalog writes committed through this slot")
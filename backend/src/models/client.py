@@ -11,10 +11,10 @@ if TYPE_CHECKING:
 class Client(UserModel, table = True):
     
     orders: Optional[list['Order']] = Relationship(back_populates="client", sa_relationship_kwargs={
-                                                                      "lazy": "selectin",
+                                                                      "lazy": "raise",
                                                                       "cascade": "all, delete-orphan"
                                                                       })
     payments: Optional[list['Payment']] = Relationship(back_populates="client", sa_relationship_kwargs={
-                                                                      "lazy": "selectin",
+                                                                      "lazy": "raise",
                                                                       "cascade": "all, delete-orphan"
                                                                       })
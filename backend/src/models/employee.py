@@ -19,4 +19,4 @@ class Employee(UserModel, table = True):
     birth_date: Optional[date] = Field(None, description="Employee's birth date")
     password: str = Field(..., description="Employee's password")
 
-    orders: Optional[list['Order']] = Relationship(back_populates="employee", sa_relationship_kwargs={"lazy": "selectin"})
\ No newline at end of file
+    orders: Optional[list['Order']] = Relationship(back_populates="employee", sa_relationship_kwargs={"lazy": "raise"})
\ No newline at end of file
@@ -0,0 +1,16 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+class IdempotencyRecord(SQLModel, table=True):
+    """
+    Response stored for an `Idempotency-Key`, replayed when a client retries the same request.
+    """
+    scope: str = Field(primary_key=True, max_length=255, description="Method and path the key was used on")
+    key: str = Field(primary_key=True, max_length=255, description="Idempotency-Key sent by the client")
+    fingerprint: str = Field(..., max_length=64, description="SHA-256 of the request that first used the key")
+    status_code: Optional[int] = Field(None, description="Status of the stored response, None while in flight")
+    response: Optional[str] = Field(None, description="JSON body of the stored response, None while in flight")
+    created_at: datetime = Field(default_factory=datetime.now)
+    expires_at: datetime = Field(..., index=True, description="After this the key can be reused")
@@ -0,0 +1,39 @@
+from enum import Enum
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
+
+class MovementKind(str, Enum):
+    """
+    Enum for stock movement kinds.
+    """
+    SALE = "Venta"
+    RESTOCK = "Reposicion"
+    ADJUSTMENT = "Ajuste"
+    SERVICE_CONSUMPTION = "Consumo de servicio"
+
+class StockMovement(SQLModel, table=True):
+    """
+    Append-only ledger of stock changes. Rows are only deleted with their product; only `folded` is set, once, by the snapshot.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(foreign_key="product.id", index=True, description="Product whose stock changed")
+    quantity: int = Field(..., description="Signed stock change, negative for outgoing stock")
+    kind: MovementKind = Field(..., description="Reason of the movement")
+    order_id: Optional[int] = Field(None, foreign_key="order.id", index=True, description="Order that caused the movement")
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+    folded: bool = Field(False, description="Whether the movement is already added to the product's snapshot")
+
+    # Solo los movimientos pendientes de plegar se leen por producto al calcular el stock
+    __table_args__ = (Index("ix_stockmovement_unfolded", "product_id",
+                            postgresql_where=text("NOT folded"), sqlite_where=text("NOT folded")),)
+
+class StockSnapshot(SQLModel, table=True):
+    """
+    Materialized stock of a product: its starting stock plus every folded movement.
+    """
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+    stock: int = Field(..., description="Stock after applying every folded movement")
+    taken_at: datetime = Field(default_factory=datetime.now)
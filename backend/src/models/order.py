@@ -19,9 +19,10 @@ class OrderProduct(SQLModel, table=True):
     order_id: int = Field(foreign_key="order.id", index=True, primary_key=True)
     product_id: int = Field(foreign_key="product.id", index=True, primary_key=True)
     quantity: int = Field(..., description="Quantity of the product")
+    unit_price: Optional[float] = Field(None, description="Unit price of the product when the order was completed")
 
-    order: 'Order' = Relationship(back_populates="order_products")
-    product: 'Product' = Relationship(back_populates="order_products")
+    order: 'Order' = Relationship(back_populates="order_products", sa_relationship_kwargs={"lazy": "raise"})
+    product: 'Product' = Relationship(back_populates="order_products", sa_relationship_kwargs={"lazy": "raise"})
 
     model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
                                           json_schema_extra={
@@ -40,8 +41,8 @@ class OrderService(SQLModel, table=True):
     service_id: int = Field(foreign_key="service.id", index=True, primary_key=True)
     quantity: int = Field(..., description="Quantity of the service")
 
-    order: 'Order' = Relationship(back_populates="order_services")
-    service: 'Service' = Relationship(back_populates="order_services")
+    order: 'Order' = Relationship(back_populates="order_services", sa_relationship_kwargs={"lazy": "raise"})
+    service: 'Service' = Relationship(back_populates="order_services", sa_relationship_kwargs={"lazy": "raise"})
 
     model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
                                           json_schema_extra={
@@ -52,6 +53,14 @@ class OrderService(SQLModel, table=True):
                                               }
                                           })
 
+class StockReservation(SQLModel, table=True):
+    """
+    Stock held for a pending order, released on cancel or consumed on completion.
+    """
+    order_id: int = Field(foreign_key="order.id", index=True, primary_key=True)
+    product_id: int = Field(foreign_key="product.id", index=True, primary_key=True)
+    quantity: int = Field(..., description="Reserved quantity of the product")
+
 class OrderStatus(str, Enum):
     """
     Enum for order statuses.
@@ -72,13 +81,13 @@ class Order(BaseModel, table=True):
     
     order_products: Optional[list['OrderProduct']] = Relationship(back_populates="order",
                                                                   sa_relationship_kwargs={
-                                                                      "lazy": "selectin",
+                                                                      "lazy": "raise",
                                                                       "cascade": "all, delete-orphan"
                                                                       })
     order_services: Optional[list['OrderService']] = Relationship(back_populates="order", sa_relationship_kwargs={
-                                                                      "lazy": "selectin",
+                                                                      "lazy": "raise",
                                                                       "cascade": "all, delete-orphan"
                                                                       })
     
-    client: 'Client' = Relationship(back_populates="orders")
-    employee: 'Employee' = Relationship(back_populates="orders")
\ No newline at end of file
+    client: 'Client' = Relationship(back_populates="orders", sa_relationship_kwargs={"lazy": "raise"})
+    employee: 'Employee' = Relationship(back_populates="orders", sa_relationship_kwargs={"lazy": "raise"})
\ No newline at end of file
@@ -0,0 +1,35 @@
+from enum import Enum
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+class OutboxKind(str, Enum):
+    """
+    Enum for the side effects queued in the outbox.
+    """
+    ORDER_COMPLETED = "order_completed"
+    ORDER_CANCELLED = "order_cancelled"
+    ORDER_REFUNDED = "order_refunded"
+    INVOICE_EMAIL = "invoice_email"
+
+class OutboxStatus(str, Enum):
+    """
+    Enum for outbox event statuses. Processed events are deleted.
+    """
+    PENDING = "Pendiente"
+    FAILED = "Fallido"
+
+class OutboxEvent(SQLModel, table=True):
+    """
+    Side effect written in the same transaction as the change that causes it, run later by the outbox worker.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: OutboxKind = Field(..., description="Side effect to run")
+    order_id: Optional[int] = Field(None, index=True, description="Order the side effect belongs to")
+    payload: Optional[str] = Field(None, description="Extra JSON arguments of the side effect")
+    status: OutboxStatus = Field(default=OutboxStatus.PENDING, index=True, description="Pending until it runs or runs out of attempts")
+    attempts: int = Field(0, description="Failed attempts so far")
+    available_at: datetime = Field(default_factory=datetime.now, index=True, description="Not picked up before this time")
+    last_error: Optional[str] = Field(None, description="Error of the last failed attempt")
+    created_at: datetime = Field(default_factory=datetime.now)
@@ -38,4 +38,4 @@ class Payment(BaseModel, table=True):
     interest_rate: Optional[float] = Field(None, description="Interest rate applied to the credit")
     account_number: Optional[str] = Field(None, description="Account number for the bank transfer")
     
-    client: 'Client' = Relationship(back_populates="payments", sa_relationship_kwargs={"lazy": "selectin"})
\ No newline at end of file
+    client: 'Client' = Relationship(back_populates="payments", sa_relationship_kwargs={"lazy": "raise"})
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import Optional, TYPE_CHECKING
-from datetime import date
+from datetime import date, datetime
 
 from sqlmodel import SQLModel, Relationship, Field
 
@@ -14,17 +14,20 @@ class Product(BaseModel, table=True):
     Product model for the database.
     """
     name: str = Field(..., description="Product's name")
+    sku: Optional[str] = Field(None, max_length=64, unique=True, index=True, description="Stock keeping unit, unique per product")
     short_description: Optional[str] = Field(None, description="Short description of the product")
     price: float = Field(..., description="Product's price")
     cost: float = Field(..., description="Product's cost")
     stock: int = Field(..., description="Available stock of the product")
+    reserved_stock: int = Field(0, description="Stock held by pending orders, included in stock")
     minimum_stock: int = Field(..., description="Minimum stock level of the product")
     image_key: Optional[str] = Field(None, description="Key of the product image")
     expiration_date: Optional[date] = Field(None, description="Expiration date of the consumable product")
 
-    service_inputs: Optional[list['ServiceInput']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "selectin"})
-    product_categories: Optional[list['ProductCategory']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "selectin"})
-    order_products: Optional[list['OrderProduct']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "selectin"})
+    service_inputs: Optional[list['ServiceInput']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "raise"})
+    product_categories: Optional[list['ProductCategory']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "raise"})
+    order_products: Optional[list['OrderProduct']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "raise"})
+    barcodes: Optional[list['ProductBarcode']] = Relationship(back_populates="product", sa_relationship_kwargs={"lazy": "raise"})
 
     
 class ProductCategory(SQLModel, table=True):
@@ -34,8 +37,17 @@ class ProductCategory(SQLModel, table=True):
     product_id: int = Field(foreign_key="product.id", primary_key=True, index = True)
     category_id: int = Field(foreign_key="category.id", primary_key=True, index = True)
 
-    product: 'Product' = Relationship(back_populates="product_categories")
-    category: 'Category' = Relationship(back_populates="product_categories")
+    product: 'Product' = Relationship(back_populates="product_categories", sa_relationship_kwargs={"lazy": "raise"})
+    category: 'Category' = Relationship(back_populates="product_categories", sa_relationship_kwargs={"lazy": "raise"})
+
+class ProductBarcode(SQLModel, table=True):
+    """
+    Barcode printed on a product; a product can carry several.
+    """
+    code: str = Field(..., max_length=64, primary_key=True, description="Scanned barcode, unique across products")
+    product_id: int = Field(foreign_key="product.id", index=True)
+
+    product: 'Product' = Relationship(back_populates="barcodes", sa_relationship_kwargs={"lazy": "raise"})
 
 class Category(BaseModel, table=True):
     """
@@ -44,4 +56,14 @@ class Category(BaseModel, table=True):
     name: str = Field(..., description="Category's name")
     description: str = Field(..., description="Category's description")
     
-    product_categories: Optional[list['ProductCategory']] = Relationship(back_populates="category", sa_relationship_kwargs={"lazy": "selectin"})
\ No newline at end of file
+    product_categories: Optional[list['ProductCategory']] = Relationship(back_populates="category", sa_relationship_kwargs={"lazy": "raise"})
+
+class ImageBlob(SQLModel, table=True):
+    """
+    Stored product image, keyed by the hash of its content and shared by every product that uses it.
+    """
+    key: str = Field(..., primary_key=True, description="Storage key of the original, derived from its SHA-256")
+    size: int = Field(..., description="Size of the original in bytes")
+    content_type: str = Field(..., description="Content type of the original")
+    refcount: int = Field(0, index=True, description="Products whose image_key points to this blob; rows at 0 wait for the sweep")
+    created_at: datetime = Field(default_factory=datetime.now)
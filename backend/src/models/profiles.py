@@ -0,0 +1,36 @@
+from sqlalchemy.orm import selectinload, joinedload
+
+from models.client import Client
+from models.employee import Employee
+from models.product import Product, Category
+from models.service import Service
+from models.order import Order
+
+class LoadProfile:
+    """
+    Named relationship loading options.
+
+    Relationships are declared with ``lazy="raise"``, so a query only loads the
+    collections it asks for: ``select(Order).options(*LoadProfile.ORDER_LINES)``.
+    """
+
+    NONE = ()
+
+    # Product
+    PRODUCT_CATEGORIES = (selectinload(Product.product_categories),)
+    PRODUCT_SERVICE_INPUTS = (selectinload(Product.service_inputs),)
+
+    # Category
+    CATEGORY_PRODUCTS = (selectinload(Category.product_categories),)
+
+    # Service
+    SERVICE_INPUTS = (selectinload(Service.service_inputs),)
+
+    # Order
+    ORDER_LINES = (selectinload(Order.order_products), selectinload(Order.order_services))
+    ORDER_PARTIES = (joinedload(Order.client), joinedload(Order.employee))
+    ORDER_DETAIL = ORDER_LINES + ORDER_PARTIES
+
+    # Users, para los borrados en cascada
+    CLIENT_DELETE = (selectinload(Client.orders), selectinload(Client.payments))
+    EMPLOYEE_ORDERS = (selectinload(Employee.orders),)
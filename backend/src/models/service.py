@@ -20,8 +20,8 @@ class Service(BaseModel, table=True):
     description: str = Field(..., description="Description of the service")
     cost: float = Field(..., description="Cost of the service")
     
-    service_inputs: Optional[list['ServiceInput']] = Relationship(back_populates="service", sa_relationship_kwargs={"lazy": "selectin"})
-    order_services: Optional[list['OrderService']] = Relationship(back_populates="service", sa_relationship_kwargs={"lazy": "selectin"})
+    service_inputs: Optional[list['ServiceInput']] = Relationship(back_populates="service", sa_relationship_kwargs={"lazy": "raise"})
+    order_services: Optional[list['OrderService']] = Relationship(back_populates="service", sa_relationship_kwargs={"lazy": "raise"})
 
 
 class ServiceInput(SQLModel, table = True):
@@ -29,8 +29,8 @@ class ServiceInput(SQLModel, table = True):
     service_id: int = Field(..., description="ID of the service that requires the product", foreign_key = "service.id", primary_key = True, index = True)
     product_id: int = Field(..., description="ID of the product required for the service", foreign_key = "product.id", primary_key = True, index = True)
 
-    service: 'Service' = Relationship(back_populates="service_inputs")
-    product: 'Product' = Relationship(back_populates="service_inputs")
+    service: 'Service' = Relationship(back_populates="service_inputs", sa_relationship_kwargs={"lazy": "raise"})
+    product: 'Product' = Relationship(back_populates="service_inputs", sa_relationship_kwargs={"lazy": "raise"})
     
     model_config: ConfigDict = ConfigDict(str_strip_whitespace=True,
                                           json_schema_extra={
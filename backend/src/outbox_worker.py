@@ -0,0 +1,24 @@
+"""Drain the outbox from a separate process: ``python outbox_worker.py``."""
+
+import asyncio
+
+from core import SETTINGS, setup_logging
+from db import init_engine, init_db, close_engine
+from services import OutboxService
+
+async def main() -> None:
+    
+    setup_logging()
+    
+    init_engine()
+    
+    await init_db()
+    
+    try:
+        await OutboxService.worker_loop(SETTINGS.outbox_poll_interval or 1.0)
+    
+    finally:
+        await close_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,6 +6,9 @@ from routes.order import router as OrderRouter
 from routes.others import router as OthersRouter
 from routes.invoice import router as InvoiceRouter
 from routes.files import router as FileRouter
+from routes.metrics import router as MetricsRouter
+from routes.analytics import router as AnalyticsRouter
+from routes.catalog import router as CatalogRouter
 __all__ = [
     "UserRouter",
     "AuthRouter",
@@ -14,5 +17,8 @@ __all__ = [
     "OrderRouter",
     "OthersRouter",
     "InvoiceRouter",
-    "FileRouter"
+    "FileRouter",
+    "MetricsRouter",
+    "AnalyticsRouter",
+    "CatalogRouter"
 ]
\ No newline at end of file
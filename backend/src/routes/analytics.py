@@ -0,0 +1,83 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi_pagination import Page
+from fastapi_pagination.ext.sqlmodel import apaginate
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import DailyProductSales, DailyPaymentMethod
+from dtos import DailyRevenueRead, EmployeeSalesRead, ProductSalesRead
+from services import AnalyticsService
+from db import get_session, get_read_session
+
+router = APIRouter(prefix="/analytics")
+
+@router.get("/revenue/daily", response_model = Page[DailyRevenueRead])
+async def read_daily_revenue(request: Request,
+                             start: Optional[date] = None,
+                             end: Optional[date] = None,
+                             db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Orders and revenue per day. Defaults to the last 30 days.
+    """
+    return await apaginate(db_session, AnalyticsService.search_daily_revenue(*AnalyticsService.period(start, end)))
+
+@router.get("/employees", response_model = Page[EmployeeSalesRead])
+async def read_employee_sales(request: Request,
+                              start: Optional[date] = None,
+                              end: Optional[date] = None,
+                              employee_id: Optional[int] = None,
+                              db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Orders and revenue per employee in the period, best sellers first.
+    """
+    return await apaginate(db_session, AnalyticsService.search_employee_sales(*AnalyticsService.period(start, end), employee_id))
+
+@router.get("/products/top", response_model = Page[ProductSalesRead])
+async def read_top_products(request: Request,
+                            start: Optional[date] = None,
+                            end: Optional[date] = None,
+                            db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Products with the most revenue in the period.
+    """
+    return await apaginate(db_session, AnalyticsService.search_top_products(*AnalyticsService.period(start, end)))
+
+@router.get("/products/{_id}", response_model = Page[DailyProductSales])
+async def read_product_sales(request: Request,
+                             _id: int,
+                             start: Optional[date] = None,
+                             end: Optional[date] = None,
+                             db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Daily units and revenue of a product.
+    """
+    return await apaginate(db_session, AnalyticsService.search_product_sales(*AnalyticsService.period(start, end), _id))
+
+@router.get("/payments/daily", response_model = Page[DailyPaymentMethod])
+async def read_payment_methods(request: Request,
+                               start: Optional[date] = None,
+                               end: Optional[date] = None,
+                               db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Completed payments per day and method.
+    """
+    return await apaginate(db_session, AnalyticsService.search_payment_methods(*AnalyticsService.period(start, end)))
+
+@router.post("/rebuild")
+async def rebuild_rollups(request: Request,
+                          db_session: AsyncSession = Depends(get_session)):
+    """
+    Recompute every rollup from the existing orders and payments.
+    """
+    try:
+        
+        await AnalyticsService.rebuild(db_session)
+        await db_session.commit()
+        
+        return True
+    
+    except Exception as e:
+        await db_session.rollback()
+        raise HTTPException(detail="Failed to rebuild the rollups", status_code=500) from e
@@ -0,0 +1,39 @@
+import gzip
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Depends, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from dtos import CatalogChanges
+from services import CatalogService
+from db import get_session
+
+router = APIRouter(prefix="/catalog")
+
+# Primario y no replica: con retraso de replicacion un terminal podria saltarse filas anteriores a su marca
+
+@router.get("/snapshot")
+async def read_catalog_snapshot(request: Request, db_session: AsyncSession = Depends(get_session)):
+    """
+    Full catalog as gzip JSON. Send the ETag back in If-None-Match to get a 304 when nothing changed.
+    """
+    etag = await CatalogService.version(db_session)
+
+    if request.headers.get("if-none-match") in (etag, "*"):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    snapshot = await CatalogService.snapshot(db_session, etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(content=snapshot.body, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+
+    return Response(content=await run_in_threadpool(gzip.decompress, snapshot.body), media_type="application/json", headers=headers)
+
+@router.get("/changes", response_model = CatalogChanges)
+async def read_catalog_changes(request: Request, since: datetime, db_session: AsyncSession = Depends(get_session)):
+    """
+    Products and categories changed after `since` (the watermark of the last sync) and the ids deleted after it.
+    """
+    return await CatalogService.changes(db_session, since)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Request, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, Query
 from botocore.client import BaseClient
 
 from services import AuthService, PaymentService, FileService
@@ -9,8 +11,9 @@ router = APIRouter(prefix="/files")
 @router.get("/{key:path}")
 async def get_file(request: Request,
                    key: str,
+                   size: Optional[int] = Query(None, gt=0, description="Display width in px; serves the nearest product image variant"),
                    storage_client: BaseClient = Depends(get_e2_client)):
     """
-    Retrieve a file by path.
+    Retrieve a file by path. With `size`, product images come as the smallest variant that covers it, WebP when accepted.
     """
-    return await FileService.get_file(storage_client, key)
\ No newline at end of file
+    return await FileService.get_file(storage_client, key, size, request.headers.get("accept", ""))
\ No newline at end of file
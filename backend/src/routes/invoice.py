@@ -1,18 +1,31 @@
-from fastapi import APIRouter, Request, BackgroundTasks
-from services import InvoiceService
-from models import InvoiceRequest
+from fastapi import APIRouter, Request, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from services import OutboxService
+from models import InvoiceRequest, OutboxKind
+from utils import OrderUtils
+from db import get_session
 
 router = APIRouter(prefix="/invoice")
 
 @router.post("/generate")
-async def generate_invoice(invoice_request: InvoiceRequest, background_tasks: BackgroundTasks):
-    invoice = await InvoiceService.workflow(
-        order_id=invoice_request.order_id,
-        tax_rate=invoice_request.tax_rate
-    )
-    background_tasks.add_task(
-        InvoiceService.send_invoice_email,
-        invoice=invoice
-    )
-    await InvoiceService.upload_invoice(invoice)
-    return invoice
+async def generate_invoice(request: Request,
+                           invoice_request: InvoiceRequest,
+                           db_session: AsyncSession = Depends(get_session)):
+    """
+    Queue the invoice email of an order; the outbox worker sends it and retries on failure.
+    """
+    if not await OrderUtils.exist_order(db_session, invoice_request.order_id):
+        raise HTTPException(detail="Order not found", status_code=404)
+    
+    try:
+        
+        await OutboxService.enqueue(db_session, OutboxKind.INVOICE_EMAIL, [invoice_request.order_id],
+                                    {"tax_rate": invoice_request.tax_rate})
+        await db_session.commit()
+        
+        return True
+    
+    except Exception as e:
+        await db_session.rollback()
+        raise HTTPException(detail="Failed to queue the invoice", status_code=500) from e
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Request, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import CATALOG_CACHE
+from db import get_pool_stats, get_session
+from services import OutboxService
+
+router = APIRouter(prefix="/metrics")
+
+@router.get("/db-pool")
+async def read_pool_stats(request: Request):
+    """
+    Retrieve connection pool occupancy and checkout wait-time histogram.
+    """
+    return get_pool_stats()
+
+@router.get("/catalog-cache")
+async def read_catalog_cache_stats(request: Request):
+    """
+    Retrieve hits, misses and size of this worker's product and category cache.
+    """
+    return CATALOG_CACHE.stats()
+
+@router.get("/outbox")
+async def read_outbox_stats(request: Request,
+                            db_session: AsyncSession = Depends(get_session)):
+    """
+    Retrieve queued outbox events per status and the age of the oldest pending one.
+    """
+    return await OutboxService.stats(db_session)
+
+@router.post("/outbox/retry")
+async def retry_outbox(request: Request,
+                       db_session: AsyncSession = Depends(get_session)):
+    """
+    Queue again the outbox events that ran out of attempts.
+    """
+    try:
+        
+        retried = await OutboxService.retry_failed(db_session)
+        await db_session.commit()
+        
+        return retried
+    
+    except Exception as e:
+        await db_session.rollback()
+        raise HTTPException(detail="Failed to retry the outbox events", status_code=500) from e
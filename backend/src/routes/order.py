@@ -1,29 +1,60 @@
-from fastapi import APIRouter, Request, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, Query, Header
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import apaginate
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models import OrderStatus, OrderService, OrderProduct
-from dtos import OrderRead, OrderUpdate, OrderCreate, OrderFilter, OrderProductFilter, OrderServiceFilter
+from dtos import OrderRead, OrderUpdate, OrderCreate, OrderCheckout, OrderDetail, OrderFilter, OrderProductFilter, OrderServiceFilter
 from crud import OrderCrud
-from services import AuthService, OrderService as OrderServiceService
-from db import get_session
+from services import AuthService, IdempotencyService, ExportService, ExportFormat, OrderService as OrderServiceService
+from db import get_session, get_read_session
 
 router = APIRouter(prefix="/order")
 
 @router.post("/", response_model=OrderRead)
 async def create_order(request: Request,
                        order: OrderCreate,
+                       idempotency_key: Optional[str] = Header(None, alias=IdempotencyService.HEADER),
                        db_session: AsyncSession = Depends(get_session)):
     """
-    Create a new order.
+    Create a new order. Retries with the same Idempotency-Key return the first response.
+    """
+    return await IdempotencyService.run(db_session, request, idempotency_key, order, OrderRead,
+                                        lambda: OrderCrud.create_order(db_session, order))
+
+@router.post("/checkout", response_model=OrderRead)
+async def create_checkout(request: Request,
+                          checkout: OrderCheckout,
+                          db_session: AsyncSession = Depends(get_session)):
+    """
+    Create an order with all its product and service lines in one transaction.
+    """
+    return await OrderCrud.create_checkout(db_session, checkout)
+
+@router.get("/detail/{_id}", response_model=OrderDetail)
+async def read_order_detail(request: Request,
+                            _id: int,
+                            db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Retrieve an order with its lines, prices and the client and employee names.
+    """
+    return await OrderCrud.read_order_detail(db_session, _id)
+
+@router.get("/detail/", response_model=list[OrderDetail])
+async def read_order_details(request: Request,
+                             ids: list[int] = Query(..., max_length=500),
+                             db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Retrieve several orders with their lines in one query. Missing ids are skipped.
     """
-    return await OrderCrud.create_order(db_session, order)
+    return await OrderCrud.read_order_details(db_session, ids)
 
 @router.get("/{_id}", response_model=OrderRead)
 async def read_order(request: Request,
                      _id: int,
-                     db_session: AsyncSession = Depends(get_session)):
+                     db_session: AsyncSession = Depends(get_read_session)):
     """
     Retrieve an order by ID.
     """
@@ -32,7 +63,7 @@ async def read_order(request: Request,
 @router.get("/", response_model=OrderRead)
 async def read_order_2(request: Request,
                        id: int,
-                       db_session: AsyncSession = Depends(get_session)):
+                       db_session: AsyncSession = Depends(get_read_session)):
     """
     Retrieve an order by ID.
     """
@@ -67,6 +98,34 @@ async def update_order_status_2(request: Request,
     """
     return await OrderCrud.update_order_status(db_session, order_id, status)
 
+@router.post("/recompute-totals", response_model=list[int])
+async def recompute_totals(request: Request,
+                           ids: Optional[list[int]] = Query(None),
+                           include_closed: bool = False,
+                           db_session: AsyncSession = Depends(get_session)):
+    """
+    Rebuild order totals from their lines and return the ids that were corrected.
+    """
+    return await OrderCrud.recompute_totals(db_session, ids, include_closed)
+
+@router.post("/reserve/{order_id}", response_model=dict[int, int])
+async def reserve_order_stock(request: Request,
+                              order_id: int,
+                              db_session: AsyncSession = Depends(get_session)):
+    """
+    Reserve stock for the product lines of a pending order.
+    """
+    return await OrderCrud.reserve_order_stock(db_session, order_id)
+
+@router.delete("/reserve/{order_id}", response_model=dict[int, int])
+async def release_order_stock(request: Request,
+                              order_id: int,
+                              db_session: AsyncSession = Depends(get_session)):
+    """
+    Release the stock reserved by an order.
+    """
+    return await OrderCrud.release_order_stock(db_session, order_id)
+
 @router.delete("/{_id}")
 async def delete_order(request: Request,
                        _id: int,
@@ -151,27 +210,45 @@ async def delete_order_product_2(request: Request,
 @router.post("/search", response_model=Page[OrderRead])
 async def search_orders(request: Request,
                         filters: OrderFilter,
-                        db_session: AsyncSession = Depends(get_session)):
+                        export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                        db_session: AsyncSession = Depends(get_read_session)):
     """
     Search orders who meet the filters.
     """
-    return await apaginate(db_session, OrderServiceService.search_orders(filters))
+    query = OrderServiceService.search_orders(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, OrderRead, export, "orders")
+
+    return await apaginate(db_session, query)
 
 @router.post("/service/search", response_model=Page[OrderService])
 async def search_order_services(request: Request,
                                  filters: OrderServiceFilter,
-                                 db_session: AsyncSession = Depends(get_session)):
+                                 export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                 db_session: AsyncSession = Depends(get_read_session)):
     """
     Search orders services who meet the filters.
     """
-    return await apaginate(db_session, OrderServiceService.search_order_services(filters))
+    query = OrderServiceService.search_order_services(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, OrderService, export, "order_services")
+
+    return await apaginate(db_session, query)
 
 
 @router.post("/product/search", response_model=Page[OrderProduct])
 async def search_order_products(request: Request,
                                 filters: OrderProductFilter,
-                                db_session: AsyncSession = Depends(get_session)):
+                                export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                db_session: AsyncSession = Depends(get_read_session)):
     """
     Search orders products who meet the filters.
     """
-    return await apaginate(db_session, OrderServiceService.search_order_products(filters))
\ No newline at end of file
+    query = OrderServiceService.search_order_products(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, OrderProduct, export, "order_products")
+
+    return await apaginate(db_session, query)
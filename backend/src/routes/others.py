@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Request, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, Query, Header
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import apaginate
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -6,24 +8,26 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from models import PaymentMethod, PaymentStatus
 from dtos import PaymentCreate, PaymentRead, PaymentUpdate, PaymentFilter
 from crud import PaymentCrud
-from services import AuthService, PaymentService
-from db import get_session
+from services import AuthService, PaymentService, IdempotencyService, ExportService, ExportFormat
+from db import get_session, get_read_session
 
 router = APIRouter(prefix="/others")
 
 @router.post("/payment", response_model = PaymentRead)
 async def create_payment(request: Request,
                          payment: PaymentCreate,
+                         idempotency_key: Optional[str] = Header(None, alias=IdempotencyService.HEADER),
                          db_session: AsyncSession = Depends(get_session)):
     """
-    Create a new payment.
+    Create a new payment. Retries with the same Idempotency-Key return the first response.
     """
-    return await PaymentCrud.create_payment(db_session, payment)
+    return await IdempotencyService.run(db_session, request, idempotency_key, payment, PaymentRead,
+                                        lambda: PaymentCrud.create_payment(db_session, payment))
 
 @router.get("/payment/{_id}", response_model = PaymentRead)
 async def read_payment(request: Request,
                        _id: int,
-                       db_session: AsyncSession = Depends(get_session)):
+                       db_session: AsyncSession = Depends(get_read_session)):
     """
     Retrieve a payment by ID.
     """
@@ -32,7 +36,7 @@ async def read_payment(request: Request,
 @router.get("/payment/", response_model = PaymentRead)
 async def read_payment_2(request: Request,
                          id: int,
-                         db_session: AsyncSession = Depends(get_session)):
+                         db_session: AsyncSession = Depends(get_read_session)):
     """
     Retrieve a payment by ID.
     """
@@ -68,8 +72,14 @@ async def delete_payment_2(request: Request,
 @router.post("/payment/search", response_model = Page[PaymentRead])
 async def search_payments(request: Request,
                           filters: PaymentFilter,
-                          db_session: AsyncSession = Depends(get_session)):
+                          export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                          db_session: AsyncSession = Depends(get_read_session)):
     """
     Search payments who meet the filters.
     """
-    return await apaginate(db_session, PaymentService.search_payments(filters))
\ No newline at end of file
+    query = PaymentService.search_payments(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, PaymentRead, export, "payments")
+
+    return await apaginate(db_session, query)
@@ -1,17 +1,22 @@
 from datetime import date
+from typing import Optional
 
-from fastapi import APIRouter, Request, Depends, UploadFile, File
-from fastapi_pagination import Page
+from fastapi import APIRouter, Request, Response, Depends, UploadFile, File, Query, HTTPException
+from fastapi_pagination import Page, Params
 from fastapi_pagination.ext.sqlmodel import apaginate
 from sqlmodel.ext.asyncio.session import AsyncSession
 from botocore.client import BaseClient
 
-from models import ProductCategory
-from dtos import ProductCreate, ProductRead, ProductUpdate, ProductFilter, CategoryCreate, CategoryRead, CategoryUpdate, CategoryFilter
+from models import Product, ProductCategory, ProductBarcode, Category, StockMovement
+from dtos import (
+    ProductCreate, ProductRead, ProductUpdate, ProductFilter, CategoryCreate, CategoryRead, CategoryUpdate, CategoryFilter,
+    CategoryMembership, CategoryMembershipResult, ProductImportResult, ProductSearchResult
+)
 from crud import ProductCrud
-from services import AuthService, ProductService
-from core import get_e2_client
-from db import get_session
+from services import AuthService, ProductService, InventoryService, ExportService, ExportFormat
+from utils import ConditionalUtils
+from core import CatalogCache, get_e2_client
+from db import get_session, get_read_session
 
 router = APIRouter(prefix="/product")
 
@@ -24,19 +29,39 @@ async def create_product(request: Request,
     """
     return await ProductCrud.create_product(db_session, product)
 
+@router.post("/import", response_model = ProductImportResult)
+async def import_products(request: Request,
+                          file: UploadFile = File(..., title="products_file"),
+                          db_session: AsyncSession = Depends(get_session)):
+    """
+    Create or update products from a CSV or XLSX file, matched by SKU and, for rows or products without one, by name.
+    A name shared by several products is reported as an error instead of merged; add the SKU to choose one.
+    The stock column only applies to new products; existing stock changes through the stock endpoints.
+    """
+    return await ProductCrud.import_products(db_session, file)
+
+@router.get("/scan/{code}", response_model = ProductRead)
+async def scan_product(request: Request, code: str, db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Retrieve the product of a scanned barcode or SKU.
+    """
+    return await ProductCrud.scan_product(db_session, code)
+
 @router.get("/{_id}", response_model = ProductRead)
-async def read_product(request: Request, _id: int, db_session: AsyncSession = Depends(get_session)):
+async def read_product(request: Request, response: Response, _id: int, db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a product by ID.
+    Retrieve a product by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ProductCrud.read_product(db_session, _id)
+    return await ConditionalUtils.read(request, response, db_session, Product, _id,
+                                       lambda: ProductCrud.read_product(db_session, _id), CatalogCache.PRODUCT)
 
 @router.get("/", response_model = ProductRead)
-async def read_product_2(request: Request, id: int, db_session: AsyncSession = Depends(get_session)):
+async def read_product_2(request: Request, response: Response, id: int, db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a product by ID.
+    Retrieve a product by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ProductCrud.read_product(db_session, id)
+    return await ConditionalUtils.read(request, response, db_session, Product, id,
+                                       lambda: ProductCrud.read_product(db_session, id), CatalogCache.PRODUCT)
 
 @router.patch("/", response_model = ProductRead)
 async def update_product(request: Request,
@@ -91,25 +116,55 @@ async def update_product_stock_2(request: Request,
     """
     return await ProductCrud.update_stock(db_session, id, stock, replace)
 
+@router.get("/stock/{_id}", response_model = dict[int, int])
+async def read_product_stock(request: Request,
+                             _id: int,
+                             db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Current stock of a product, from its last snapshot plus later movements.
+    """
+    stock = await InventoryService.current_stock(db_session, [_id])
+    
+    if not stock:
+        raise HTTPException(detail="Product not found", status_code=404)
+    
+    return stock
+
+@router.get("/stock/", response_model = dict[int, int])
+async def read_products_stock(request: Request,
+                              ids: list[int] = Query(..., max_length=500),
+                              db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Current stock of several products in one query.
+    """
+    return await InventoryService.current_stock(db_session, ids)
+
+@router.get("/movements/{_id}", response_model = Page[StockMovement])
+async def read_product_movements(request: Request,
+                                 _id: int,
+                                 db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Stock movement history of a product, newest first.
+    """
+    return await apaginate(db_session, InventoryService.search_movements(_id))
+
 @router.delete("/{_id}")
 async def delete_product(request: Request,
                          _id: int,
-                          storage_client: BaseClient = Depends(get_e2_client),
-                          db_session: AsyncSession = Depends(get_session)):
+                         db_session: AsyncSession = Depends(get_session)):
     """
     Delete a product by ID.
     """
-    return await ProductCrud.delete_product(db_session, storage_client, _id)
+    return await ProductCrud.delete_product(db_session, _id)
 
 @router.delete("/")
 async def delete_product_2(request: Request, 
                            id: int,
-                           storage_client: BaseClient = Depends(get_e2_client),
                            db_session: AsyncSession = Depends(get_session)):
     """
     Delete a product by ID.
     """
-    return await ProductCrud.delete_product(db_session, storage_client, id)
+    return await ProductCrud.delete_product(db_session, id)
 
 @router.post("/product-category", response_model = ProductCategory)
 async def create_product_category(request: Request,
@@ -129,6 +184,53 @@ async def delete_product_category(request: Request,
     """
     return await ProductCrud.delete_product_category(db_session, product_category)
 
+@router.get("/barcode/{_id}", response_model = list[ProductBarcode])
+async def read_product_barcodes(request: Request,
+                                _id: int,
+                                db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Retrieve the barcodes of a product.
+    """
+    return await ProductCrud.read_barcodes(db_session, _id)
+
+@router.post("/barcode", response_model = ProductBarcode)
+async def create_product_barcode(request: Request,
+                                 barcode: ProductBarcode,
+                                 db_session: AsyncSession = Depends(get_session)):
+    """
+    Add a barcode to a product.
+    """
+    return await ProductCrud.create_barcode(db_session, barcode)
+
+@router.delete("/barcode/{code}")
+async def delete_product_barcode(request: Request,
+                                 code: str,
+                                 db_session: AsyncSession = Depends(get_session)):
+    """
+    Remove a barcode from its product.
+    """
+    return await ProductCrud.delete_barcode(db_session, code)
+
+@router.post("/category/{_id}/products", response_model = list[CategoryMembershipResult])
+async def assign_products_to_category(request: Request,
+                                      _id: int,
+                                      membership: CategoryMembership,
+                                      db_session: AsyncSession = Depends(get_session)):
+    """
+    Assign many products to a category, with the result of each product.
+    """
+    return await ProductCrud.assign_products_to_category(db_session, _id, membership.product_ids)
+
+@router.delete("/category/{_id}/products", response_model = list[CategoryMembershipResult])
+async def unassign_products_from_category(request: Request,
+                                          _id: int,
+                                          membership: CategoryMembership,
+                                          db_session: AsyncSession = Depends(get_session)):
+    """
+    Remove many products from a category, with the result of each product.
+    """
+    return await ProductCrud.unassign_products_from_category(db_session, _id, membership.product_ids)
+
 @router.post("/category", response_model = CategoryRead)
 async def create_category(request: Request,
                           category: CategoryCreate,
@@ -139,18 +241,20 @@ async def create_category(request: Request,
     return await ProductCrud.create_category(db_session, category)
 
 @router.get("/category/{_id}", response_model = CategoryRead)
-async def read_category(request: Request, _id: int, db_session: AsyncSession = Depends(get_session)):
+async def read_category(request: Request, response: Response, _id: int, db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a product category by ID.
+    Retrieve a product category by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ProductCrud.read_category(db_session, _id)
+    return await ConditionalUtils.read(request, response, db_session, Category, _id,
+                                       lambda: ProductCrud.read_category(db_session, _id), CatalogCache.CATEGORY)
 
 @router.get("/category/", response_model = CategoryRead)
-async def read_category_2(request: Request, id: int, db_session: AsyncSession = Depends(get_session)):
+async def read_category_2(request: Request, response: Response, id: int, db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a product category by ID.
+    Retrieve a product category by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ProductCrud.read_category(db_session, id)
+    return await ConditionalUtils.read(request, response, db_session, Category, id,
+                                       lambda: ProductCrud.read_category(db_session, id), CatalogCache.CATEGORY)
 
 @router.patch("/category/", response_model = CategoryRead)
 async def update_category(request: Request,
@@ -178,69 +282,134 @@ async def delete_category_2(request: Request, id: int, db_session: AsyncSession
 @router.post("/search", response_model = Page[ProductRead])
 async def search_products(request: Request,
                           filters: ProductFilter,
-                          db_session: AsyncSession = Depends(get_session)):
+                          export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                          db_session: AsyncSession = Depends(get_read_session)):
     """
     Search category who meet the filters.
     """
-    return await apaginate(db_session, ProductService.search_products(filters))
+    query = ProductService.search_products(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
+
+@router.post("/search/faceted", response_model = ProductSearchResult)
+async def search_products_faceted(request: Request,
+                                  filters: ProductFilter,
+                                  params: Params = Depends(),
+                                  db_session: AsyncSession = Depends(get_read_session)):
+    """
+    Search products who meet the filters, with the price, stock and expiry counts of all of them.
+    """
+    query = ProductService.search_products(filters)
+
+    # La respuesta no es un Page, add_pagination no inyecta los parametros: se pasan explicitos
+    page = await apaginate(db_session, query, params, transformer=ProductService.read_with_stock)
+    facets = await ProductService.search_facets(db_session, filters)
+
+    # Los items ya son ProductRead con el stock del libro, la pagina se valida por atributos
+    return ProductSearchResult.model_validate({"page": page, "facets": facets}, from_attributes=True)
 
 @router.get("/search/category/{category_id}", response_model = Page[ProductRead])
 async def search_products_by_category(request: Request,
                                       category_id: int,
-                                      db_session: AsyncSession = Depends(get_session)):
+                                      export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                      db_session: AsyncSession = Depends(get_read_session)):
     """
     Get products by category.
     """
-    return await apaginate(db_session, ProductService.search_products_by_category(category_id))
+    query = ProductService.search_products_by_category(category_id)
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.get("/search/category/", response_model = Page[ProductRead])
 async def search_products_by_category_2(request: Request,
                                         category_id: int,
-                                        db_session: AsyncSession = Depends(get_session)):
+                                        export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                        db_session: AsyncSession = Depends(get_read_session)):
     """
     Get products by category in base format.
     """
-    return await apaginate(db_session, ProductService.search_products_by_category(category_id))
+    query = ProductService.search_products_by_category(category_id)
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.get("/search/service/{service_id}", response_model = Page[ProductRead])
 async def search_products_by_service(request: Request,
                                      service_id: int,
-                                     db_session: AsyncSession = Depends(get_session)):
+                                     export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                     db_session: AsyncSession = Depends(get_read_session)):
     """
     Get products by service.
     """
-    return await apaginate(db_session, ProductService.search_products_by_service(service_id))
+    query = ProductService.search_products_by_service(service_id)
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.get("/search/service/", response_model = Page[ProductRead])
 async def search_products_by_service_2(request: Request,
                                      service_id: int,
-                                     db_session: AsyncSession = Depends(get_session)):
+                                     export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                     db_session: AsyncSession = Depends(get_read_session)):
     """
     Get products by service.
     """
-    return await apaginate(db_session, ProductService.search_products_by_service(service_id))
+    query = ProductService.search_products_by_service(service_id)
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.get("/search/low-stock", response_model = Page[ProductRead])
 async def search_low_stock_products(request: Request,
-                                    db_session: AsyncSession = Depends(get_session)):
+                                    export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                    db_session: AsyncSession = Depends(get_read_session)):
     """
     Search products with low stock.
     """
-    return await apaginate(db_session, ProductService.search_low_stock_products())
+    query = ProductService.search_low_stock_products()
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "low_stock_products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.get("/search/expired", response_model = Page[ProductRead])
 async def search_expired_products(request: Request,
-                                  db_session: AsyncSession = Depends(get_session)):
+                                  export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                  db_session: AsyncSession = Depends(get_read_session)):
     """
     Search expired products.
     """
-    return await apaginate(db_session, ProductService.search_expired_products())
+    query = ProductService.search_expired_products()
+
+    if export:
+        return await ExportService.stream(db_session, query, ProductRead, export, "expired_products", ProductService.read_with_stock)
+
+    return await apaginate(db_session, query, transformer=ProductService.read_with_stock)
 
 @router.post("/category/search", response_model = Page[CategoryRead])
 async def search_category(request: Request,
                           filters: CategoryFilter,
-                          db_session: AsyncSession = Depends(get_session)):
+                          export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                          db_session: AsyncSession = Depends(get_read_session)):
     """
     Search category who meet the filters.
     """
-    return await apaginate(db_session, ProductService.search_categories(filters))
\ No newline at end of file
+    query = ProductService.search_categories(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, CategoryRead, export, "categories")
+
+    return await apaginate(db_session, query)
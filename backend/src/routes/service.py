@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Request, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Response, Depends, Query
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import apaginate
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import ServiceInput
+from models import Service, ServiceInput
 from dtos import ServiceCreate, ServiceUpdate, ServiceRead, ServiceFilter, ServiceInputFilter
 from crud import ServiceCrud
-from db import get_session
-from services import AuthService, ServiceService
+from utils import ConditionalUtils
+from db import get_session, get_read_session
+from services import AuthService, ServiceService, ExportService, ExportFormat
 
 router = APIRouter(prefix="/service")
 
@@ -22,21 +25,25 @@ async def create_service(request: Request,
 
 @router.get("/{_id}", response_model = ServiceRead)
 async def read_service(request : Request,
+                       response: Response,
                        _id: int,
-                       db_session: AsyncSession = Depends(get_session)):
+                       db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a service by ID.
+    Retrieve a service by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ServiceCrud.read_service(db_session, _id)
+    return await ConditionalUtils.read(request, response, db_session, Service, _id,
+                                       lambda: ServiceCrud.read_service(db_session, _id))
 
 @router.get("/", response_model = ServiceRead)
 async def read_service_2(request : Request,
+                         response: Response,
                          id: int,
-                         db_session: AsyncSession = Depends(get_session)):
+                         db_session: AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a service by ID.
+    Retrieve a service by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await ServiceCrud.read_service(db_session, id)
+    return await ConditionalUtils.read(request, response, db_session, Service, id,
+                                       lambda: ServiceCrud.read_service(db_session, id))
 
 @router.patch("/", response_model = ServiceRead)
 async def update_service_2(request: Request, 
@@ -96,17 +103,29 @@ async def delete_service_input_2(request: Request,
 @router.post("/search", response_model = Page[ServiceRead])
 async def search_services(request: Request,
                           filters: ServiceFilter,
-                          db_session: AsyncSession = Depends(get_session)):
+                          export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                          db_session: AsyncSession = Depends(get_read_session)):
     """
     Search services who meet the filters.
     """
-    return await apaginate(db_session, ServiceService.search_services(filters))
+    query = ServiceService.search_services(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, ServiceRead, export, "services")
+
+    return await apaginate(db_session, query)
 
 @router.post("/service-input/search", response_model = Page[ServiceInput])
 async def search_service_inputs(request: Request,
                                 filters: ServiceInputFilter,
-                                db_session: AsyncSession = Depends(get_session)):
+                                export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                                db_session: AsyncSession = Depends(get_read_session)):
     """
     Search service inputs who meet the filters.
     """
-    return await apaginate(db_session, ServiceService.search_service_inputs(filters))
\ No newline at end of file
+    query = ServiceService.search_service_inputs(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, ServiceInput, export, "service_inputs")
+
+    return await apaginate(db_session, query)
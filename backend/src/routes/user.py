@@ -1,15 +1,17 @@
 from datetime import date
+from typing import Optional
 
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Response, Depends, Query
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import apaginate
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import EmployeeRole
+from models import Client, EmployeeRole
 from dtos import ClientCreate, ClientRead, ClientUpdate, ClientFilter, EmployeeCreate, EmployeeRead, EmployeeUpdate, EmployeeFilter
 from crud import UserCrud
-from db import get_session
-from services import AuthService, UserService
+from utils import ConditionalUtils
+from db import get_session, get_read_session
+from services import AuthService, UserService, ExportService, ExportFormat
 
 
 router = APIRouter(prefix="/user")
@@ -27,7 +29,7 @@ async def create_employee(request: Request,
 @router.get("/employee/{_id}", response_model = EmployeeRead)
 async def read_employee(request: Request,
                         _id: int,
-                        db_session : AsyncSession = Depends(get_session)):
+                        db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by ID.
     """
@@ -36,7 +38,7 @@ async def read_employee(request: Request,
 @router.get("/employee/", response_model = EmployeeRead)
 async def read_employee_2(request: Request,
                           _id: int,
-                          db_session : AsyncSession = Depends(get_session)):
+                          db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by email.
     """
@@ -45,7 +47,7 @@ async def read_employee_2(request: Request,
 @router.get("/employee/email/{email}", response_model = EmployeeRead)
 async def read_employee_by_email(request: Request,
                                  email: str,
-                                 db_session : AsyncSession = Depends(get_session)):
+                                 db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by email.
     """
@@ -54,7 +56,7 @@ async def read_employee_by_email(request: Request,
 @router.get("/employee/email/", response_model = EmployeeRead)
 async def read_employee_by_email_2(request: Request,
                                    email: str,
-                                   db_session : AsyncSession = Depends(get_session)):
+                                   db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by email.
     """
@@ -63,7 +65,7 @@ async def read_employee_by_email_2(request: Request,
 @router.get("/employee/documentid/{document_id}", response_model = EmployeeRead)
 async def read_employee_by_documentid(request: Request,
                                       document_id: int,
-                                      db_session : AsyncSession = Depends(get_session)):
+                                      db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by document ID.
     """
@@ -72,7 +74,7 @@ async def read_employee_by_documentid(request: Request,
 @router.get("/employee/documentid/", response_model = EmployeeRead)
 async def read_employee_by_documentid_2(request: Request,
                                         document_id: int,
-                                        db_session : AsyncSession = Depends(get_session)):
+                                        db_session : AsyncSession = Depends(get_read_session)):
     """
     Get an employee by document ID.
     """
@@ -170,26 +172,30 @@ async def create_client(request: Request,
 
 @router.get("/client/{_id}", response_model = ClientRead)
 async def read_client(request: Request,
+                      response: Response,
                       _id: int,
-                      db_session : AsyncSession = Depends(get_session)):
+                      db_session : AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a client by ID.
+    Retrieve a client by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await UserCrud.read_client(db_session, _id)
+    return await ConditionalUtils.read(request, response, db_session, Client, _id,
+                                       lambda: UserCrud.read_client(db_session, _id))
 
 @router.get("/client/", response_model = ClientRead)
 async def read_client_2(request: Request,
+                        response: Response,
                         _id: int,
-                        db_session : AsyncSession = Depends(get_session)):
+                        db_session : AsyncSession = Depends(get_read_session)):
     """
-    Retrieve a client by ID.
+    Retrieve a client by ID. Answers 304 to If-None-Match / If-Modified-Since when unchanged.
     """
-    return await UserCrud.read_client(db_session, _id)
+    return await ConditionalUtils.read(request, response, db_session, Client, _id,
+                                       lambda: UserCrud.read_client(db_session, _id))
 
 @router.get("/client/email/{email}", response_model = ClientRead)
 async def read_client_by_email(request: Request,
                                email: str,
-                               db_session : AsyncSession = Depends(get_session)):
+                               db_session : AsyncSession = Depends(get_read_session)):
     """
     Retrieve a client by email.
     """
@@ -198,7 +204,7 @@ async def read_client_by_email(request: Request,
 @router.get("/client/email/", response_model = ClientRead)
 async def read_client_by_email_2(request: Request,
                                  email: str,
-                                 db_session : AsyncSession = Depends(get_session)):
+                                 db_session : AsyncSession = Depends(get_read_session)):
     """
     Retrieve a client by email.
     """
@@ -207,7 +213,7 @@ async def read_client_by_email_2(request: Request,
 @router.get("/client/documentid/{document_id}", response_model = ClientRead)
 async def read_client_by_documentid(request: Request,
                                     document_id: int,
-                                    db_session : AsyncSession = Depends(get_session)):
+                                    db_session : AsyncSession = Depends(get_read_session)):
     """
     Retrieve a client by document ID.
     """
@@ -216,7 +222,7 @@ async def read_client_by_documentid(request: Request,
 @router.get("/client/documentid/", response_model = ClientRead)
 async def read_client_by_documentid_2(request: Request, 
                                       document_id: int,
-                                      db_session : AsyncSession = Depends(get_session)):
+                                      db_session : AsyncSession = Depends(get_read_session)):
     """
     Retrieve a client by document ID.
     """
@@ -305,17 +311,29 @@ async def delete_client_by_documentid_2(request: Request,
 @router.post("/employee/search", response_model = Page[EmployeeRead])
 async def search_employees(request: Request,
                            filters: EmployeeFilter,
-                           db_session : AsyncSession = Depends(get_session)):
+                           export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                           db_session : AsyncSession = Depends(get_read_session)):
     """
     Search employees who meet the filters.
     """
-    return await apaginate(db_session, UserService.search_employees(filters))
+    query = UserService.search_employees(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, EmployeeRead, export, "employees")
+
+    return await apaginate(db_session, query)
 
 @router.post("/client/search", response_model = Page[ClientRead])
 async def search_clients(request: Request,
                          filters: ClientFilter,
-                         db_session : AsyncSession = Depends(get_session)):
+                         export: Optional[ExportFormat] = Query(None, description="Stream every match as ndjson or csv instead of a page"),
+                         db_session : AsyncSession = Depends(get_read_session)):
     """
     Search clients who meet the filters.
     """
-    return await apaginate(db_session, UserService.search_clients(filters))
\ No newline at end of file
+    query = UserService.search_clients(filters)
+
+    if export:
+        return await ExportService.stream(db_session, query, ClientRead, export, "clients")
+
+    return await apaginate(db_session, query)
@@ -1,21 +1,36 @@
 from services.user import UserService
 from services.auth import AuthService
+from services.inventory import InventoryService
+from services.analytics import AnalyticsService
+from services.outbox import OutboxService
 from services.order import OrderService
 from services.product import ProductService
+from services.product_import import ProductImportService
+from services.catalog import CatalogService
 from services.service import ServiceService
 from services.others import PaymentService, FileService
 from services.email import EmailService
 from services.invoice import InvoiceService
+from services.idempotency import IdempotencyService
+from services.export import ExportService, ExportFormat
 
 __all__ = [
     "UserService",
     "AuthService",
+    "InventoryService",
+    "AnalyticsService",
+    "OutboxService",
     "OrderService",
     "ProductService",
+    "ProductImportService",
+    "CatalogService",
     "ServiceService",
     "PaymentService",
     "FileService",
     "EmailService",
     "InvoiceService",
+    "IdempotencyService",
+    "ExportService",
+    "ExportFormat",
     "GenAIService"
 ]
\ No newline at end of file
@@ -0,0 +1,218 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, delete, func
+from sqlalchemy.sql.expression import Select
+
+from models import (
+    Order, OrderProduct, OrderStatus, Product, Payment, PaymentMethod, PaymentStatus,
+    DailyProductSales, DailyEmployeeSales, DailyPaymentMethod
+)
+from db import insert_on_conflict
+from core import log_operation
+
+class AnalyticsService:
+    """Daily sales rollups, updated in the same transaction as the order or payment that changes them."""
+
+    ORDER_DAY = func.date(Order.created_at)
+    PAYMENT_DAY = func.date(Payment.created_at)
+
+    DEFAULT_PERIOD = timedelta(days=30)
+
+    @staticmethod
+    def period(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+        """Fill a missing bound with today or with the default period before `end`."""
+
+        end = end or date.today()
+        start = start or end - AnalyticsService.DEFAULT_PERIOD
+
+        if start > end:
+            raise HTTPException(detail="start must not be after end", status_code=400)
+
+        return start, end
+
+    @staticmethod
+    def _product_sales(order_ids: Optional[list[int]], sign: int = 1) -> Select:
+        """Units and revenue per day and product of the given orders, or of every completed order, at the price of each sale."""
+
+        query = (select(AnalyticsService.ORDER_DAY, OrderProduct.product_id,
+                        sign * func.sum(OrderProduct.quantity),
+                        sign * func.sum(OrderProduct.quantity * func.coalesce(OrderProduct.unit_price, Product.price)))
+                 .join(Order, Order.id == OrderProduct.order_id)
+                 .join(Product, Product.id == OrderProduct.product_id)
+                 .group_by(AnalyticsService.ORDER_DAY, OrderProduct.product_id))
+
+        if order_ids is None:
+            return query.where(Order.status == OrderStatus.COMPLETED)
+
+        return query.where(OrderProduct.order_id.in_(order_ids))
+
+    @staticmethod
+    def _employee_sales(order_ids: Optional[list[int]],
+                        completed: int = 0,
+                        cancelled: int = 0,
+                        refunded: int = 0,
+                        revenue: int = 0) -> Select:
+        """Order counts and revenue per day and employee; the arguments weight each order of `order_ids`."""
+
+        query = (select(AnalyticsService.ORDER_DAY, Order.employee_id)
+                 .group_by(AnalyticsService.ORDER_DAY, Order.employee_id))
+
+        if order_ids is None:
+            # Reconstruccion: cada orden cuenta segun su estado actual
+            closed = Order.status.in_([OrderStatus.COMPLETED, OrderStatus.REFUNDED])
+
+            return (query.add_columns(func.count().filter(closed),
+                                      func.count().filter(Order.status == OrderStatus.CANCELLED),
+                                      func.count().filter(Order.status == OrderStatus.REFUNDED),
+                                      func.coalesce(func.sum(Order.total_price).filter(Order.status == OrderStatus.COMPLETED), 0))
+                         .where(Order.status != OrderStatus.PENDING))
+
+        return (query.add_columns(completed * func.count(),
+                                  cancelled * func.count(),
+                                  refunded * func.count(),
+                                  revenue * func.coalesce(func.sum(Order.total_price), 0))
+                     .where(Order.id.in_(order_ids)))
+
+    @staticmethod
+    async def _add_product_sales(db_session: AsyncSession, source: Select) -> None:
+
+        stmt = insert_on_conflict(db_session, DailyProductSales)
+        stmt = stmt.from_select(["day", "product_id", "quantity", "revenue"], source)
+
+        await db_session.exec(stmt.on_conflict_do_update(
+            index_elements=["day", "product_id"],
+            set_={"quantity": DailyProductSales.quantity + stmt.excluded.quantity,
+                  "revenue": DailyProductSales.revenue + stmt.excluded.revenue}
+        ))
+
+    @staticmethod
+    async def _add_employee_sales(db_session: AsyncSession, source: Select) -> None:
+
+        stmt = insert_on_conflict(db_session, DailyEmployeeSales)
+        stmt = stmt.from_select(["day", "employee_id", "completed", "cancelled", "refunded", "revenue"], source)
+
+        await db_session.exec(stmt.on_conflict_do_update(
+            index_elements=["day", "employee_id"],
+            set_={"completed": DailyEmployeeSales.completed + stmt.excluded.completed,
+                  "cancelled": DailyEmployeeSales.cancelled + stmt.excluded.cancelled,
+                  "refunded": DailyEmployeeSales.refunded + stmt.excluded.refunded,
+                  "revenue": DailyEmployeeSales.revenue + stmt.excluded.revenue}
+        ))
+
+    @staticmethod
+    @log_operation(True)
+    async def record_completed(db_session: AsyncSession, order_ids: list[int]) -> None:
+        """Add completed orders to the rollups. The caller commits."""
+
+        await AnalyticsService._add_product_sales(db_session, AnalyticsService._product_sales(order_ids))
+        await AnalyticsService._add_employee_sales(db_session, AnalyticsService._employee_sales(order_ids, completed=1, revenue=1))
+
+    @staticmethod
+    @log_operation(True)
+    async def record_cancelled(db_session: AsyncSession, order_ids: list[int]) -> None:
+        """Count cancelled orders in the rollups. The caller commits."""
+        await AnalyticsService._add_employee_sales(db_session, AnalyticsService._employee_sales(order_ids, cancelled=1))
+
+    @staticmethod
+    @log_operation(True)
+    async def record_refunded(db_session: AsyncSession, order_ids: list[int]) -> None:
+        """Take refunded orders out of the revenue rollups. The caller commits."""
+
+        await AnalyticsService._add_product_sales(db_session, AnalyticsService._product_sales(order_ids, sign=-1))
+        await AnalyticsService._add_employee_sales(db_session, AnalyticsService._employee_sales(order_ids, refunded=1, revenue=-1))
+
+    @staticmethod
+    @log_operation(True)
+    async def record_payment(db_session: AsyncSession, created_at: datetime, method: PaymentMethod, amount: float, sign: int = 1) -> None:
+        """Add a completed payment to the rollup, or take it out with `sign=-1`. The caller commits."""
+
+        stmt = insert_on_conflict(db_session, DailyPaymentMethod).values(day=created_at.date(), method=method,
+                                                                         payments=sign, amount=sign * amount)
+
+        await db_session.exec(stmt.on_conflict_do_update(
+            index_elements=["day", "method"],
+            set_={"payments": DailyPaymentMethod.payments + stmt.excluded.payments,
+                  "amount": DailyPaymentMethod.amount + stmt.excluded.amount}
+        ))
+
+    @staticmethod
+    @log_operation(True)
+    async def rebuild(db_session: AsyncSession) -> None:
+        """Recompute every rollup from the orders and payments in bulk. The caller commits."""
+
+        for model in (DailyProductSales, DailyEmployeeSales, DailyPaymentMethod):
+            await db_session.exec(delete(model))
+
+        await db_session.exec(insert(DailyProductSales).from_select(
+            ["day", "product_id", "quantity", "revenue"], AnalyticsService._product_sales(None)
+        ))
+
+        await db_session.exec(insert(DailyEmployeeSales).from_select(
+            ["day", "employee_id", "completed", "cancelled", "refunded", "revenue"], AnalyticsService._employee_sales(None)
+        ))
+
+        await db_session.exec(insert(DailyPaymentMethod).from_select(
+            ["day", "method", "payments", "amount"],
+            select(AnalyticsService.PAYMENT_DAY, Payment.method, func.count(), func.sum(Payment.amount))
+            .where(Payment.status == PaymentStatus.COMPLETED)
+            .group_by(AnalyticsService.PAYMENT_DAY, Payment.method)
+        ))
+
+    @staticmethod
+    def search_daily_revenue(start: date, end: date) -> Select:
+        """Query with orders and revenue per day between `start` and `end`."""
+        return (select(DailyEmployeeSales.day,
+                       func.sum(DailyEmployeeSales.completed).label("completed"),
+                       func.sum(DailyEmployeeSales.cancelled).label("cancelled"),
+                       func.sum(DailyEmployeeSales.refunded).label("refunded"),
+                       func.sum(DailyEmployeeSales.revenue).label("revenue"))
+                .where(DailyEmployeeSales.day.between(start, end))
+                .group_by(DailyEmployeeSales.day)
+                .order_by(DailyEmployeeSales.day))
+
+    @staticmethod
+    def search_employee_sales(start: date, end: date, employee_id: Optional[int] = None) -> Select:
+        """Query with orders and revenue per employee between `start` and `end`, best sellers first."""
+
+        query = (select(DailyEmployeeSales.employee_id,
+                        func.sum(DailyEmployeeSales.completed).label("completed"),
+                        func.sum(DailyEmployeeSales.cancelled).label("cancelled"),
+                        func.sum(DailyEmployeeSales.refunded).label("refunded"),
+                        func.sum(DailyEmployeeSales.revenue).label("revenue"))
+                 .where(DailyEmployeeSales.day.between(start, end))
+                 .group_by(DailyEmployeeSales.employee_id)
+                 .order_by(func.sum(DailyEmployeeSales.revenue).desc()))
+
+        if employee_id is not None:
+            query = query.where(DailyEmployeeSales.employee_id == employee_id)
+
+        return query
+
+    @staticmethod
+    def search_top_products(start: date, end: date) -> Select:
+        """Query with the products with most revenue between `start` and `end`."""
+        return (select(DailyProductSales.product_id,
+                       Product.name,
+                       func.sum(DailyProductSales.quantity).label("quantity"),
+                       func.sum(DailyProductSales.revenue).label("revenue"))
+                .join(Product, Product.id == DailyProductSales.product_id)
+                .where(DailyProductSales.day.between(start, end))
+                .group_by(DailyProductSales.product_id, Product.name)
+                .order_by(func.sum(DailyProductSales.revenue).desc(), DailyProductSales.product_id))
+
+    @staticmethod
+    def search_product_sales(start: date, end: date, product_id: int) -> Select:
+        """Query with the daily units and revenue of a product between `start` and `end`."""
+        return (select(DailyProductSales)
+                .where(DailyProductSales.product_id == product_id, DailyProductSales.day.between(start, end))
+                .order_by(DailyProductSales.day))
+
+    @staticmethod
+    def search_payment_methods(start: date, end: date) -> Select:
+        """Query with the completed payments per day and method between `start` and `end`."""
+        return (select(DailyPaymentMethod)
+                .where(DailyPaymentMethod.day.between(start, end))
+                .order_by(DailyPaymentMethod.day, DailyPaymentMethod.method))
@@ -0,0 +1,256 @@
+import asyncio
+import gzip
+import random
+from datetime import datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+import logfire
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, update, delete, func, or_
+from sqlalchemy.sql.expression import Select
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.orm import Session
+from sqlalchemy import event
+
+from models import Product, Category, ProductCategory, StockMovement, StockSnapshot, CatalogTombstone, CatalogVersion
+from dtos import CatalogProduct, CatalogCategory, CatalogSnapshot, CatalogChanges
+from db import background_session, insert_on_conflict
+from services.inventory import InventoryService
+from core import SETTINGS, CATALOG_CACHE, CatalogCache, log_operation
+
+class SnapshotEntry(NamedTuple):
+    etag: str
+    body: bytes
+
+class CatalogService:
+    """Catalog for terminals with a local copy: a gzip snapshot behind an ETag and deltas since a watermark."""
+
+    # Un solo snapshot por worker: todos los terminales piden el mismo al abrir
+    _snapshot: Optional[SnapshotEntry] = None
+    _snapshot_lock = asyncio.Lock()
+
+    # Cada escritura suma en un slot al azar: las ventas concurrentes no esperan todas por la misma fila
+    VERSION_SLOTS = 16
+
+    # Lo que cambia el snapshot o los deltas: filas del catalogo, stock y bajas
+    TABLES = frozenset(model.__tablename__ for model in (Product, Category, ProductCategory, StockMovement, StockSnapshot, CatalogTombstone))
+
+    @staticmethod
+    @log_operation(True)
+    async def touch_products(db_session: AsyncSession, product_ids: Iterable[int] | Select) -> None:
+        """Bump updated_at of products whose categories changed so the next delta carries them. The caller commits."""
+
+        if not isinstance(product_ids, Select):
+            product_ids = list(product_ids)
+
+            if not product_ids:
+                return
+
+        await db_session.exec(update(Product)
+                              .where(Product.id.in_(product_ids))
+                              .values(updated_at=datetime.now())
+                              .execution_options(synchronize_session=False))
+
+        await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, None if isinstance(product_ids, Select) else product_ids)
+
+    @staticmethod
+    @log_operation(True)
+    async def record_deletions(db_session: AsyncSession, kind: str, ids: Iterable[int]) -> None:
+        """Leave a tombstone for each deleted row. The caller commits."""
+
+        now = datetime.now()
+        ids = list(ids)
+
+        if ids:
+            await db_session.exec(insert(CatalogTombstone).values([
+                {"kind": kind, "entity_id": _id, "deleted_at": now} for _id in ids
+            ]))
+
+    @staticmethod
+    def bump_version(session: Session) -> None:
+        """Add one to the catalog version, in the transaction of the session. The caller commits."""
+
+        slot = random.randrange(CatalogService.VERSION_SLOTS)
+
+        # El slot se crea con la primera escritura que le toca
+        query = (insert_on_conflict(session, CatalogVersion)
+                 .values(slot=slot, version=1)
+                 .on_conflict_do_update(index_elements=[CatalogVersion.slot],
+                                        set_={"version": CatalogVersion.version + 1}))
+
+        session.execute(query)
+
+    @staticmethod
+    @log_operation(True)
+    async def version(db_session: AsyncSession) -> str:
+        """Strong ETag of the catalog: a counter bumped by every commit that writes the catalog, its stock or its deletions."""
+
+        # Se suma en la misma transaccion que la escritura: una version nunca se ve antes que sus datos
+        response = await db_session.exec(select(func.coalesce(func.sum(CatalogVersion.version), 0)))
+
+        return f'"catalog-{response.one()}"'
+
+    @staticmethod
+    def watermark() -> datetime:
+        """Sync position handed to terminals, behind the clock by the writes that may still be uncommitted."""
+        return datetime.now() - timedelta(seconds=SETTINGS.catalog_sync_grace)
+
+    @staticmethod
+    async def _products(db_session: AsyncSession, criteria: Optional[ColumnElement[bool]] = None) -> list[CatalogProduct]:
+        """Products matching `criteria`, or all, with the stock from the ledger and their category ids."""
+
+        product_ids = select(Product.id).where(criteria) if criteria is not None else None
+
+        current = InventoryService.current_stock_query(product_ids).subquery()
+
+        # Columnas y no entidades: decenas de miles de filas sin pasar por el identity map
+        query = (select(*[column for column in Product.__table__.columns if column.name != "stock"], current.c.stock)
+                 .join(current, current.c.product_id == Product.id)
+                 .order_by(Product.id))
+
+        memberships = select(ProductCategory.product_id, ProductCategory.category_id)
+
+        if product_ids is not None:
+            memberships = memberships.where(ProductCategory.product_id.in_(product_ids))
+
+        response = await db_session.exec(memberships)
+
+        categories: dict[int, list[int]] = {}
+
+        for product_id, category_id in response.all():
+            categories.setdefault(product_id, []).append(category_id)
+
+        response = await db_session.exec(query)
+
+        return [CatalogProduct.model_validate({**row._mapping, "category_ids": categories.get(row.id, [])})
+                for row in response.all()]
+
+    @staticmethod
+    async def _categories(db_session: AsyncSession, criteria: Optional[ColumnElement[bool]] = None) -> list[CatalogCategory]:
+
+        query = select(Category).order_by(Category.id)
+
+        if criteria is not None:
+            query = query.where(criteria)
+
+        response = await db_session.exec(query)
+
+        return [CatalogCategory.model_validate(category) for category in response.all()]
+
+    @staticmethod
+    @log_operation(True)
+    async def snapshot(db_session: AsyncSession, etag: str) -> SnapshotEntry:
+        """Gzip JSON of the whole catalog for `etag`, built once per version and worker."""
+
+        cached = CatalogService._snapshot
+
+        if cached is not None and cached.etag == etag:
+            return cached
+
+        async with CatalogService._snapshot_lock:
+
+            # Otro request pudo construirlo mientras se esperaba el lock
+            cached = CatalogService._snapshot
+
+            if cached is not None and cached.etag == etag:
+                return cached
+
+            # La marca se toma antes de leer: lo que cambie durante la lectura vuelve en el primer delta
+            watermark = CatalogService.watermark()
+
+            snapshot = CatalogSnapshot(watermark=watermark,
+                                       products=await CatalogService._products(db_session),
+                                       categories=await CatalogService._categories(db_session))
+
+            body = await run_in_threadpool(lambda: gzip.compress(snapshot.model_dump_json().encode(), compresslevel=6))
+
+            CatalogService._snapshot = SnapshotEntry(etag, body)
+
+            return CatalogService._snapshot
+
+    @staticmethod
+    @log_operation(True)
+    async def changes(db_session: AsyncSession, since: datetime) -> CatalogChanges:
+        """Products and categories changed after `since`, plus the ids deleted after it."""
+
+        # Las marcas se guardan en hora local sin zona: un since con zona (p. ej. ...Z) se lleva a esa hora
+        if since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+
+        if since < datetime.now() - timedelta(days=SETTINGS.catalog_tombstone_ttl):
+            raise HTTPException(detail="since is older than the retained deletions, download the catalog snapshot", status_code=410)
+
+        watermark = CatalogService.watermark()
+
+        # Un movimiento de stock no toca la fila del producto pero cambia lo que muestra el terminal
+        moved = select(StockMovement.product_id).where(StockMovement.created_at > since)
+
+        products = await CatalogService._products(db_session, or_(Product.updated_at > since, Product.id.in_(moved)))
+        categories = await CatalogService._categories(db_session, Category.updated_at > since)
+
+        response = await db_session.exec(select(CatalogTombstone.kind, CatalogTombstone.entity_id)
+                                         .where(CatalogTombstone.deleted_at > since)
+                                         .order_by(CatalogTombstone.id))
+
+        deleted: dict[str, list[int]] = {CatalogCache.PRODUCT: [], CatalogCache.CATEGORY: []}
+
+        for kind, entity_id in response.all():
+            deleted.setdefault(kind, []).append(entity_id)
+
+        return CatalogChanges(watermark=watermark,
+                              products=products,
+                              categories=categories,
+                              deleted_products=deleted[CatalogCache.PRODUCT],
+                              deleted_categories=deleted[CatalogCache.CATEGORY])
+
+    @staticmethod
+    @log_operation(True)
+    async def purge_tombstones(db_session: AsyncSession) -> None:
+        """Delete tombstones older than catalog_tombstone_ttl. The caller commits."""
+        await db_session.exec(delete(CatalogTombstone)
+                              .where(CatalogTombstone.deleted_at < datetime.now() - timedelta(days=SETTINGS.catalog_tombstone_ttl)))
+
+    @staticmethod
+    async def purge_loop(interval: float) -> None:
+        """Purge old tombstones every `interval` seconds until cancelled."""
+
+        while True:
+
+            await asyncio.sleep(interval)
+
+            try:
+
+                async with background_session() as db_session:
+                    await CatalogService.purge_tombstones(db_session)
+                    await db_session.commit()
+
+            except Exception:
+                logfire.exception("Catalog tombstone purge failed")
+
+# La version se sube al confirmar, una vez por transaccion, si algo escribio en las tablas del catalogo
+def _pending_catalog_changes(session: Session) -> bool:
+    return any(getattr(instance, "__tablename__", None) in CatalogService.TABLES
+               for instance in (*session.new, *session.dirty, *session.deleted))
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_flush(session: Session, flush_context) -> None:
+    if _pending_catalog_changes(session):
+        session.info["catalog_changed"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_catalog_dml(orm_execute_state) -> None:
+    if ((orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete)
+            and orm_execute_state.statement.table.name in CatalogService.TABLES):
+        orm_execute_state.session.info["catalog_changed"] = True
+
+# before_commit corre antes del ultimo flush: lo que aun esta pendiente tambien cuenta
+@event.listens_for(Session, "before_commit")
+def _bump_catalog_version(session: Session) -> None:
+    if session.info.pop("catalog_changed", False) or _pending_catalog_changes(session):
+        CatalogService.bump_version(session)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncScalarResult
+from sqlalchemy.sql.expression import Select
+
+from core import SETTINGS, log_operation
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ExportService:
+    """Search results streamed from a server-side cursor instead of paged with COUNT and OFFSET."""
+
+    MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        # Las listas y objetos anidados van como JSON dentro de la celda
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+
+        return value
+
+    @staticmethod
+    async def _partitions(result: AsyncResult | AsyncScalarResult,
+                          transformer: Optional[Callable[[Sequence], Sequence]]) -> AsyncIterator[Sequence]:
+
+        async for partition in result.partitions():
+            yield transformer(partition) if transformer else partition
+
+    @staticmethod
+    async def _ndjson(result: AsyncResult | AsyncScalarResult,
+                      schema: type[BaseModel],
+                      transformer: Optional[Callable[[Sequence], Sequence]]) -> AsyncIterator[str]:
+
+        async for partition in ExportService._partitions(result, transformer):
+            yield "".join(schema.model_validate(row, from_attributes=True).model_dump_json() + "\n" for row in partition)
+
+    @staticmethod
+    async def _csv(result: AsyncResult | AsyncScalarResult,
+                   schema: type[BaseModel],
+                   transformer: Optional[Callable[[Sequence], Sequence]]) -> AsyncIterator[str]:
+
+        columns = list(schema.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(columns)
+
+        async for partition in ExportService._partitions(result, transformer):
+
+            for row in partition:
+                values = schema.model_validate(row, from_attributes=True).model_dump(mode="json")
+                writer.writerow([ExportService._cell(values[column]) for column in columns])
+
+            yield buffer.getvalue()
+
+            buffer.seek(0)
+            buffer.truncate()
+
+        # Un resultado vacio tambien entrega la cabecera
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @staticmethod
+    async def _rows(result: AsyncResult | AsyncScalarResult,
+                    schema: type[BaseModel],
+                    export: ExportFormat,
+                    transformer: Optional[Callable[[Sequence], Sequence]]) -> AsyncIterator[str]:
+
+        try:
+
+            rows = (ExportService._csv(result, schema, transformer) if export == ExportFormat.CSV
+                    else ExportService._ndjson(result, schema, transformer))
+
+            async for chunk in rows:
+                yield chunk
+
+        finally:
+            await result.close()
+
+    @staticmethod
+    @log_operation(True)
+    async def stream(db_session: AsyncSession,
+                     query: Select,
+                     schema: type[BaseModel],
+                     export: ExportFormat,
+                     filename: str,
+                     transformer: Optional[Callable[[Sequence], Sequence]] = None) -> StreamingResponse:
+        """Every row of `query` serialized with `schema`, sent as it is fetched in batches of export_batch_size.
+
+        With a `transformer`, each batch of whole rows goes through it first, as the items of a page do.
+        """
+
+        query = query.execution_options(yield_per=SETTINGS.export_batch_size)
+
+        # El cursor se abre antes de responder para que un error de la consulta sea un 500 y no un cuerpo cortado
+        result = await (db_session.stream(query) if transformer else db_session.stream_scalars(query))
+
+        headers = {"Content-Disposition": f'attachment; filename="{filename}.{export.value}"'}
+
+        return StreamingResponse(ExportService._rows(result, schema, export, transformer),
+                                 media_type=ExportService.MEDIA_TYPES[export],
+                                 headers=headers)
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+import logfire
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from models import IdempotencyRecord
+from db import background_session
+from core import SETTINGS, log_operation
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: Any
+    expires_at: datetime
+
+class IdempotencyCache:
+    """Bounded LRU of finished responses so retries on the same worker skip the database."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: OrderedDict[tuple[str, str], StoredResponse] = OrderedDict()
+
+    def get(self, scope: str, key: str) -> Optional[StoredResponse]:
+        """Stored response for `key`, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get((scope, key))
+
+            if entry is None:
+                return None
+
+            if entry.expires_at <= datetime.now():
+                del self._entries[(scope, key)]
+                return None
+
+            self._entries.move_to_end((scope, key))
+
+            return entry
+
+    def put(self, scope: str, key: str, entry: StoredResponse) -> None:
+        """Remember `entry`, evicting the least recently used ones over the limit."""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[(scope, key)] = entry
+            self._entries.move_to_end((scope, key))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class IdempotencyService:
+    """Replays the stored response of a request retried with the same `Idempotency-Key`."""
+
+    HEADER = "Idempotency-Key"
+    MAX_KEY_LENGTH = 255
+
+    # Intentos de guardar la respuesta en una sesion nueva si falla en la de la peticion
+    STORE_ATTEMPTS = 3
+
+    CACHE = IdempotencyCache(SETTINGS.idempotency_cache_size)
+
+    @staticmethod
+    def fingerprint(request: Request, payload: BaseModel) -> str:
+        """Hash of the method, path and validated body of a request."""
+        content = f"{request.method} {request.url.path}\n{payload.model_dump_json()}"
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    @staticmethod
+    def replay(entry: StoredResponse, fingerprint: str) -> JSONResponse:
+        """Response for a retry, refusing keys reused with a different request."""
+
+        if entry.fingerprint != fingerprint:
+            raise HTTPException(detail=f"{IdempotencyService.HEADER} was already used with a different request", status_code=422)
+
+        return JSONResponse(content=entry.body, status_code=entry.status_code, headers={"Idempotent-Replayed": "true"})
+
+    @staticmethod
+    @log_operation(True)
+    async def reserve(db_session: AsyncSession, scope: str, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """Claim `key` inside the caller's transaction; returns the existing record when it is taken."""
+
+        now = datetime.now()
+        values = {"scope": scope, "key": key, "fingerprint": fingerprint,
+                  "created_at": now, "expires_at": now + timedelta(seconds=SETTINGS.idempotency_ttl)}
+
+        for _ in range(2):
+
+            try:
+
+                # El savepoint deja la transaccion usable si otra peticion ya reservo la clave.
+                # En Postgres el INSERT espera a que esa otra transaccion termine
+                async with db_session.begin_nested():
+                    await db_session.exec(insert(IdempotencyRecord).values(**values))
+
+                return None
+
+            except IntegrityError:
+                pass
+
+            response = await db_session.exec(select(IdempotencyRecord)
+                                             .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key))
+            record = response.first()
+
+            if record is None or record.expires_at > now:
+                return record
+
+            # La clave vencio: se libera y se vuelve a intentar
+            await db_session.exec(delete(IdempotencyRecord)
+                                  .where(IdempotencyRecord.scope == scope,
+                                         IdempotencyRecord.key == key,
+                                         IdempotencyRecord.expires_at <= now))
+
+        raise HTTPException(detail=f"{IdempotencyService.HEADER} is in use by a concurrent request", status_code=409)
+
+    @staticmethod
+    async def _store(db_session: AsyncSession, scope: str, key: str, body: Any) -> datetime:
+        """Save the response of a finished operation on its record and commit, returning when it expires."""
+
+        response = await db_session.exec(update(IdempotencyRecord)
+                                         .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+                                         .values(status_code=200, response=json.dumps(body))
+                                         .returning(IdempotencyRecord.expires_at))
+        expires_at = response.scalars().one()
+
+        await db_session.commit()
+
+        return expires_at
+
+    @staticmethod
+    async def _store_retrying(scope: str, key: str, body: Any) -> Optional[datetime]:
+        """Retry `_store` in fresh sessions with backoff; None when every attempt fails."""
+
+        for attempt in range(IdempotencyService.STORE_ATTEMPTS):
+
+            if attempt:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+            try:
+
+                async with background_session() as db_session:
+                    return await IdempotencyService._store(db_session, scope, key, body)
+
+            except Exception:
+                logfire.exception("Failed to store idempotent response", attempt=attempt + 1)
+
+        return None
+
+    @staticmethod
+    @log_operation(True)
+    async def run(db_session: AsyncSession,
+                  request: Request,
+                  key: Optional[str],
+                  payload: BaseModel,
+                  response_model: type[BaseModel],
+                  operation: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `operation` once per idempotency key and replay its response on retries."""
+
+        if key is None:
+            return await operation()
+
+        key = key.strip()
+
+        if not key or len(key) > IdempotencyService.MAX_KEY_LENGTH:
+            raise HTTPException(detail=f"{IdempotencyService.HEADER} must have between 1 and {IdempotencyService.MAX_KEY_LENGTH} characters", status_code=400)
+
+        scope = f"{request.method} {request.url.path}"
+        fingerprint = IdempotencyService.fingerprint(request, payload)
+
+        entry = IdempotencyService.CACHE.get(scope, key)
+
+        if entry is not None:
+            return IdempotencyService.replay(entry, fingerprint)
+
+        try:
+            record = await IdempotencyService.reserve(db_session, scope, key, fingerprint)
+
+        except HTTPException:
+            await db_session.rollback()
+            raise
+
+        except Exception as e:
+            await db_session.rollback()
+            raise HTTPException(detail="Failed to check the idempotency key", status_code=500) from e
+
+        if record is not None:
+            stored_fingerprint, status_code, stored, expires_at = record.fingerprint, record.status_code, record.response, record.expires_at
+
+            # El rollback expira el registro, por eso se copian antes sus valores
+            await db_session.rollback()
+
+            if stored is None:
+                if stored_fingerprint != fingerprint:
+                    raise HTTPException(detail=f"{IdempotencyService.HEADER} was already used with a different request", status_code=422)
+
+                raise HTTPException(detail=f"A request with this {IdempotencyService.HEADER} is still in progress", status_code=409)
+
+            entry = StoredResponse(stored_fingerprint, status_code, json.loads(stored), expires_at)
+            IdempotencyService.CACHE.put(scope, key, entry)
+
+            return IdempotencyService.replay(entry, fingerprint)
+
+        # La reserva se confirma en el mismo commit que la operacion: si esta falla, la clave queda libre
+        try:
+            result = await operation()
+
+        except Exception:
+            await db_session.rollback()
+            raise
+
+        body = response_model.model_validate(result, from_attributes=True).model_dump(mode="json")
+
+        # La operacion ya se confirmo junto con la reserva: repetirla duplicaria sus efectos, asi que
+        # la respuesta se guarda sin falta. Si la sesion de la peticion falla se reintenta en una nueva;
+        # mientras tanto los reintentos del cliente reciben 409 y no vuelven a ejecutar la operacion
+        try:
+            expires_at = await IdempotencyService._store(db_session, scope, key, body)
+
+        except Exception:
+            await db_session.rollback()
+            expires_at = await IdempotencyService._store_retrying(scope, key, body)
+
+        if expires_at is not None:
+            IdempotencyService.CACHE.put(scope, key, StoredResponse(fingerprint, 200, body, expires_at))
+
+        return body
+
+    @staticmethod
+    @log_operation(True)
+    async def purge_expired(db_session: AsyncSession) -> None:
+        """Delete expired keys. The caller commits."""
+        await db_session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.now()))
+
+    @staticmethod
+    async def purge_loop(interval: float) -> None:
+        """Purge expired keys every `interval` seconds until cancelled."""
+
+        while True:
+
+            await asyncio.sleep(interval)
+
+            try:
+
+                async with background_session() as db_session:
+                    await IdempotencyService.purge_expired(db_session)
+                    await db_session.commit()
+
+            except Exception:
+                logfire.exception("Idempotency purge failed")
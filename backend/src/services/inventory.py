@@ -0,0 +1,187 @@
+import asyncio
+from collections import defaultdict
+from typing import Iterable, Optional
+from datetime import datetime
+
+import logfire
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, update, delete, func, and_
+from sqlalchemy import literal
+from sqlalchemy.sql.expression import Select, Subquery
+from sqlalchemy.sql.elements import ColumnElement
+
+from models import Product, ServiceInput, OrderProduct, StockMovement, StockSnapshot, MovementKind
+from models import OrderService as OrderServiceModel
+from db import background_session
+from core import CATALOG_CACHE, CatalogCache, log_operation
+
+class InventoryService:
+    """Stock as an append-only ledger of movements folded into periodic snapshots."""
+
+    # Clave del advisory lock para que un solo worker tome snapshots a la vez
+    SNAPSHOT_LOCK_KEY = 0x5707
+
+    @staticmethod
+    def _base(product_ids: Optional[Iterable[int] | Select] = None) -> Subquery:
+        """Starting point of each product: its last snapshot, or Product.stock when it has none."""
+
+        query = (select(Product.id.label("product_id"),
+                        func.coalesce(StockSnapshot.stock, Product.stock).label("stock"))
+                 .outerjoin(StockSnapshot, StockSnapshot.product_id == Product.id))
+
+        if product_ids is not None:
+            query = query.where(Product.id.in_(product_ids if isinstance(product_ids, Select) else list(product_ids)))
+
+        return query.subquery()
+
+    @staticmethod
+    def current_stock_query(product_ids: Optional[Iterable[int] | Select] = None) -> Select:
+        """Query with the current stock per product: last snapshot plus the movements not folded into it."""
+
+        base = InventoryService._base(product_ids)
+
+        return (select(base.c.product_id,
+                       (base.c.stock + func.coalesce(func.sum(StockMovement.quantity), 0)).label("stock"))
+                .outerjoin(StockMovement, and_(StockMovement.product_id == base.c.product_id,
+                                               ~StockMovement.folded))
+                .group_by(base.c.product_id, base.c.stock))
+
+    @staticmethod
+    def current_stock_column() -> ColumnElement[int]:
+        """Current stock of each Product row of the enclosing query, correlated to its snapshot and movements."""
+
+        # Correlacionada y no unida: una pagina suma los movimientos de sus filas y no los de todo el catalogo
+        snapshot = select(StockSnapshot.stock).where(StockSnapshot.product_id == Product.id).scalar_subquery()
+        movements = (select(func.coalesce(func.sum(StockMovement.quantity), 0))
+                     .where(StockMovement.product_id == Product.id, ~StockMovement.folded)
+                     .scalar_subquery())
+
+        return func.coalesce(snapshot, Product.stock) + movements
+
+    @staticmethod
+    def search_movements(product_id: int) -> Select:
+        """Query for the ledger movements of a product, newest first."""
+        return (select(StockMovement)
+                .where(StockMovement.product_id == product_id)
+                .order_by(StockMovement.id.desc()))
+
+    @staticmethod
+    @log_operation(True)
+    async def current_stock(db_session: AsyncSession, product_ids: Iterable[int]) -> dict[int, int]:
+        """Current stock of `product_ids` in one query."""
+
+        product_ids = list(product_ids)
+
+        if not product_ids:
+            return {}
+
+        response = await db_session.exec(InventoryService.current_stock_query(product_ids))
+
+        return dict(response.all())
+
+    @staticmethod
+    @log_operation(True)
+    async def record(db_session: AsyncSession,
+                     product_id: int,
+                     quantity: int,
+                     kind: MovementKind,
+                     order_id: Optional[int] = None) -> None:
+        """Append one movement to the ledger. The caller commits."""
+
+        await db_session.exec(insert(StockMovement).values(product_id=product_id,
+                                                           quantity=quantity,
+                                                           kind=kind,
+                                                           order_id=order_id,
+                                                           created_at=datetime.now()))
+
+    @staticmethod
+    @log_operation(True)
+    async def record_orders(db_session: AsyncSession, order_ids: list[int]) -> None:
+        """Append the sales and service consumptions of `order_ids` to the ledger. The caller commits."""
+
+        now = datetime.now()
+
+        await db_session.exec(insert(StockMovement).from_select(
+            ["product_id", "quantity", "kind", "order_id", "created_at"],
+            select(OrderProduct.product_id, -OrderProduct.quantity, literal(MovementKind.SALE, StockMovement.kind.type), OrderProduct.order_id, literal(now))
+            .where(OrderProduct.order_id.in_(order_ids))
+        ))
+
+        # Cada servicio vendido consume una unidad de cada uno de sus insumos
+        await db_session.exec(insert(StockMovement).from_select(
+            ["product_id", "quantity", "kind", "order_id", "created_at"],
+            select(ServiceInput.product_id, -OrderServiceModel.quantity, literal(MovementKind.SERVICE_CONSUMPTION, StockMovement.kind.type),
+                   OrderServiceModel.order_id, literal(now))
+            .join(ServiceInput, ServiceInput.service_id == OrderServiceModel.service_id)
+            .where(OrderServiceModel.order_id.in_(order_ids))
+        ))
+
+    @staticmethod
+    @log_operation(True)
+    async def take_snapshot(db_session: AsyncSession) -> int:
+        """Fold committed movements into the snapshots of the products that moved. The caller commits."""
+
+        if db_session.get_bind().dialect.name == "postgresql":
+            response = await db_session.exec(select(func.pg_try_advisory_xact_lock(InventoryService.SNAPSHOT_LOCK_KEY)))
+
+            if not response.one():
+                return 0
+
+        # Se marcan los movimientos visibles y se suman en la misma transaccion. Uno que confirme
+        # despues queda sin marcar y entra al proximo snapshot, sin importar su id ni su created_at
+        response = await db_session.exec(update(StockMovement)
+                                         .where(~StockMovement.folded)
+                                         .values(folded=True)
+                                         .returning(StockMovement.product_id, StockMovement.quantity)
+                                         .execution_options(synchronize_session=False))
+
+        deltas: dict[int, int] = defaultdict(int)
+
+        for product_id, quantity in response.all():
+            deltas[product_id] += quantity
+
+        if not deltas:
+            return 0
+
+        # Solo los productos con movimientos nuevos: los que mas se venden
+        base = InventoryService._base(deltas)
+
+        response = await db_session.exec(select(base.c.product_id, base.c.stock))
+        snapshots = [(product_id, stock + deltas[product_id]) for product_id, stock in response.all()]
+
+        product_ids = [product_id for product_id, _ in snapshots]
+        taken_at = datetime.now()
+
+        await db_session.exec(delete(StockSnapshot).where(StockSnapshot.product_id.in_(product_ids)))
+
+        await db_session.exec(insert(StockSnapshot).values([
+            {"product_id": product_id, "stock": stock, "taken_at": taken_at}
+            for product_id, stock in snapshots
+        ]))
+
+        # Product.stock queda como copia del snapshot para listados y filtros
+        await db_session.exec(update(Product)
+                              .where(Product.id == StockSnapshot.product_id, StockSnapshot.product_id.in_(product_ids))
+                              .values(stock=StockSnapshot.stock, updated_at=taken_at)
+                              .execution_options(synchronize_session=False))
+
+        await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, product_ids)
+
+        return len(snapshots)
+
+    @staticmethod
+    async def snapshot_loop(interval: float) -> None:
+        """Take a snapshot every `interval` seconds until cancelled."""
+
+        while True:
+
+            await asyncio.sleep(interval)
+
+            try:
+
+                async with background_session() as db_session:
+                    await InventoryService.take_snapshot(db_session)
+                    await db_session.commit()
+
+            except Exception:
+                logfire.exception("Stock snapshot failed")
@@ -1,16 +1,19 @@
+import asyncio
+
 from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
 from weasyprint import HTML
 
 from models import Invoice, InvoiceItem, Email, File
 from crud import OrderCrud, ProductCrud, ServiceCrud, UserCrud
-from core import SETTINGS
+from core import SETTINGS, log_operation
 from services import EmailService
 #from db import get_db_client
 from utils import OrderUtils
 
 class InvoiceService:
    
-   """
+    """
     
     @classmethod
     async def workflow(cls, order_id: int, tax_rate: float):
@@ -180,4 +183,47 @@ class InvoiceService:
         if not bool(response.data):
             raise HTTPException(status_code=500, detail="Failed to update product with invoice URL")
 
-"""
\ No newline at end of file
+"""
+
+    @staticmethod
+    @log_operation(True)
+    async def send_order_invoice(db_session: AsyncSession, order_id: int, tax_rate: float = 0.0) -> None:
+        """Render the invoice email of an order from its detail read model and send it."""
+
+        details = await OrderCrud.read_order_details(db_session, [order_id])
+
+        if not details:
+            raise HTTPException(detail="Order not found", status_code=404)
+
+        detail = details[0]
+        client = await UserCrud.read_client(db_session, detail.client_id)
+
+        invoice = Invoice(number=detail.id,
+                          date=detail.created_at,
+                          client=client,
+                          items=[InvoiceItem(name=line.name, quantity=line.quantity, unit_price=line.unit_price) for line in detail.lines],
+                          tax_rate=tax_rate)
+
+        body = SETTINGS.jinja_env.get_template("invoice_email.html").render(
+            invoice={
+                "number": invoice.number,
+                "date": invoice.date.strftime("%d/%m/%Y"),
+                "client": {"name": detail.client_name, "email": client.email},
+                "subtotal": invoice.subtotal,
+                "tax_rate": invoice.tax_rate,
+                "tax_amount": invoice.tax_amount,
+                "total": invoice.total
+            },
+            company={
+                "name": SETTINGS.company_name,
+                "email": SETTINGS.company_email,
+                "logo_url": SETTINGS.logo_url,
+            },
+            current_year=invoice.date.year,
+            items=[item.model_dump() for item in invoice.items]
+        )
+
+        email = Email(subject=f"Factura #{invoice.number}", body=body, to=client.email, type="html")
+
+        # smtplib bloquea, se envia fuera del event loop
+        await asyncio.to_thread(EmailService.send_email, email)
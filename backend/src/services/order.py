@@ -1,17 +1,35 @@
+from collections import defaultdict
+from typing import Optional
+from datetime import datetime
+
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select, func
-from sqlalchemy.sql.expression import Select
+from sqlmodel import select, insert, update, delete, func, union_all, literal, case
+from sqlalchemy.sql.expression import Select, ColumnElement
+from sqlalchemy.orm.attributes import set_committed_value
 
-from models import Order, OrderProduct, OrderService, OrderStatus
-from utils import OrderUtils
+from models import Order, OrderProduct, OrderStatus, Product, Service, StockReservation, Client, Employee, OutboxKind
+from models import OrderService as OrderServiceModel
+from utils import ExistsUtils
+from services.inventory import InventoryService
+from services.outbox import OutboxService
 from dtos import OrderFilter, OrderProductFilter, OrderServiceFilter
-from core import log_operation
+from core import SETTINGS, CATALOG_CACHE, CatalogCache, log_operation
 class OrderService:
     
     QUERY_ORDER_BASE = select(Order)
-    QUERY_ORDER_SERVICE_BASE = select(OrderService)
+    QUERY_ORDER_SERVICE_BASE = select(OrderServiceModel)
     QUERY_ORDER_PRODUCT_BASE = select(OrderProduct)
+
+    # Precio de una linea: el congelado al completar la orden, o el actual mientras esta pendiente
+    PRODUCT_UNIT_PRICE = func.coalesce(OrderProduct.unit_price, Product.price)
+
+    # Estado destino -> unico estado desde el que se puede llegar
+    TRANSITIONS = {
+        OrderStatus.COMPLETED: OrderStatus.PENDING,
+        OrderStatus.CANCELLED: OrderStatus.PENDING,
+        OrderStatus.REFUNDED: OrderStatus.COMPLETED,
+    }
         
     @classmethod
     def search_orders(cls, filters: OrderFilter) -> Select:
@@ -27,38 +45,289 @@ class OrderService:
     def search_order_products(cls, filters: OrderProductFilter) -> Select:
         """Query that searches for orders product who meet the filters."""
         return filters.apply(cls.QUERY_ORDER_PRODUCT_BASE)
+
+    @staticmethod
+    def search_order_details(order_ids: list[int]) -> Select:
+        """Query with one row per line of `order_ids`, carrying the order header and the client and employee names."""
+        
+        lines = union_all(
+            select(OrderProduct.order_id, literal("product").label("kind"), Product.id.label("item_id"),
+                   Product.name, OrderService.PRODUCT_UNIT_PRICE.label("unit_price"), OrderProduct.quantity)
+            .join(Product, Product.id == OrderProduct.product_id)
+            .where(OrderProduct.order_id.in_(order_ids)),
+            select(OrderServiceModel.order_id, literal("service").label("kind"), Service.id.label("item_id"),
+                   Service.name, Service.price.label("unit_price"), OrderServiceModel.quantity)
+            .join(Service, Service.id == OrderServiceModel.service_id)
+            .where(OrderServiceModel.order_id.in_(order_ids))
+        ).subquery()
+        
+        # Las ordenes sin lineas salen igual, con las columnas de linea en NULL
+        return (select(Order.id, Order.status, Order.total_price, Order.created_at, Order.updated_at,
+                       Order.client_id, Client.first_name.label("client_first_name"), Client.last_name.label("client_last_name"),
+                       Order.employee_id, Employee.first_name.label("employee_first_name"), Employee.last_name.label("employee_last_name"),
+                       lines.c.kind, lines.c.item_id, lines.c.name, lines.c.unit_price, lines.c.quantity)
+                .join(Client, Client.id == Order.client_id)
+                .join(Employee, Employee.id == Order.employee_id)
+                .outerjoin(lines, lines.c.order_id == Order.id)
+                .where(Order.id.in_(order_ids))
+                .order_by(Order.id, lines.c.kind, lines.c.name))
+
+    @staticmethod
+    def total_price(order_id: int | ColumnElement[int]) -> ColumnElement[float]:
+        """SQL expression with the total of an order: sum of its product and service lines."""
+        
+        products = (select(func.coalesce(func.sum(OrderProduct.quantity * OrderService.PRODUCT_UNIT_PRICE), 0))
+                    .join(Product, Product.id == OrderProduct.product_id)
+                    .where(OrderProduct.order_id == order_id)
+                    .scalar_subquery())
+        
+        services = (select(func.coalesce(func.sum(OrderServiceModel.quantity * Service.price), 0))
+                    .join(Service, Service.id == OrderServiceModel.service_id)
+                    .where(OrderServiceModel.order_id == order_id)
+                    .scalar_subquery())
+        
+        return products + services
+
+    @staticmethod
+    def product_amount(product_id: int, quantity: int) -> ColumnElement[float]:
+        """SQL expression with the price of `quantity` units of a product."""
+        return quantity * select(Product.price).where(Product.id == product_id).scalar_subquery()
+
+    @staticmethod
+    def service_amount(service_id: int, quantity: int) -> ColumnElement[float]:
+        """SQL expression with the price of `quantity` units of a service."""
+        return quantity * select(Service.price).where(Service.id == service_id).scalar_subquery()
+
+    @staticmethod
+    @log_operation(True)
+    async def add_to_total(db_session: AsyncSession, order_id: int, amount: ColumnElement[float]) -> None:
+        """Atomically add `amount` to the total of an order. The caller commits."""
+        
+        # El incremento se resuelve en la base: dos lineas concurrentes no se pisan el total
+        await db_session.exec(update(Order)
+                              .where(Order.id == order_id)
+                              .values(total_price=func.coalesce(Order.total_price, 0) + amount,
+                                      updated_at=datetime.now()))
+
+    @staticmethod
+    @log_operation(True)
+    async def recompute_totals(db_session: AsyncSession,
+                               order_ids: Optional[list[int]] = None,
+                               include_closed: bool = False) -> list[int]:
+        """Rebuild total_price from the lines in one statement, returning the orders that had drifted. The caller commits."""
+        
+        total = OrderService.total_price(Order.id)
+        
+        stmt = (update(Order)
+                .where(func.abs(func.coalesce(Order.total_price, 0) - total) >= 0.005)
+                .values(total_price=total, updated_at=datetime.now())
+                .returning(Order.id)
+                .execution_options(synchronize_session=False))
+        
+        if order_ids is not None:
+            stmt = stmt.where(Order.id.in_(order_ids))
+        
+        # Los totales de ordenes cerradas son historicos, no siguen cambios de precio
+        if not include_closed:
+            stmt = stmt.where(Order.status == OrderStatus.PENDING)
+        
+        response = await db_session.exec(stmt)
+        
+        return list(response.scalars().all())
     
     @staticmethod
     @log_operation(True)
-    async def update_inventory(db_session: AsyncSession, order_id: int) -> bool:
-        """Update inventory after an order is placed"""
+    async def freeze_prices(db_session: AsyncSession, order: Order) -> None:
+        """Store the current unit price on the product lines of `order` and rebuild its total from them. The caller commits."""
+        
+        # Rollups, reembolsos y reconstrucciones leen este precio: un cambio posterior no los desfasa
+        await db_session.exec(update(OrderProduct)
+                              .where(OrderProduct.order_id == order.id, Product.id == OrderProduct.product_id)
+                              .values(unit_price=Product.price)
+                              .execution_options(synchronize_session=False))
+        
+        response = await db_session.exec(update(Order)
+                                         .where(Order.id == order.id)
+                                         .values(total_price=OrderService.total_price(order.id))
+                                         .returning(Order.total_price)
+                                         .execution_options(synchronize_session=False))
+        
+        set_committed_value(order, "total_price", response.scalar_one())
+
+    @staticmethod
+    async def _lock_products(db_session: AsyncSession, product_ids: Select | list[int]) -> None:
+        """Lock the product rows selected by `product_ids` in id order."""
+        
+        # Todas las rutas bloquean en el mismo orden, asi dos transacciones nunca se esperan en ciclo
+        await db_session.exec(select(Product.id)
+                              .where(Product.id.in_(product_ids))
+                              .order_by(Product.id)
+                              .with_for_update())
 
-        if not await OrderUtils.exist_order(db_session, order_id):
+    @staticmethod
+    @log_operation(True)
+    async def reserve_stock(db_session: AsyncSession, order_id: int) -> dict[int, int]:
+        """Hold the product lines of a pending order against available stock. The caller commits."""
+        
+        # El bloqueo de la orden serializa reservas concurrentes de la misma orden
+        response = await db_session.exec(select(Order.status).where(Order.id == order_id).with_for_update())
+        status = response.first()
+        
+        if status is None:
             raise HTTPException(detail="Order not found", status_code=404)
+        
+        if status != OrderStatus.PENDING:
+            raise HTTPException(detail="Only pending orders can reserve stock", status_code=409)
+        
+        if await ExistsUtils.exists(db_session, StockReservation, order_id=order_id):
+            raise HTTPException(detail="Order stock already reserved", status_code=409)
+        
+        lines = select(OrderProduct.product_id).where(OrderProduct.order_id == order_id)
+        await OrderService._lock_products(db_session, lines)
+        
+        current = InventoryService.current_stock_query(lines).subquery()
+        
+        response = await db_session.exec(select(OrderProduct.product_id, OrderProduct.quantity, current.c.stock - Product.reserved_stock)
+                                         .join(Product, Product.id == OrderProduct.product_id)
+                                         .join(current, current.c.product_id == OrderProduct.product_id)
+                                         .where(OrderProduct.order_id == order_id))
+        rows = response.all()
+        
+        short = sorted(product_id for product_id, quantity, available in rows if available < quantity)
+        if short:
+            raise HTTPException(detail=f"Insufficient stock for products: {short}", status_code=409)
+        
+        if not rows:
+            return {}
+        
+        await db_session.exec(insert(StockReservation).from_select(
+            ["order_id", "product_id", "quantity"],
+            select(OrderProduct.order_id, OrderProduct.product_id, OrderProduct.quantity).where(OrderProduct.order_id == order_id)
+        ))
+        
+        await db_session.exec(update(Product)
+                              .where(Product.id == StockReservation.product_id, StockReservation.order_id == order_id)
+                              .values(reserved_stock=Product.reserved_stock + StockReservation.quantity, updated_at=datetime.now())
+                              .execution_options(synchronize_session=False))
+        
+        # La reserva cambia lo que muestra el producto: nueva version para ETags, cache y deltas
+        await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, [product_id for product_id, _, _ in rows])
+        
+        return {product_id: quantity for product_id, quantity, _ in rows}
 
-        try:
+    @staticmethod
+    @log_operation(True)
+    async def release_stock(db_session: AsyncSession, order_ids: list[int]) -> dict[int, int]:
+        """Give back the stock reserved by `order_ids`, returning the released quantity per product. The caller commits."""
+        
+        if not order_ids:
+            return {}
+        
+        await OrderService._lock_products(db_session, select(StockReservation.product_id)
+                                                      .where(StockReservation.order_id.in_(order_ids)))
+        
+        # Con los productos bloqueados, lo liberado es exactamente lo que borra este DELETE:
+        # una liberacion concurrente de las mismas ordenes ya no encuentra las filas
+        response = await db_session.exec(delete(StockReservation)
+                                         .where(StockReservation.order_id.in_(order_ids))
+                                         .returning(StockReservation.product_id, StockReservation.quantity))
+        
+        released: dict[int, int] = defaultdict(int)
+        
+        for product_id, quantity in response.all():
+            released[product_id] += quantity
+        
+        if not released:
+            return {}
+        
+        await db_session.exec(update(Product)
+                              .where(Product.id.in_(released))
+                              .values(reserved_stock=func.greatest(Product.reserved_stock - case(released, value=Product.id), 0),
+                                      updated_at=datetime.now())
+                              .execution_options(synchronize_session=False))
+        
+        await CATALOG_CACHE.invalidate(db_session, CatalogCache.PRODUCT, released)
+        
+        return dict(released)
 
-            result = await db_session.exec(cls.search_orders_products(OrderProductFilter(order_id)))
-            order_products = result.all()
+    @staticmethod
+    @log_operation(True)
+    async def transition(db_session: AsyncSession, order_id: int, status: OrderStatus) -> Order:
+        """Move an order to `status` with a conditional update and run its side effects once. The caller commits."""
 
-            if not order_products:
-                return True
+        status = OrderStatus(status)
+        expected = OrderService.TRANSITIONS.get(status)
 
-            totals = {
-                op.product_id: op.quantity for op in order_products
-            }
-        
-            for product_id, qty in totals.items():
-                stmt = (
-                    update(Product)
-                    .where(Product.id == product_id)
-                    .values(stock=func.greatest(Product.stock - qty, 0))
-                )
-                await db_session.exec(stmt)
+        if expected is None:
+            raise HTTPException(detail=f"Cannot change an order to {status.value}", status_code=400)
+
+        # El WHERE sobre el estado esperado hace de compare-and-set: de dos peticiones
+        # concurrentes solo una ve la fila y dispara los efectos
+        response = await db_session.exec(update(Order)
+                                         .where(Order.id == order_id, Order.status == expected)
+                                         .values(status=status, updated_at=datetime.now())
+                                         .returning(Order))
+        order = response.scalars().first()
+
+        if order is None:
+            response = await db_session.exec(select(Order.status).where(Order.id == order_id))
+            current = response.first()
 
-            await db_session.commit()
-            
-            return True
+            if current is None:
+                raise HTTPException(detail="Order not found", status_code=404)
+
+            raise HTTPException(detail=f"Cannot change order from {OrderStatus(current).value} to {status.value}", status_code=409)
+
+        await OrderService.on_transition(db_session, order, expected)
+
+        return order
+
+    @staticmethod
+    @log_operation(True)
+    async def on_transition(db_session: AsyncSession, order: Order, previous: OrderStatus) -> None:
+        """Queue the side effects of an order that just left `previous` in the outbox, inside the same transaction."""
+
+        # El descuento de inventario, los rollups y la factura los corre el worker del outbox;
+        # la reserva sigue retenida hasta que el worker registra la venta
+        if order.status == OrderStatus.COMPLETED:
+            await OrderService.freeze_prices(db_session, order)
+            await OutboxService.enqueue(db_session, OutboxKind.ORDER_COMPLETED, [order.id])
+
+            if SETTINGS.outbox_invoice_email:
+                await OutboxService.enqueue(db_session, OutboxKind.INVOICE_EMAIL, [order.id])
+
+        elif order.status == OrderStatus.CANCELLED:
+            # Liberar lo reservado es barato y debe verse de inmediato
+            await OrderService.release_stock(db_session, [order.id])
+            await OutboxService.enqueue(db_session, OutboxKind.ORDER_CANCELLED, [order.id])
+
+        elif order.status == OrderStatus.REFUNDED:
+            await OutboxService.enqueue(db_session, OutboxKind.ORDER_REFUNDED, [order.id])
+
+    @staticmethod
+    @log_operation(True)
+    async def update_inventory(db_session: AsyncSession, order_id: int) -> None:
+        """Update inventory after an order is placed. The caller owns the transaction and commits."""
+        await OrderService.update_inventory_bulk(db_session, [order_id])
+
+    @staticmethod
+    @log_operation(True)
+    async def update_inventory_bulk(db_session: AsyncSession, order_ids: list[int]) -> None:
+        """Deduct the lines of `order_ids` from stock as ledger movements, without touching product rows."""
+
+        if not order_ids:
+            return
+
+        try:
+
+            # Lo reservado pasa a descontarse del stock real
+            await OrderService.release_stock(db_session, order_ids)
+
+            # Solo se anexan movimientos: las ventas de un mismo producto no compiten por su fila
+            await InventoryService.record_orders(db_session, order_ids)
         
+        except HTTPException:
+            raise
+
         except Exception as e:
-            raise HTTPException(detail="Failed updating inventory", status_code=500)
\ No newline at end of file
+            raise HTTPException(detail="Failed updating inventory", status_code=500) from e
\ No newline at end of file
@@ -1,5 +1,8 @@
+from typing import Optional
+
 from fastapi import HTTPException
 from botocore.client import BaseClient
+from botocore.exceptions import ClientError
 from starlette.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
@@ -8,6 +11,7 @@ from sqlalchemy.sql.expression import Select
 from models import Payment, PaymentMethod, PaymentStatus
 from core import SETTINGS
 from dtos import PaymentFilter
+from utils import ImageUtils
 from core import log_operation
 class PaymentService:
     
@@ -22,22 +26,48 @@ class FileService:
     
     @staticmethod
     @log_operation(True)
-    async def get_file(storage_client: BaseClient, key: str):
-        """Retrieve a file by name."""
+    async def get_file(storage_client: BaseClient, key: str, size: Optional[int] = None, accept: str = ""):
+        """Retrieve a file by name, or the smallest image variant that covers `size` pixels."""
         
         try:
-        
-            obj = await storage_client.get_object(Bucket=SETTINGS.bucket_name, Key=key)
+            
+            obj = None
+            width = ImageUtils.nearest_width(size) if size else None
+            
+            if width is not None:
+                
+                extension = "webp" if "image/webp" in accept else "jpg"
+                
+                try:
+                    obj = await storage_client.get_object(Bucket=SETTINGS.bucket_name, Key=ImageUtils.variant_key(key, width, extension))
+                
+                except ClientError as e:
+                    # Imagenes subidas antes de las variantes, o archivos que no son imagenes
+                    if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                        raise
+            
+            if obj is None:
+                obj = await storage_client.get_object(Bucket=SETTINGS.bucket_name, Key=key)
 
             content_type = obj.get("ContentType", "application/octet-stream")
+            
+            headers = {"Content-Disposition": f'inline; filename="{key.split("/")[-1]}"'}
+            
+            # El formato de la variante depende de Accept: los caches no deben mezclarlos
+            if width is not None:
+                headers["Vary"] = "Accept"
 
             return StreamingResponse(
                 obj["Body"],
                 media_type=content_type,
-                headers={
-                    "Content-Disposition": f'inline; filename="{key.split("/")[-1]}"'
-                }
+                headers=headers
             )
         
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise HTTPException(detail="File not found", status_code=404) from e
+            
+            raise HTTPException(detail="Retrieve file failed", status_code=500) from e
+        
         except Exception as e:
             raise HTTPException(detail="Retrieve file failed", status_code=500) from e
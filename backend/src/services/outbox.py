@@ -0,0 +1,203 @@
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import logfire
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, update, delete, func
+from sqlalchemy.engine import Row
+
+from models import OutboxEvent, OutboxKind, OutboxStatus
+from db import background_session
+from core import SETTINGS, log_operation
+
+class OutboxService:
+    """Side effects stored with the transaction that causes them and drained in batches by a worker."""
+
+    # Efectos fuera de la base: un rollback no los deshace, asi que nunca se agrupan para reintentar uno a uno
+    NON_TRANSACTIONAL = {OutboxKind.INVOICE_EMAIL}
+
+    @staticmethod
+    @log_operation(True)
+    async def enqueue(db_session: AsyncSession,
+                      kind: OutboxKind,
+                      order_ids: list[int],
+                      payload: Optional[dict[str, Any]] = None) -> None:
+        """Queue `kind` for each order inside the caller's transaction. The caller commits."""
+
+        if not order_ids:
+            return
+
+        now = datetime.now()
+        payload = json.dumps(payload) if payload is not None else None
+
+        await db_session.exec(insert(OutboxEvent).values([
+            {"kind": kind, "order_id": order_id, "payload": payload, "status": OutboxStatus.PENDING,
+             "attempts": 0, "available_at": now, "created_at": now}
+            for order_id in order_ids
+        ]))
+
+    @staticmethod
+    async def _handle(db_session: AsyncSession, kind: OutboxKind, events: list[Row]) -> None:
+        """Run the side effect of a group of events of the same kind."""
+
+        from services import OrderService, AnalyticsService, InvoiceService
+
+        order_ids = [event.order_id for event in events]
+
+        if kind == OutboxKind.ORDER_COMPLETED:
+            await OrderService.update_inventory_bulk(db_session, order_ids)
+            await AnalyticsService.record_completed(db_session, order_ids)
+
+        elif kind == OutboxKind.ORDER_CANCELLED:
+            await AnalyticsService.record_cancelled(db_session, order_ids)
+
+        elif kind == OutboxKind.ORDER_REFUNDED:
+            await AnalyticsService.record_refunded(db_session, order_ids)
+
+        elif kind == OutboxKind.INVOICE_EMAIL:
+            for event in events:
+                payload = json.loads(event.payload) if event.payload else {}
+                await InvoiceService.send_order_invoice(db_session, event.order_id, payload.get("tax_rate", 0.0))
+
+        else:
+            raise ValueError(f"Unknown outbox event kind {kind}")
+
+    @staticmethod
+    def _backoff(attempts: int) -> timedelta:
+        """Delay before the next attempt: exponential, capped."""
+        return timedelta(seconds=min(SETTINGS.outbox_backoff_base * 2 ** (attempts - 1), SETTINGS.outbox_backoff_max))
+
+    @staticmethod
+    @log_operation(True)
+    async def process_batch(db_session: AsyncSession, batch_size: Optional[int] = None) -> int:
+        """Claim up to `batch_size` due events, run them and commit. Returns how many were claimed."""
+
+        now = datetime.now()
+
+        # SKIP LOCKED: varios workers drenan la cola sin tomar los mismos eventos.
+        # Se leen columnas y no entidades para que los rollback de savepoint no las expiren
+        response = await db_session.exec(select(OutboxEvent.id, OutboxEvent.kind, OutboxEvent.order_id,
+                                                OutboxEvent.payload, OutboxEvent.attempts)
+                                         .where(OutboxEvent.status == OutboxStatus.PENDING, OutboxEvent.available_at <= now)
+                                         .order_by(OutboxEvent.id)
+                                         .limit(batch_size or SETTINGS.outbox_batch_size)
+                                         .with_for_update(skip_locked=True))
+        events = response.all()
+
+        if not events:
+            await db_session.rollback()
+            return 0
+
+        groups: dict[OutboxKind, list[Row]] = defaultdict(list)
+
+        for event in events:
+            groups[event.kind].append(event)
+
+        done: list[int] = []
+        failed: list[tuple[Row, Exception]] = []
+
+        for kind, group in groups.items():
+
+            if kind not in OutboxService.NON_TRANSACTIONAL:
+
+                try:
+
+                    # Primero el grupo entero, en bloque
+                    async with db_session.begin_nested():
+                        await OutboxService._handle(db_session, kind, group)
+
+                    done.extend(event.id for event in group)
+                    continue
+
+                except Exception as e:
+                    if len(group) == 1:
+                        failed.append((group[0], e))
+                        continue
+
+            # Si el bloque falla, o el efecto no se puede deshacer, uno a uno con su propio savepoint
+            for event in group:
+
+                try:
+
+                    async with db_session.begin_nested():
+                        await OutboxService._handle(db_session, kind, [event])
+
+                    done.append(event.id)
+
+                except Exception as e:
+                    failed.append((event, e))
+
+        if done:
+            await db_session.exec(delete(OutboxEvent).where(OutboxEvent.id.in_(done)))
+
+        for event, error in failed:
+
+            attempts = event.attempts + 1
+            exhausted = attempts >= SETTINGS.outbox_max_attempts
+
+            logfire.warning("Outbox event failed", event_id=event.id, kind=event.kind, attempts=attempts, error=str(error))
+
+            await db_session.exec(update(OutboxEvent)
+                                  .where(OutboxEvent.id == event.id)
+                                  .values(attempts=attempts,
+                                          status=OutboxStatus.FAILED if exhausted else OutboxStatus.PENDING,
+                                          available_at=now + OutboxService._backoff(attempts),
+                                          last_error=str(error)[:1000]))
+
+        await db_session.commit()
+
+        return len(events)
+
+    @staticmethod
+    @log_operation(True)
+    async def retry_failed(db_session: AsyncSession) -> int:
+        """Put the events that ran out of attempts back in the queue. The caller commits."""
+
+        response = await db_session.exec(update(OutboxEvent)
+                                         .where(OutboxEvent.status == OutboxStatus.FAILED)
+                                         .values(status=OutboxStatus.PENDING, attempts=0, available_at=datetime.now())
+                                         .returning(OutboxEvent.id))
+
+        return len(response.scalars().all())
+
+    @staticmethod
+    @log_operation(True)
+    async def stats(db_session: AsyncSession) -> dict[str, Any]:
+        """Queued events per status and the age in seconds of the oldest pending one."""
+
+        response = await db_session.exec(select(OutboxEvent.status, func.count(), func.min(OutboxEvent.created_at))
+                                         .group_by(OutboxEvent.status))
+        rows = response.all()
+
+        counts = {status.value: 0 for status in OutboxStatus}
+        oldest = None
+
+        for status, count, created_at in rows:
+            counts[OutboxStatus(status).value] = count
+
+            if status == OutboxStatus.PENDING and created_at is not None:
+                oldest = (datetime.now() - created_at).total_seconds()
+
+        return {"events": counts, "oldest_pending_seconds": oldest}
+
+    @staticmethod
+    async def worker_loop(interval: float) -> None:
+        """Drain the outbox until cancelled, sleeping `interval` seconds when it is empty."""
+
+        while True:
+
+            try:
+
+                async with background_session() as db_session:
+                    claimed = await OutboxService.process_batch(db_session)
+
+            except Exception:
+                logfire.exception("Outbox batch failed")
+                claimed = 0
+
+            # Con un lote lleno probablemente queda mas trabajo: se sigue sin esperar
+            if claimed < SETTINGS.outbox_batch_size:
+                await asyncio.sleep(interval)
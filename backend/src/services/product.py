@@ -1,23 +1,167 @@
+import asyncio
 from datetime import date
+from typing import Optional, Sequence
 
+import logfire
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, func, union_all
+from sqlalchemy import null, Row
 from sqlalchemy.sql.expression import Select
 
-from models import Product, ProductCategory, Category, ServiceInput
-from dtos import ProductFilter, CategoryFilter
+from models import Product, ProductCategory, ProductBarcode, Category, ServiceInput
+from dtos import ProductRead, ProductFilter, CategoryFilter, StockState, ExpiryState, FacetCount, ProductFacets
+from services.inventory import InventoryService
+from db import background_session, is_primary
+from core import CATALOG_CACHE, log_operation
 
 class ProductService:
         
-    QUERY_PRODUCT_BASE = select(Product)
+    # Cada producto sale con su stock del libro: Product.stock es solo la copia del ultimo snapshot
+    QUERY_PRODUCT_BASE = select(Product, InventoryService.current_stock_column().label("current_stock"))
     QUERY_CATEGORY_BASE = select(Category)
+
+    # Reintentos de la carga del mapa de codigos si una invalidacion total la descarta
+    PRELOAD_ATTEMPTS = 5
     
+    @staticmethod
+    def read_with_stock(rows: Sequence[Row]) -> list[ProductRead]:
+        """Rows of the product searches as ProductRead, with the stock from the ledger."""
+
+        # Se copia al DTO: asignar el stock a la entidad la ensuciaria en la sesion
+        return [ProductRead.model_validate(product, from_attributes=True).model_copy(update={"stock": stock})
+                for product, stock in rows]
+
+    @staticmethod
+    @log_operation(True)
+    async def with_current_stock(db_session: AsyncSession, product: Product) -> Product:
+        """`product` out of the session, with the stock from the ledger in place of the snapshot copy."""
+
+        current = await InventoryService.current_stock(db_session, [product.id])
+
+        if product in db_session:
+            db_session.expunge(product)
+
+        product.stock = current.get(product.id, product.stock)
+
+        return product
+
     @classmethod
     def search_products(cls, filters: ProductFilter) -> Select:
-        """Query that searches for products who meet the filters."""
-        return filters.apply(cls.QUERY_PRODUCT_BASE)
+        """Query that searches for products who meet the filters, on the current stock when they read it."""
+
+        if not filters.uses_stock():
+            return filters.apply(cls.QUERY_PRODUCT_BASE)
+
+        current = InventoryService.current_stock_query().subquery()
+
+        return filters.apply(cls.QUERY_PRODUCT_BASE.join(current, current.c.product_id == Product.id),
+                             current.c.stock, current.c.stock - Product.reserved_stock)
     
+    @staticmethod
+    @log_operation(True)
+    async def search_facets(db_session: AsyncSession, filters: ProductFilter) -> ProductFacets:
+        """Price, stock and expiry counts of every product matching the filters, from one grouped query."""
+
+        # El estado de stock sale del libro y descuenta lo reservado: lo que de verdad se puede vender
+        current = InventoryService.current_stock_query().subquery()
+        available = current.c.stock - Product.reserved_stock
+
+        matching = filters.apply(select(ProductFilter.price_bucket().label("price"),
+                                        ProductFilter.stock_state(available).label("stock"),
+                                        ProductFilter.expiry_state().label("expiry"))
+                                 .select_from(Product)
+                                 .join(current, current.c.product_id == Product.id),
+                                 current.c.stock, available).cte("matching")
+
+        if db_session.get_bind().dialect.name == "postgresql":
+            query = (select(matching.c.price, matching.c.stock, matching.c.expiry, func.count())
+                     .group_by(func.grouping_sets(matching.c.price, matching.c.stock, matching.c.expiry)))
+        else:
+            # sqlite no tiene GROUPING SETS: los tres grupos van en la misma consulta con UNION ALL
+            query = union_all(*[select(*[matching.c[name] if name == facet else null().label(name) for name in ("price", "stock", "expiry")],
+                                       func.count())
+                                .group_by(matching.c[facet])
+                                for facet in ("price", "stock", "expiry")])
+
+        response = await db_session.exec(query)
+
+        # Los valores sin productos tambien se listan, en el orden en que se muestran
+        counts = {"price": dict.fromkeys(ProductFilter.price_buckets(), 0),
+                  "stock": dict.fromkeys((state.value for state in StockState), 0),
+                  "expiry": dict.fromkeys((state.value for state in ExpiryState), 0)}
+
+        # Cada fila trae solo la columna de su grupo, las otras son NULL
+        for price, stock, expiry, count in response.all():
+            for facet, value in (("price", price), ("stock", stock), ("expiry", expiry)):
+                if value is not None:
+                    counts[facet][value] = count
+
+        return ProductFacets(**{facet: [FacetCount(value=value, count=count) for value, count in values.items()]
+                                for facet, values in counts.items()})
+    
+    @staticmethod
+    @log_operation(True)
+    async def lookup_code(db_session: AsyncSession, code: str) -> Optional[int]:
+        """Product of a scanned barcode or SKU: from the in-memory map, or one indexed query on a miss."""
+
+        product_id = CATALOG_CACHE.product_id(code)
+
+        if product_id is not None:
+            return product_id
+
+        generation = CATALOG_CACHE.generation
+
+        # Un codigo de barras gana sobre un SKU igual de otro producto
+        response = await db_session.exec(select(func.coalesce(
+            select(ProductBarcode.product_id).where(ProductBarcode.code == code).scalar_subquery(),
+            select(Product.id).where(Product.sku == code).scalar_subquery(),
+        )))
+        product_id = response.one()
+
+        # El mapa no vence: lo leido de una replica atrasada quedaria hasta la proxima escritura
+        if product_id is not None and is_primary(db_session):
+            CATALOG_CACHE.put_codes([(code, product_id)], generation)
+
+        return product_id
+
+    @staticmethod
+    @log_operation(True)
+    async def load_codes(db_session: AsyncSession) -> bool:
+        """Fill the scan map with every barcode and SKU so the first scans do not hit the database.
+
+        Returns False when a full invalidation during the load discarded it."""
+
+        generation = CATALOG_CACHE.generation
+
+        skus = await db_session.exec(select(Product.sku, Product.id).where(Product.sku.is_not(None)))
+        codes = skus.all()
+
+        barcodes = await db_session.exec(select(ProductBarcode.code, ProductBarcode.product_id))
+        codes.extend(barcodes.all())
+
+        return CATALOG_CACHE.put_codes(codes, generation)
+
+    @staticmethod
+    async def preload_codes() -> None:
+        """Load the scan map at startup, retrying with backoff; until it finishes scans fall back to the database."""
+
+        for attempt in range(ProductService.PRELOAD_ATTEMPTS):
+
+            if attempt:
+                await asyncio.sleep(2 ** attempt)
+
+            try:
+
+                async with background_session() as db_session:
+                    if await ProductService.load_codes(db_session):
+                        return
+
+            except Exception:
+                logfire.exception("Scan code preload failed", attempt=attempt + 1)
+
+        logfire.warning("Scan code preload gave up, scans fill the map on demand")
+
     @classmethod
     def search_products_by_category(cls, category_id: int) -> Select:
         """Query for search product by category"""
@@ -37,10 +181,14 @@ class ProductService:
     
     @classmethod
     def search_low_stock_products(cls) -> Select:
-        """Query for search products with low stock."""
+        """Query for search products with low stock, from the ledger."""
+
+        current = InventoryService.current_stock_query().subquery()
+
         return (cls.QUERY_PRODUCT_BASE
-                .where(Product.stock <= Product.minimum_stock)
-                .order_by(Product.stock))
+                .join(current, current.c.product_id == Product.id)
+                .where(current.c.stock <= Product.minimum_stock)
+                .order_by(current.c.stock))
     
     @classmethod
     def search_expired_products(cls) -> Select:
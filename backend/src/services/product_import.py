@@ -0,0 +1,275 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, Iterator, NamedTuple
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, insert, update, delete, func, and_, or_
+from sqlalchemy import Table, Column, MetaData, Integer, String, Float, Date, literal, cast
+
+from models import Product
+from dtos import ProductCreate, ProductImportError
+from core import SETTINGS, log_operation
+
+class ImportChunk(NamedTuple):
+    rows: int
+    records: list[tuple]
+    errors: list[ProductImportError]
+
+class ProductImportService:
+    """Bulk product import: rows are validated in chunks, copied to a staging table and merged with set-based statements."""
+
+    COLUMNS = list(ProductCreate.model_fields)
+    REQUIRED = [name for name, field in ProductCreate.model_fields.items() if field.is_required()]
+
+    XLSX_TYPES = {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+    CSV_TYPES = {"text/csv", "application/csv", "application/vnd.ms-excel", "text/plain"}
+
+    # Clave del advisory lock que serializa los merges de importaciones concurrentes
+    MERGE_LOCK_KEY = 0x1A9B
+
+    # Tabla temporal de la conexion: no entra en SQLModel.metadata ni en create_all
+    STAGING = Table("product_import", MetaData(),
+                    Column("row_number", Integer, nullable=False),
+                    Column("name", String, nullable=False),
+                    Column("sku", String),
+                    Column("short_description", String),
+                    Column("price", Float, nullable=False),
+                    Column("cost", Float, nullable=False),
+                    Column("stock", Integer, nullable=False),
+                    Column("minimum_stock", Integer, nullable=False),
+                    Column("expiration_date", Date),
+                    Column("product_id", Integer),
+                    Column("matches", Integer),
+                    prefixes=["TEMPORARY"])
+
+    STAGING_COLUMNS = ["row_number", *COLUMNS]
+
+    @staticmethod
+    def _iter_csv(file: UploadFile) -> Iterator[tuple[int, dict[str, Any]]]:
+
+        text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+
+        try:
+            reader = csv.DictReader(text)
+            ProductImportService._check_header(reader.fieldnames or [])
+
+            for values in reader:
+                yield reader.line_num, values
+
+        finally:
+            # Sin detach, cerrar el wrapper cerraria tambien el archivo subido
+            text.detach()
+
+    @staticmethod
+    def _iter_xlsx(file: UploadFile) -> Iterator[tuple[int, dict[str, Any]]]:
+
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise HTTPException(detail="XLSX import is not available, upload a CSV file", status_code=415)
+
+        try:
+            workbook = load_workbook(file.file, read_only=True, data_only=True)
+        except Exception as e:
+            raise HTTPException(detail="Invalid XLSX file", status_code=400) from e
+
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+            ProductImportService._check_header(header)
+
+            for line, cells in enumerate(rows, start=2):
+                yield line, dict(zip(header, cells))
+
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _check_header(header: list[str]) -> None:
+
+        present = {(column or "").strip().lower() for column in header}
+        missing = [column for column in ProductImportService.REQUIRED if column not in present]
+
+        if missing:
+            raise HTTPException(detail=f"Missing columns: {', '.join(missing)}", status_code=400)
+
+    @staticmethod
+    def _clean(values: dict[str, Any]) -> dict[str, Any]:
+        """Known columns of a row; empty cells are left out so the optional fields take their default."""
+
+        row = {}
+
+        for column, value in values.items():
+            column = (column or "").strip().lower()
+
+            if column not in ProductImportService.COLUMNS:
+                continue
+
+            if isinstance(value, str):
+                value = value.strip()
+
+            if isinstance(value, datetime):
+                value = value.date()
+
+            if value is None or value == "":
+                continue
+
+            row[column] = value
+
+        return row
+
+    @staticmethod
+    def read_chunks(file: UploadFile, chunk_size: int) -> Iterator[ImportChunk]:
+        """Validate the rows of `file` with ProductCreate, `chunk_size` at a time. Blocking: run it in a thread."""
+
+        name = (file.filename or "").lower()
+
+        if name.endswith(".xlsx") or file.content_type in ProductImportService.XLSX_TYPES:
+            rows = ProductImportService._iter_xlsx(file)
+        elif name.endswith(".csv") or file.content_type in ProductImportService.CSV_TYPES:
+            rows = ProductImportService._iter_csv(file)
+        else:
+            raise HTTPException(detail="Unsupported file type, upload a CSV or XLSX file", status_code=415)
+
+        chunk = ImportChunk(0, [], [])
+
+        try:
+
+            for line, values in rows:
+
+                values = ProductImportService._clean(values)
+
+                # Las filas vacias, comunes al final de las hojas de calculo, no cuentan
+                if not values:
+                    continue
+
+                try:
+                    product = ProductCreate.model_validate(values)
+                    chunk.records.append((line, *(getattr(product, column) for column in ProductImportService.COLUMNS)))
+
+                except ValidationError as e:
+                    chunk.errors.append(ProductImportError(row=line, errors=[
+                        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                    ]))
+
+                chunk = chunk._replace(rows=chunk.rows + 1)
+
+                if chunk.rows >= chunk_size:
+                    yield chunk
+                    chunk = ImportChunk(0, [], [])
+
+        except UnicodeDecodeError as e:
+            raise HTTPException(detail="The CSV file must be UTF-8 encoded", status_code=400) from e
+
+        except csv.Error as e:
+            raise HTTPException(detail=f"Invalid CSV file: {e}", status_code=400) from e
+
+        if chunk.rows:
+            yield chunk
+
+    @staticmethod
+    @log_operation(True)
+    async def create_staging(db_session: AsyncSession) -> None:
+        """Create an empty staging table on the session's connection."""
+
+        connection = await db_session.connection()
+
+        await connection.run_sync(ProductImportService.STAGING.drop, checkfirst=True)
+        await connection.run_sync(ProductImportService.STAGING.create)
+
+    @staticmethod
+    @log_operation(True)
+    async def stage(db_session: AsyncSession, records: list[tuple]) -> None:
+        """Load validated rows into the staging table: COPY on Postgres, executemany elsewhere."""
+
+        if not records:
+            return
+
+        connection = await db_session.connection()
+
+        if connection.dialect.name == "postgresql":
+            raw = await connection.get_raw_connection()
+
+            await raw.driver_connection.copy_records_to_table(ProductImportService.STAGING.name,
+                                                              records=records,
+                                                              columns=ProductImportService.STAGING_COLUMNS)
+            return
+
+        await connection.execute(insert(ProductImportService.STAGING),
+                                 [dict(zip(ProductImportService.STAGING_COLUMNS, record)) for record in records])
+
+    @staticmethod
+    @log_operation(True)
+    async def merge(db_session: AsyncSession) -> tuple[int, list[int], list[int], list[int]]:
+        """Merge the staging table into product, matching by sku or, for rows without one, by name.
+
+        Returns the duplicates dropped, the inserted and updated ids and the rows whose name matches several products.
+        The stock of existing products is not touched: it belongs to the movement ledger."""
+
+        staging = ProductImportService.STAGING
+        now = datetime.now()
+
+        # Dos importaciones a la vez verian los mismos productos como nuevos y los crearian dos veces
+        if db_session.get_bind().dialect.name == "postgresql":
+            await db_session.exec(select(func.pg_advisory_xact_lock(ProductImportService.MERGE_LOCK_KEY)))
+
+        # El sku es unico y manda; el nombre no lo es y solo sirve si identifica un unico producto
+        await db_session.exec(update(staging)
+                              .where(staging.c.sku.is_not(None))
+                              .values(product_id=select(Product.id).where(Product.sku == staging.c.sku).scalar_subquery()))
+
+        # Sin coincidencia por sku se busca por nombre, sin pisar el sku de otro producto
+        by_name = and_(Product.name == staging.c.name, or_(staging.c.sku.is_(None), Product.sku.is_(None)))
+
+        await db_session.exec(update(staging)
+                              .where(staging.c.product_id.is_(None))
+                              .values(product_id=select(func.min(Product.id)).where(by_name).scalar_subquery(),
+                                      matches=select(func.count(Product.id)).where(by_name).scalar_subquery()))
+
+        response = await db_session.exec(delete(staging).where(staging.c.matches > 1).returning(staging.c.row_number))
+        ambiguous = sorted(response.scalars().all())
+
+        # Con filas repetidas en el archivo gana la ultima: mismo producto, o mismo sku o nombre si es nuevo
+        key = func.coalesce(literal("product:") + cast(staging.c.product_id, String),
+                            literal("sku:") + staging.c.sku,
+                            literal("name:") + staging.c.name)
+
+        response = await db_session.exec(delete(staging)
+                                         .where(staging.c.row_number.not_in(select(func.max(staging.c.row_number)).group_by(key)))
+                                         .returning(staging.c.row_number))
+        duplicated = len(response.all())
+
+        # Las celdas opcionales vacias conservan el valor actual
+        response = await db_session.exec(update(Product)
+                                         .where(Product.id == staging.c.product_id)
+                                         .values(name=staging.c.name,
+                                                 sku=func.coalesce(staging.c.sku, Product.sku),
+                                                 short_description=func.coalesce(staging.c.short_description, Product.short_description),
+                                                 price=staging.c.price,
+                                                 cost=staging.c.cost,
+                                                 minimum_stock=staging.c.minimum_stock,
+                                                 expiration_date=func.coalesce(staging.c.expiration_date, Product.expiration_date),
+                                                 updated_at=now)
+                                         .returning(Product.id)
+                                         .execution_options(synchronize_session=False))
+        updated = list(response.scalars().all())
+
+        # Los productos nuevos entran con el stock del archivo como punto de partida del libro
+        response = await db_session.exec(insert(Product)
+                                         .from_select(["name", "sku", "short_description", "price", "cost", "stock", "reserved_stock",
+                                                       "minimum_stock", "expiration_date", "created_at", "updated_at"],
+                                                      select(staging.c.name, staging.c.sku, staging.c.short_description, staging.c.price,
+                                                             staging.c.cost, staging.c.stock, literal(0), staging.c.minimum_stock,
+                                                             staging.c.expiration_date, literal(now), literal(now))
+                                                      .where(staging.c.product_id.is_(None))
+                                                      .order_by(staging.c.row_number))
+                                         .returning(Product.id))
+        inserted = list(response.scalars().all())
+
+        connection = await db_session.connection()
+        await connection.run_sync(staging.drop)
+
+        return duplicated, inserted, updated, ambiguous
@@ -0,0 +1,123 @@
+"""Stress the stock reservation against Postgres: ``python stress_stock.py``.
+
+Fires `CONCURRENCY` reservations, cancellations and stock decrements of the same product at once and
+checks that none of them is lost. Run it against a scratch database: the rows it creates are kept.
+"""
+
+import asyncio
+import uuid
+
+from fastapi import HTTPException
+from sqlmodel import select, insert
+
+from core import setup_logging
+from db import init_engine, init_db, close_engine, background_session
+from models import Product, Client, Employee, Order, OrderProduct, OrderStatus
+from crud import OrderCrud, ProductCrud
+from services import OrderService, InventoryService
+
+CONCURRENCY = 100
+
+async def setup() -> tuple[int, list[int]]:
+    """A product with exactly `CONCURRENCY` units and one pending order of one unit per task, plus a spare."""
+
+    tag = uuid.uuid4().hex[:8]
+
+    async with background_session() as db_session:
+
+        product = Product(name=f"stress-{tag}", price=1, cost=1, stock=CONCURRENCY, minimum_stock=0)
+        client = Client(email=f"stress-{tag}@example.com", first_name="Stress", last_name="Test")
+        employee = Employee(email=f"stress-{tag}@example.com", password="x", first_name="Stress")
+
+        db_session.add_all([product, client, employee])
+        await db_session.flush()
+
+        response = await db_session.exec(insert(Order).values([
+            {"client_id": client.id, "employee_id": employee.id, "status": OrderStatus.PENDING, "total_price": 1}
+            for _ in range(CONCURRENCY + 1)
+        ]).returning(Order.id))
+        order_ids = list(response.scalars().all())
+
+        await db_session.exec(insert(OrderProduct).values([
+            {"order_id": order_id, "product_id": product.id, "quantity": 1}
+            for order_id in order_ids
+        ]))
+
+        await db_session.commit()
+
+        return product.id, order_ids
+
+async def reserve(order_id: int) -> bool:
+
+    async with background_session() as db_session:
+
+        try:
+            await OrderService.reserve_stock(db_session, order_id)
+            await db_session.commit()
+            return True
+
+        except HTTPException as e:
+            await db_session.rollback()
+
+            if e.status_code != 409:
+                raise
+
+            return False
+
+async def cancel(order_id: int) -> None:
+
+    async with background_session() as db_session:
+        await OrderCrud.update_order_status(db_session, order_id, OrderStatus.CANCELLED)
+
+async def decrement(product_id: int) -> None:
+
+    async with background_session() as db_session:
+        await ProductCrud.update_stock(db_session, product_id, -1, replace=False)
+
+async def stock(product_id: int) -> tuple[int, int]:
+    """Current stock from the ledger and reserved stock of the product."""
+
+    async with background_session() as db_session:
+
+        current = await InventoryService.current_stock(db_session, [product_id])
+        response = await db_session.exec(select(Product.reserved_stock).where(Product.id == product_id))
+
+        return current[product_id], response.one()
+
+async def main() -> None:
+
+    setup_logging()
+
+    init_engine()
+
+    # SQLite serializa toda escritura y no tiene FOR UPDATE: no prueba nada
+    async with background_session() as db_session:
+        assert db_session.get_bind().dialect.name == "postgresql", "the stress test needs a Postgres database_url"
+
+    await init_db()
+
+    try:
+
+        product_id, order_ids = await setup()
+        orders, spare = order_ids[:-1], order_ids[-1]
+
+        reserved = await asyncio.gather(*(reserve(order_id) for order_id in orders))
+        assert all(reserved), f"{reserved.count(False)} reservations failed with stock available"
+        assert await stock(product_id) == (CONCURRENCY, CONCURRENCY)
+
+        # Ya no queda disponible: la reserva de mas se rechaza en lugar de sobrevender
+        assert not await reserve(spare)
+
+        await asyncio.gather(*(cancel(order_id) for order_id in orders))
+        assert await stock(product_id) == (CONCURRENCY, 0)
+
+        await asyncio.gather(*(decrement(product_id) for _ in range(CONCURRENCY)))
+        assert await stock(product_id) == (0, 0)
+
+        print(f"OK: {CONCURRENCY} concurrent reservations, cancellations and decrements, no lost updates")
+
+    finally:
+        await close_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,5 +3,8 @@ from utils.product import ProductUtils
 from utils.service import ServiceUtils
 from utils.others import PaymentUtils
 from utils.order import OrderUtils
+from utils.exists import ExistsUtils
+from utils.conditional import ConditionalUtils
+from utils.image import ImageUtils
 
-__all__ = ["UserUtils", "ProductUtils", "ServiceUtils", "PaymentUtils", "OrderUtils"]
\ No newline at end of file
+__all__ = ["UserUtils", "ProductUtils", "ServiceUtils", "PaymentUtils", "OrderUtils", "ExistsUtils", "ConditionalUtils", "ImageUtils"]
\ No newline at end of file
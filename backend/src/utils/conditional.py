@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import SQLModel, select
+
+from core import CATALOG_CACHE, log_operation
+
+class ConditionalUtils:
+    """Conditional GET: ETag and Last-Modified from id + updated_at, 304 when the client copy is current."""
+
+    @staticmethod
+    def etag(_id: int, updated_at: datetime) -> str:
+        """Strong ETag of a row version."""
+        return f'"{_id}-{int(updated_at.timestamp() * 1_000_000):x}"'
+
+    @staticmethod
+    def headers(_id: int, updated_at: datetime) -> dict[str, str]:
+        """Validators to send with a row."""
+        return {"ETag": ConditionalUtils.etag(_id, updated_at),
+                "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)}
+
+    @staticmethod
+    def is_conditional(request: Request) -> bool:
+        return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+    @staticmethod
+    def is_fresh(request: Request, _id: int, updated_at: datetime) -> bool:
+        """Whether the client copy is current. If-None-Match wins over If-Modified-Since, as in RFC 9110."""
+
+        if_none_match = request.headers.get("if-none-match")
+
+        if if_none_match is not None:
+
+            if if_none_match.strip() == "*":
+                return True
+
+            etag = ConditionalUtils.etag(_id, updated_at)
+
+            # If-None-Match compara en modo debil: W/"x" vale como "x"
+            return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+        if_modified_since = request.headers.get("if-modified-since")
+
+        if if_modified_since is None:
+            return False
+
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+        if since.tzinfo is None:
+            return False
+
+        # Last-Modified tiene resolucion de segundos
+        return updated_at.astimezone(timezone.utc).replace(microsecond=0) <= since
+
+    @staticmethod
+    @log_operation(True)
+    async def version(db_session: AsyncSession, model: type[SQLModel], _id: int, kind: Optional[str] = None) -> Optional[datetime]:
+        """updated_at of a row from the catalog cache when `kind` is cached, else with an updated_at-only query."""
+
+        if kind is not None:
+            updated_at = CATALOG_CACHE.version(kind, _id)
+
+            if updated_at is not None:
+                return updated_at
+
+        response = await db_session.exec(select(model.updated_at).where(model.id == _id))
+
+        return response.first()
+
+    @staticmethod
+    async def read(request: Request,
+                   response: Response,
+                   db_session: AsyncSession,
+                   model: type[SQLModel],
+                   _id: int,
+                   read: Callable[[], Awaitable[Any]],
+                   kind: Optional[str] = None) -> Any:
+        """304 without loading the row when the client copy is current; otherwise `read` with validators attached."""
+
+        if ConditionalUtils.is_conditional(request):
+            updated_at = await ConditionalUtils.version(db_session, model, _id, kind)
+
+            if updated_at is not None and ConditionalUtils.is_fresh(request, _id, updated_at):
+                return Response(status_code=304, headers=ConditionalUtils.headers(_id, updated_at))
+
+        row = await read()
+
+        response.headers.update(ConditionalUtils.headers(row.id, row.updated_at))
+
+        return row
@@ -0,0 +1,77 @@
+from typing import Any, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, InstrumentedAttribute
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import SQLModel, select, exists
+
+from core import log_operation
+
+class ExistsUtils:
+    """Existence checks with ``SELECT EXISTS`` and a per-session memo."""
+
+    MEMO_KEY = "exists_memo"
+
+    @staticmethod
+    def _memo(db_session: AsyncSession) -> dict:
+        return db_session.info.setdefault(ExistsUtils.MEMO_KEY, {})
+
+    @staticmethod
+    def _key(model: type[SQLModel], filters: dict[str, Any]) -> tuple:
+        return (model.__tablename__, tuple(sorted(filters.items())))
+
+    @staticmethod
+    @log_operation(True)
+    async def exists(db_session: AsyncSession, model: type[SQLModel], **filters: Any) -> bool:
+        """Check if a row of `model` matching all `filters` exists."""
+
+        memo = ExistsUtils._memo(db_session)
+        key = ExistsUtils._key(model, filters)
+
+        if key not in memo:
+            criteria = [getattr(model, column) == value for column, value in filters.items()]
+            response = await db_session.exec(select(exists().where(*criteria)))
+            memo[key] = bool(response.one())
+
+        return memo[key]
+
+    @staticmethod
+    @log_operation(True)
+    async def existing(db_session: AsyncSession, column: InstrumentedAttribute, values: Iterable[Any]) -> set:
+        """Return which of `values` exist in `column`, verified with a single query."""
+
+        model = column.class_
+        memo = ExistsUtils._memo(db_session)
+        values = set(values)
+
+        pending = {value for value in values if ExistsUtils._key(model, {column.key: value}) not in memo}
+
+        if pending:
+            response = await db_session.exec(select(column).where(column.in_(pending)))
+            found = set(response.all())
+
+            for value in pending:
+                memo[ExistsUtils._key(model, {column.key: value})] = value in found
+
+        return {value for value in values if memo[ExistsUtils._key(model, {column.key: value})]}
+
+    @staticmethod
+    async def missing(db_session: AsyncSession, column: InstrumentedAttribute, values: Iterable[Any]) -> set:
+        """Return which of `values` do not exist in `column`."""
+        values = set(values)
+        return values - await ExistsUtils.existing(db_session, column, values)
+
+# El memo se invalida en cuanto la sesion puede haber creado o borrado filas
+@event.listens_for(Session, "after_flush")
+def _clear_exists_memo_on_flush(session: Session, flush_context) -> None:
+    session.info.pop(ExistsUtils.MEMO_KEY, None)
+
+@event.listens_for(Session, "do_orm_execute")
+def _clear_exists_memo_on_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_delete:
+        orm_execute_state.session.info.pop(ExistsUtils.MEMO_KEY, None)
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_exists_memo(session: Session) -> None:
+    session.info.pop(ExistsUtils.MEMO_KEY, None)
@@ -0,0 +1,124 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from botocore.client import BaseClient
+from PIL import Image, ImageOps
+
+from core import SETTINGS, log_operation
+
+class ImageVariant(NamedTuple):
+    width: int
+    extension: str
+    content_type: str
+    data: bytes
+
+def render_variants(data: bytes, widths: list[int], quality: int) -> list[ImageVariant]:
+    """Downscaled JPEG and WebP copies of an image, one pair per width. Runs in a worker process."""
+
+    with Image.open(io.BytesIO(data)) as original:
+
+        # Las fotos de telefono vienen rotadas por EXIF
+        image = ImageOps.exif_transpose(original)
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+
+        variants = []
+
+        for width in sorted(widths):
+
+            # Nunca se agranda: si la original es mas chica, la variante queda de su tamaño
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+
+            webp = io.BytesIO()
+            resized.save(webp, "WEBP", quality=quality, method=4)
+            variants.append(ImageVariant(width, "webp", "image/webp", webp.getvalue()))
+
+            # JPEG no tiene transparencia: se aplana sobre blanco
+            if resized.mode == "RGBA":
+                background = Image.new("RGB", resized.size, (255, 255, 255))
+                background.paste(resized, mask=resized.getchannel("A"))
+                resized = background
+
+            jpeg = io.BytesIO()
+            resized.save(jpeg, "JPEG", quality=quality, optimize=True, progressive=True)
+            variants.append(ImageVariant(width, "jpg", "image/jpeg", jpeg.getvalue()))
+
+        return variants
+
+class ImageUtils:
+    """Resized variants of product images, rendered in a process pool and stored next to the original."""
+
+    _pool: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def pool() -> ProcessPoolExecutor:
+        """Shared pool of image workers, created on first use."""
+
+        if ImageUtils._pool is None:
+            # spawn: un fork del proceso con el loop y sus hilos puede dejar locks tomados en el hijo
+            ImageUtils._pool = ProcessPoolExecutor(max_workers=SETTINGS.image_workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+
+        return ImageUtils._pool
+
+    @staticmethod
+    def shutdown() -> None:
+        if ImageUtils._pool is not None:
+            ImageUtils._pool.shutdown(wait=False, cancel_futures=True)
+            ImageUtils._pool = None
+
+    @staticmethod
+    def variant_key(image_key: str, width: int, extension: str) -> str:
+        """Storage key of a variant, derived from the original key."""
+        return f"{image_key}.{width}.{extension}"
+
+    @staticmethod
+    def variant_keys(image_key: str) -> list[str]:
+        return [ImageUtils.variant_key(image_key, width, extension)
+                for width in SETTINGS.image_variant_widths
+                for extension in ("webp", "jpg")]
+
+    @staticmethod
+    def nearest_width(size: int) -> Optional[int]:
+        """Smallest variant width that covers `size` pixels, or None when only the original does."""
+        return min((width for width in SETTINGS.image_variant_widths if width >= size), default=None)
+
+    @staticmethod
+    @log_operation(False)
+    async def render(data: bytes) -> list[ImageVariant]:
+        """Render the variants of an image off the event loop; 400 when it cannot be decoded."""
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(ImageUtils.pool(), render_variants, data,
+                                              SETTINGS.image_variant_widths, SETTINGS.image_variant_quality)
+
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise HTTPException(detail="The file is not a valid image", status_code=400) from e
+
+    @staticmethod
+    @log_operation(True)
+    async def upload_variants(storage_client: BaseClient, image_key: str, variants: list[ImageVariant]) -> None:
+        """Store rendered variants under keys derived from `image_key`."""
+
+        await asyncio.gather(*(storage_client.put_object(Bucket=SETTINGS.bucket_name,
+                                                         Key=ImageUtils.variant_key(image_key, variant.width, variant.extension),
+                                                         Body=variant.data,
+                                                         ContentType=variant.content_type)
+                               for variant in variants))
+
+    @staticmethod
+    @log_operation(True)
+    async def delete_variants(storage_client: BaseClient, image_key: str) -> None:
+        """Delete every variant of `image_key`; missing ones are ignored by the storage."""
+
+        await storage_client.delete_objects(Bucket=SETTINGS.bucket_name,
+                                            Delete={"Objects": [{"Key": key} for key in ImageUtils.variant_keys(image_key)],
+                                                    "Quiet": True})
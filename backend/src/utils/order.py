@@ -3,6 +3,7 @@ from sqlmodel import select
 from fastapi import HTTPException
 
 from models import OrderStatus, Order, OrderService, OrderProduct
+from utils.exists import ExistsUtils
 from core import log_operation
 
 class OrderUtils:
@@ -14,9 +15,7 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Order, id=order_id)
         
         except Exception as e:
             raise HTTPException(detail="Order existence check failed", status_code=500) from e
@@ -28,9 +27,7 @@ class OrderUtils:
         
         try:
 
-            response = await db_session.exec(select(Order).where(Order.employee_id == employee_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Order, employee_id=employee_id)
         
         except Exception as e:
             raise HTTPException(detail="Order existence check failed", status_code=500) from e
@@ -42,9 +39,7 @@ class OrderUtils:
         
         try:
 
-            response = await db_session.exec(select(Order).where(Order.client_id == client_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Order, client_id=client_id)
         
         except Exception as e:
             raise HTTPException(detail="Order existence check failed", status_code=500) from e
@@ -56,9 +51,7 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(OrderService).where(OrderService.service_id == order_service.service_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderService, order_id=order_service.order_id, service_id=order_service.service_id)
         
         except Exception as e:
             raise HTTPException(detail="Order service existence check failed", status_code=500) from e
@@ -70,9 +63,7 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(OrderService).where(OrderService.service_id == service_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderService, service_id=service_id)
         
         except Exception as e:
             raise HTTPException(detail="Service existence check failed", status_code=500) from e
@@ -84,9 +75,7 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(OrderProduct).where(OrderProduct.product_id == order_product.product_id).where(OrderProduct.order_id == order_product.order_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderProduct, order_id=order_product.order_id, product_id=order_product.product_id)
         
         except Exception as e:
             raise HTTPException(detail="Order product existence check failed", status_code=500) from e
@@ -98,9 +87,7 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(OrderService).where(OrderService.order_id == order_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderService, order_id=order_id)
         
         except Exception as e:
             raise HTTPException(detail="Order service existence check failed", status_code=500) from e
@@ -112,13 +99,30 @@ class OrderUtils:
         
         try:
 
-            response = await db_session.exec(select(OrderProduct).where(OrderProduct.order_id == order_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderProduct, order_id=order_id)
         
         except Exception as e:
             raise HTTPException(detail="Order product existence check failed", status_code=500) from e
 
+    @staticmethod
+    @log_operation(True)
+    async def lock_order_status(db_session: AsyncSession, order_id: int) -> OrderStatus:
+        """Read the status of an order and lock its row until the transaction ends."""
+        
+        try:
+            
+            # Con la fila bloqueada, ninguna transicion de estado puede cruzarse con el cambio en curso
+            response = await db_session.exec(select(Order.status).where(Order.id == order_id).with_for_update())
+            status = response.first()
+        
+        except Exception as e:
+            raise HTTPException(detail="Order status check failed", status_code=500) from e
+        
+        if status is None:
+            raise HTTPException(detail="Order not found", status_code=404)
+        
+        return status
+
     @staticmethod
     @log_operation(True)
     async def order_product_in_order_completed(db_session: AsyncSession, order_product: OrderProduct) -> bool:
@@ -129,9 +133,9 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_product.order_id))
+            response = await db_session.exec(select(Order.status).where(Order.id == order_product.order_id))
 
-            return response.one().status == OrderStatus.COMPLETED
+            return response.one() == OrderStatus.COMPLETED
         
         except Exception as e:
             raise HTTPException(detail="Order product existence check failed", status_code=500) from e
@@ -146,9 +150,9 @@ class OrderUtils:
         
         try:
             
-            response = await db_session.exec(select(Order).where(Order.id == order_service.order_id))
+            response = await db_session.exec(select(Order.status).where(Order.id == order_service.order_id))
 
-            return response.one().status == OrderStatus.COMPLETED
+            return response.one() == OrderStatus.COMPLETED
         
         except Exception as e:
             raise HTTPException(detail="Order service existence check failed", status_code=500) from e
@@ -160,9 +164,7 @@ class OrderUtils:
         
         try:
 
-            response = await db_session.exec(select(OrderProduct).where(OrderProduct.product_id == product_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, OrderProduct, product_id=product_id)
         
         except Exception as e:
             raise HTTPException(detail="Product existence check failed", status_code=500) from e
\ No newline at end of file
@@ -3,20 +3,19 @@ from sqlmodel import select
 from fastapi import HTTPException
 
 from models import Payment
+from utils.exists import ExistsUtils
 from core import log_operation
 
 class PaymentUtils:
     
     @staticmethod
     @log_operation(True)
-    async def exist_payment(cls, db_session: AsyncSession, payment_id: int) -> bool:
+    async def exist_payment(db_session: AsyncSession, payment_id: int) -> bool:
         """Check if a payment exists by ID."""
         
         try:
             
-            response = await db_session.exec(select(Payment).where(Payment.id == payment_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Payment, id=payment_id)
         
         except Exception as e:
             raise HTTPException(detail="Payment existence check failed", status_code=500) from e
\ No newline at end of file
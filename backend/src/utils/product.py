@@ -1,16 +1,27 @@
-from uuid import uuid4
+import asyncio
+import io
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, update, delete, exists
 from fastapi import HTTPException, UploadFile
 from botocore.client import BaseClient
+import logfire
 
-from models import Product, Category, ProductCategory
-from core import SETTINGS, log_operation
+from models import Product, Category, ProductCategory, ImageBlob, StockMovement
+from utils.exists import ExistsUtils
+from utils.image import ImageUtils
+from db import insert_on_conflict, background_session
+from core import SETTINGS, get_e2_client, log_operation
 
 class ProductUtils:
     
-    ALLOWED_IMAGE_TYPES = {"image/png", "image/jpeg", "image/webp"}
+    # Tipo de contenido y extension de la clave
+    ALLOWED_IMAGE_TYPES = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+    IMAGE_CHUNK_SIZE = 1024 * 1024
     
     @staticmethod
     @log_operation(True)
@@ -19,72 +30,194 @@ class ProductUtils:
         
         try:
             
-            response = await db_session.exec(select(Product).where(Product.id == product_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Product, id=product_id)
         
         except Exception as e:
             raise HTTPException(detail="Product existence check failed", status_code=500) from e
         
+    @staticmethod
+    async def hash_image(image: UploadFile) -> tuple[str, int]:
+        """SHA-256 and size of an upload, read in chunks; 413 as soon as it passes image_max_bytes."""
+
+        too_large = HTTPException(detail=f"The image exceeds {SETTINGS.image_max_bytes} bytes", status_code=413)
+
+        # El parser ya conoce el tamaño del archivo: se rechaza sin leerlo
+        if image.size is not None and image.size > SETTINGS.image_max_bytes:
+            raise too_large
+
+        await image.seek(0)
+
+        digest = hashlib.sha256()
+        size = 0
+
+        while chunk := await image.read(ProductUtils.IMAGE_CHUNK_SIZE):
+
+            size += len(chunk)
+
+            if size > SETTINGS.image_max_bytes:
+                raise too_large
+
+            digest.update(chunk)
+
+        return digest.hexdigest(), size
+
     @staticmethod
     @log_operation(False)
-    async def upload_image(storage_client : BaseClient, image: UploadFile) -> str:
-        """Upload an image to the storage."""
+    async def upload_image(db_session: AsyncSession, storage_client : BaseClient, image: UploadFile) -> str:
+        """Take a reference to the blob of an image, uploading it and its variants only if it is not stored yet. The caller commits."""
 
-        if image.content_type not in cls.ALLOWED_IMAGE_TYPES:
+        if image.content_type not in ProductUtils.ALLOWED_IMAGE_TYPES:
             raise HTTPException(
                 status_code=400,
                 detail=(
                     f"Invalid image type: {image.content_type}. "
-                    f"Allowed types are: {', '.join(cls.ALLOWED_IMAGE_TYPES)}"
+                    f"Allowed types are: {', '.join(ProductUtils.ALLOWED_IMAGE_TYPES)}"
                 ),
             )
 
+        digest, size = await ProductUtils.hash_image(image)
+        image_key = f"{SETTINGS.image_folder}/{digest}.{ProductUtils.ALLOWED_IMAGE_TYPES[image.content_type]}"
+
+        # El upsert bloquea la fila: una subida concurrente de la misma imagen espera y no la vuelve a subir
+        stmt = insert_on_conflict(db_session, ImageBlob).values(key=image_key, size=size, content_type=image.content_type,
+                                                                refcount=1, created_at=datetime.now())
+        response = await db_session.exec(stmt.on_conflict_do_update(index_elements=["key"],
+                                                                    set_={"refcount": ImageBlob.refcount + 1})
+                                         .returning(ImageBlob.refcount))
+
+        # Con 1 la fila es nueva o estaba en 0 esperando el barrido, que pudo haber borrado ya el objeto
+        if response.scalars().one() > 1:
+            return image_key
+
         await image.seek(0)
+        data = await image.read()
 
-        safe_name = f"{uuid4()}-{image.filename}"
-        image_key = f"{SETTINGS.image_folder}/{safe_name}"
+        # Se generan antes de subir nada: un archivo que no es imagen no deja objetos sueltos
+        variants = await ImageUtils.render(data)
 
         await storage_client.upload_fileobj(
-            image.file,
+            io.BytesIO(data),
             SETTINGS.bucket_name,
             image_key,
             ExtraArgs={"ContentType": image.content_type},
             )
         
+        await ImageUtils.upload_variants(storage_client, image_key, variants)
+        
         return image_key
 
     @staticmethod
     @log_operation(True)
-    async def delete_image(cls, storage_client: BaseClient, image_key: str) -> None:
-        """Delete an image from the storage."""
+    async def release_image(db_session: AsyncSession, image_key: str) -> None:
+        """Drop a reference to an image. Blobs left at 0 stay until sweep_images removes them. The caller commits."""
+
+        # Las claves anteriores al conteo de referencias no tienen fila: entran en 0 para que el barrido las borre
+        stmt = insert_on_conflict(db_session, ImageBlob).values(key=image_key, size=0, content_type="application/octet-stream",
+                                                                refcount=0, created_at=datetime.now())
+
+        await db_session.exec(stmt.on_conflict_do_update(index_elements=["key"],
+                                                         set_={"refcount": ImageBlob.refcount - 1}))
+
+    @staticmethod
+    @log_operation(True)
+    async def sweep_images(db_session: AsyncSession, storage_client: BaseClient, limit: int) -> int:
+        """Delete from the storage up to `limit` blobs no product references, and their rows. Returns how many."""
+
+        # El bloqueo se mantiene mientras se borra del storage: una subida de la misma imagen espera
+        # y despues inserta una fila nueva y vuelve a subir el objeto
+        response = await db_session.exec(select(ImageBlob.key)
+                                         .where(ImageBlob.refcount <= 0)
+                                         .limit(limit)
+                                         .with_for_update(skip_locked=True))
+        keys = list(response.all())
+
+        for image_key in keys:
+            await ProductUtils.delete_image(storage_client, image_key)
+
+        if keys:
+            await db_session.exec(delete(ImageBlob).where(ImageBlob.key.in_(keys), ImageBlob.refcount <= 0))
+
+        await db_session.commit()
+
+        return len(keys)
+
+    @staticmethod
+    async def sweep_loop(interval: float) -> None:
+        """Sweep unreferenced images every `interval` seconds until cancelled."""
+
+        while True:
+
+            await asyncio.sleep(interval)
+
+            try:
+
+                async with background_session() as db_session, asynccontextmanager(get_e2_client)() as storage_client:
+
+                    # Con un lote lleno probablemente quedan mas
+                    while await ProductUtils.sweep_images(db_session, storage_client, SETTINGS.image_sweep_batch_size) == SETTINGS.image_sweep_batch_size:
+                        pass
+
+            except Exception:
+                logfire.exception("Image sweep failed")
+
+    @staticmethod
+    @log_operation(True)
+    async def delete_image(storage_client: BaseClient, image_key: str) -> None:
+        """Delete an image and its variants from the storage."""
 
         await storage_client.delete_object(Bucket=SETTINGS.bucket_name, Key=image_key)
+        await ImageUtils.delete_variants(storage_client, image_key)
     
     @staticmethod
     @log_operation(True)
-    async def exist_category(cls, db_session: AsyncSession, category_id: int) -> bool:
+    async def exist_order_movements(db_session: AsyncSession, product_id: int) -> bool:
+        """Check if a product has stock movements caused by orders."""
+        
+        try:
+            
+            response = await db_session.exec(select(exists().where(StockMovement.product_id == product_id,
+                                                                   StockMovement.order_id.is_not(None))))
+            
+            return bool(response.one())
+        
+        except Exception as e:
+            raise HTTPException(detail="Stock movement check failed", status_code=500) from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def sku_in_use(db_session: AsyncSession, sku: str, product_id: Optional[int] = None) -> bool:
+        """Check if a product other than `product_id` already has `sku`."""
+        
+        try:
+            
+            response = await db_session.exec(select(exists().where(Product.sku == sku, Product.id != product_id)
+                                                    if product_id is not None else exists().where(Product.sku == sku)))
+            
+            return bool(response.one())
+        
+        except Exception as e:
+            raise HTTPException(detail="SKU check failed", status_code=500) from e
+    
+    @staticmethod
+    @log_operation(True)
+    async def exist_category(db_session: AsyncSession, category_id: int) -> bool:
         """Check if a category exists by ID."""
         
         try:
             
-            response = await db_session.exec(select(Category).where(Category.id == category_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Category, id=category_id)
         
         except Exception as e:
             raise HTTPException(detail="Category existence check failed", status_code=500) from e
     
     @staticmethod
     @log_operation(True)
-    async def exist_product_category(cls, db_session: AsyncSession, product_category: ProductCategory) -> bool:
+    async def exist_product_category(db_session: AsyncSession, product_category: ProductCategory) -> bool:
         """Check if a product category exists by ID."""
 
         try:
             
-            response = await db_session.exec(select(ProductCategory).where(ProductCategory.product_id == product_category.product_id, ProductCategory.category_id == product_category.category_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, ProductCategory, product_id=product_category.product_id, category_id=product_category.category_id)
         
         except Exception as e:
             raise HTTPException(detail="Product category existence check failed", status_code=500) from e
\ No newline at end of file
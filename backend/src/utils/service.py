@@ -3,6 +3,7 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
 from models import Service, ServiceInput
+from utils.exists import ExistsUtils
 from core import log_operation
 
 class ServiceUtils:
@@ -14,9 +15,7 @@ class ServiceUtils:
         
         try:
             
-            response = await db_session.exec(select(Service).where(Service.id == service_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Service, id=service_id)
         
         except Exception as e:
             raise HTTPException(detail="Service search failed", status_code=500) from e
@@ -28,9 +27,7 @@ class ServiceUtils:
         
         try:
             
-            response = await db_session.exec(select(ServiceInput).where(ServiceInput.service_id == service_input.service_id).where(ServiceInput.product_id == service_input.product_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, ServiceInput, service_id=service_input.service_id, product_id=service_input.product_id)
         
         except Exception as e:
             raise HTTPException(detail="Service input search failed", status_code=500) from e
\ No newline at end of file
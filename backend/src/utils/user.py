@@ -3,6 +3,7 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
 from models import Employee, Client
+from utils.exists import ExistsUtils
 from core import log_operation
 
 class UserUtils:
@@ -14,9 +15,7 @@ class UserUtils:
         
         try:
 
-            response = await db_session.exec(select(Employee).where(Employee.id == employee_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Employee, id=employee_id)
         
         except Exception as e:
             raise HTTPException(detail="Employee retrieval failed", status_code=500) from e
@@ -28,9 +27,7 @@ class UserUtils:
         
         try:
 
-            response = await db_session.exec(select(Employee).where(Employee.email == email))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Employee, email=email)
         
         except Exception as e:
             raise HTTPException(detail="Employee retrieval failed", status_code=500) from e
@@ -42,9 +39,7 @@ class UserUtils:
         
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.documentid == document_id))
-            
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Employee, documentid=document_id)
         
         except Exception as e:
             raise HTTPException(detail="Employee retrieval failed", status_code=500) from e
@@ -56,9 +51,9 @@ class UserUtils:
         
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.email == email))
+            response = await db_session.exec(select(Employee.id).where(Employee.email == email))
             
-            return int(response.one().id)
+            return int(response.one())
         
         except Exception as e:
             raise HTTPException(detail="Employee id retrieval failed", status_code=500) from e
@@ -70,9 +65,9 @@ class UserUtils:
         
         try:
             
-            response = await db_session.exec(select(Employee).where(Employee.documentid == documentid))
+            response = await db_session.exec(select(Employee.id).where(Employee.documentid == documentid))
             
-            return int(response.one().id)
+            return int(response.one())
         
         except Exception as e:
             raise HTTPException(detail="Employee id retrieval failed", status_code=500) from e
@@ -84,9 +79,7 @@ class UserUtils:
 
         try:
 
-            response = await db_session.exec(select(Client).where(Client.id == _id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Client, id=_id)
 
         except Exception as e:
             raise HTTPException(detail="Client retrieval failed", status_code=500) from e
@@ -98,9 +91,7 @@ class UserUtils:
         
         try:
 
-            response = await db_session.exec(select(Client).where(Client.email == email))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Client, email=email)
         
         except Exception as e:
             raise HTTPException(detail="Client retrieval failed", status_code=500) from e
@@ -112,9 +103,7 @@ class UserUtils:
         
         try:
 
-            response = await db_session.exec(select(Client).where(Client.documentid == document_id))
-
-            return bool(response.first())
+            return await ExistsUtils.exists(db_session, Client, documentid=document_id)
         
         except Exception as e:
             raise HTTPException(detail="Client retrieval failed", status_code=500) from e
@@ -126,9 +115,9 @@ class UserUtils:
         
         try:
             
-            response = await db_session.exec(select(Client).where(Client.email == email))
+            response = await db_session.exec(select(Client.id).where(Client.email == email))
             
-            return int(response.one().id)
+            return int(response.one())
         
         except Exception as e:
             raise HTTPException(detail="Client id retrieval failed", status_code=500) from e
@@ -140,9 +129,9 @@ class UserUtils:
         
         try:
             
-            response = await db_session.exec(select(Client).where(Client.documentid == documentid))
+            response = await db_session.exec(select(Client.id).where(Client.documentid == documentid))
             
-            return int(response.one().id)
+            return int(response.one())
         
         except Exception as e:
             raise HTTPException(detail="Client id retrieval failed", status_code=500) from e